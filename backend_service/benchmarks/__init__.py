@@ -0,0 +1,9 @@
+"""Load tests and micro-benchmarks for the backend service.
+
+The app runs in-process against a deterministic fake chat model, SQLite
+(or a local PostgreSQL) and an in-memory Redis stand-in, so results depend
+only on this code. Run from the backend_service directory::
+
+    python -m benchmarks run --output results.json
+    python -m benchmarks compare baseline.json results.json
+"""
@@ -0,0 +1,153 @@
+"""Command line entry point: ``python -m benchmarks``."""
+
+import argparse
+import asyncio
+import json
+import platform
+import sys
+from datetime import datetime, timezone
+
+from benchmarks.compare import compare
+from benchmarks.harness import configure, running_app
+from benchmarks.load import LoadConfig, parse_mix
+
+
+def _parser() -> argparse.ArgumentParser:
+    """Build the argument parser."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Run the benchmarks and write a JSON report")
+    run.add_argument("--suite", choices=("all", "load", "micro"), default="all")
+    run.add_argument("--output", help="Report path; printed to stdout if omitted")
+    run.add_argument(
+        "--database-url", help="Database URL; a fresh SQLite file by default"
+    )
+    run.add_argument(
+        "--redis-url", help="Real Redis URL; an in-memory stand-in by default"
+    )
+    run.add_argument("--users", type=int, default=LoadConfig.users)
+    run.add_argument(
+        "--requests-per-user", type=int, default=LoadConfig.requests_per_user
+    )
+    run.add_argument(
+        "--mix",
+        type=parse_mix,
+        default=None,
+        help="Operation weights, e.g. query=6,stream=1,history=2,stats=1",
+    )
+    run.add_argument("--repeat-ratio", type=float, default=LoadConfig.repeat_ratio)
+    run.add_argument("--think-time", type=float, default=LoadConfig.think_time_seconds)
+    run.add_argument(
+        "--llm-latency",
+        default="lognormal:0.3,0.5",
+        help="Time to first token: constant:S, uniform:A,B, normal:MEAN,SD or lognormal:MEDIAN,SIGMA",
+    )
+    run.add_argument("--llm-tokens-per-second", type=float, default=200.0)
+    run.add_argument("--llm-response-words", type=int, default=60)
+    run.add_argument(
+        "--iterations", type=int, default=2000, help="Micro-benchmark iterations"
+    )
+    run.add_argument("--history-rows", type=int, default=1000)
+    run.add_argument("--seed", type=int, default=0)
+
+    diff = commands.add_parser("compare", help="Compare a report against a baseline")
+    diff.add_argument("baseline")
+    diff.add_argument("current")
+    diff.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.2,
+        help="Tolerated relative change for the worse (default 0.2)",
+    )
+    return parser
+
+
+async def _run(args: argparse.Namespace) -> dict:
+    """Run the selected suites."""
+    database_url = configure(args.database_url, args.redis_url)
+    # Importing src reads the settings, so only after configure
+    from src.services.stub_llm import LatencyDistribution, StubChatModel
+
+    try:
+        latency = LatencyDistribution.parse(args.llm_latency)
+    except ValueError as e:
+        raise SystemExit(f"--llm-latency: {e}")
+    llm = StubChatModel(
+        first_token_latency=latency,
+        tokens_per_second=args.llm_tokens_per_second,
+        response_words=args.llm_response_words,
+        seed=args.seed,
+    )
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": database_url.partition(":")[0],
+            "redis": "redis" if args.redis_url else "in-memory",
+            "llm_latency": str(latency),
+            "llm_tokens_per_second": args.llm_tokens_per_second,
+        }
+    }
+
+    async with running_app(llm, use_redis=args.redis_url is not None) as client:
+        if args.suite in ("all", "load"):
+            from benchmarks.load import run_load
+
+            config = LoadConfig(
+                users=args.users,
+                requests_per_user=args.requests_per_user,
+                repeat_ratio=args.repeat_ratio,
+                think_time_seconds=args.think_time,
+                seed=args.seed,
+            )
+            if args.mix is not None:
+                config.mix = args.mix
+            report["load"] = await run_load(client, config)
+            report["load"]["llm_calls"] = llm.calls
+
+        if args.suite in ("all", "micro"):
+            from benchmarks.micro import run_micro
+
+            report["micro"] = await run_micro(args.iterations, args.history_rows)
+    return report
+
+
+def _compare(args: argparse.Namespace) -> int:
+    """Print the comparison and return the exit status."""
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    rows = compare(baseline, current, args.max_regression)
+    for row in rows:
+        flag = "REGRESSION" if row["regressed"] else "ok"
+        print(
+            f"{flag:<10} {row['metric']:<60} {row['baseline']:>12} -> {row['current']:>12} "
+            f"({row['change']:+.1%})"
+        )
+    regressions = sum(row["regressed"] for row in rows)
+    print(f"{len(rows)} metrics compared, {regressions} regressions")
+    return 1 if regressions else 0
+
+
+def main() -> int:
+    """Run the command line."""
+    args = _parser().parse_args()
+    if args.command == "compare":
+        return _compare(args)
+
+    report = asyncio.run(_run(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
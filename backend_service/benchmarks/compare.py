@@ -0,0 +1,60 @@
+"""Compare two benchmark reports and flag regressions."""
+
+from typing import Any, Iterator, Optional
+
+# (path to the metric, whether a higher value is better)
+Metric = tuple[tuple[str, ...], bool]
+
+
+def _metrics(report: dict) -> Iterator[Metric]:
+    """List the comparable metrics of a report."""
+    load = report.get("load")
+    if load:
+        yield ("load", "throughput_rps"), True
+        for endpoint in load["endpoints"]:
+            for percentile in ("p50", "p95"):
+                yield ("load", "endpoints", endpoint, "latency_ms", percentile), False
+    for name in report.get("micro", {}):
+        yield ("micro", name, "ops_per_second"), True
+        yield ("micro", name, "latency_ms", "p95"), False
+
+
+def _lookup(report: dict, path: tuple[str, ...]) -> Optional[float]:
+    """Get a metric, or None if the report does not have it."""
+    value: Any = report
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def compare(baseline: dict, current: dict, max_regression: float) -> list[dict]:
+    """Compare the metrics present in both reports.
+
+    Args:
+        baseline: Reference report.
+        current: New report.
+        max_regression: Tolerated relative change for the worse, e.g. 0.2.
+
+    Returns:
+        One entry per metric with both values, the relative change and
+        whether it regressed beyond the tolerance.
+    """
+    rows = []
+    for path, higher_is_better in _metrics(baseline):
+        before, after = _lookup(baseline, path), _lookup(current, path)
+        if not before or after is None:
+            continue
+        change = (after - before) / before
+        worse = -change if higher_is_better else change
+        rows.append(
+            {
+                "metric": ".".join(path),
+                "baseline": before,
+                "current": after,
+                "change": round(change, 4),
+                "regressed": worse > max_regression,
+            }
+        )
+    return rows
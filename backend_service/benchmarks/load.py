@@ -0,0 +1,246 @@
+"""Load test driving a realistic mix of API traffic."""
+
+import asyncio
+import random
+import secrets
+import time
+from collections import Counter, defaultdict
+from dataclasses import asdict, dataclass, field
+from typing import Awaitable, Callable
+
+import httpx
+
+from benchmarks.stats import summarize
+
+API = "/api/v1"
+OPERATIONS = ("query", "stream", "history", "stats")
+
+
+def parse_mix(spec: str) -> dict[str, float]:
+    """Parse an operation mix such as ``query=6,history=2,stats=1``.
+
+    Args:
+        spec: Comma-separated ``operation=weight`` pairs.
+
+    Returns:
+        Operation weights.
+
+    Raises:
+        ValueError: If an operation is unknown or a weight is invalid.
+    """
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation: {name}")
+        mix[name] = float(weight)
+        if mix[name] < 0:
+            raise ValueError(f"Negative weight for {name}")
+    if not any(mix.values()):
+        raise ValueError("Operation mix has no weight")
+    return mix
+
+
+@dataclass
+class LoadConfig:
+    """Shape of a load test run.
+
+    Each virtual user registers, logs in and then issues
+    ``requests_per_user`` requests drawn from ``mix``.
+    """
+
+    users: int = 20
+    requests_per_user: int = 25
+    mix: dict[str, float] = field(
+        default_factory=lambda: {"query": 6, "stream": 1, "history": 2, "stats": 1}
+    )
+    # Share of queries repeating an earlier one, which the caches can serve
+    repeat_ratio: float = 0.2
+    think_time_seconds: float = 0.0
+    seed: int = 0
+
+
+class Recorder:
+    """Collect latencies and status codes per endpoint."""
+
+    def __init__(self):
+        """Initialize recorder."""
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.statuses: dict[str, Counter] = defaultdict(Counter)
+
+    def record(self, endpoint: str, seconds: float, status: int | str) -> None:
+        """Record one request.
+
+        Args:
+            endpoint: Endpoint label.
+            seconds: Request latency.
+            status: HTTP status code, or ``exception``.
+        """
+        self.latencies[endpoint].append(seconds)
+        self.statuses[endpoint][str(status)] += 1
+
+    async def timed(
+        self, endpoint: str, request: Callable[[], Awaitable[httpx.Response]]
+    ) -> httpx.Response | None:
+        """Send a request and record its latency.
+
+        Args:
+            endpoint: Endpoint label.
+            request: Function sending the request.
+
+        Returns:
+            Response, or None if the app raised.
+        """
+        start = time.perf_counter()
+        try:
+            response = await request()
+        except Exception:
+            self.record(endpoint, time.perf_counter() - start, "exception")
+            return None
+        self.record(endpoint, time.perf_counter() - start, response.status_code)
+        return response
+
+    def report(self, elapsed: float) -> dict:
+        """Summarize the run.
+
+        Args:
+            elapsed: Wall-clock duration of the run.
+
+        Returns:
+            Totals and per-endpoint throughput, errors and latency.
+        """
+        endpoints: dict[str, dict] = {}
+        for endpoint in sorted(self.latencies):
+            statuses = self.statuses[endpoint]
+            count = sum(statuses.values())
+            endpoints[endpoint] = {
+                "count": count,
+                "errors": sum(
+                    n for code, n in statuses.items() if not code.startswith("2")
+                ),
+                "status_codes": dict(statuses),
+                "throughput_rps": round(count / elapsed, 3),
+                "latency_ms": summarize(self.latencies[endpoint]),
+            }
+        total = sum(endpoint["count"] for endpoint in endpoints.values())
+        return {
+            "duration_seconds": round(elapsed, 3),
+            "requests": total,
+            "errors": sum(endpoint["errors"] for endpoint in endpoints.values()),
+            "throughput_rps": round(total / elapsed, 3),
+            "endpoints": endpoints,
+        }
+
+
+async def run_load(client: httpx.AsyncClient, config: LoadConfig) -> dict:
+    """Run a load test against the app.
+
+    Args:
+        client: Client bound to the app.
+        config: Load test shape.
+
+    Returns:
+        Load test report.
+    """
+    recorder = Recorder()
+    # Unique names let repeated runs share a database
+    run_id = secrets.token_hex(4)
+    asked: list[str] = []
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            _virtual_user(client, config, recorder, run_id, index, asked)
+            for index in range(config.users)
+        )
+    )
+    report = recorder.report(time.perf_counter() - start)
+    return {"config": asdict(config), **report}
+
+
+async def _virtual_user(
+    client: httpx.AsyncClient,
+    config: LoadConfig,
+    recorder: Recorder,
+    run_id: str,
+    index: int,
+    asked: list[str],
+) -> None:
+    """Register, log in and send a random sequence of requests."""
+    rng = random.Random(f"{config.seed}:{index}")
+    username = f"bench_{run_id}_{index}"
+    password = "benchmark-password"
+
+    response = await recorder.timed(
+        "register",
+        lambda: client.post(
+            f"{API}/auth/register",
+            json={
+                "username": username,
+                "email": f"{username}@example.com",
+                "password": password,
+            },
+        ),
+    )
+    if response is None or response.status_code != 200:
+        return
+    response = await recorder.timed(
+        "login",
+        lambda: client.post(
+            f"{API}/auth/login", json={"username": username, "password": password}
+        ),
+    )
+    if response is None or response.status_code != 200:
+        return
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    operations = list(config.mix)
+    weights = [config.mix[operation] for operation in operations]
+    for number in range(config.requests_per_user):
+        operation = rng.choices(operations, weights)[0]
+
+        if operation in ("query", "stream"):
+            if asked and rng.random() < config.repeat_ratio:
+                text = rng.choice(asked)
+            else:
+                text = f"Benchmark question {run_id}-{index}-{number}: explain item {rng.randrange(10**6)}"
+                asked.append(text)
+            if operation == "query":
+                await recorder.timed(
+                    "query",
+                    lambda: client.post(
+                        f"{API}/queries/", json={"query": text}, headers=headers
+                    ),
+                )
+            else:
+                await _stream(client, recorder, text, headers)
+        elif operation == "history":
+            await recorder.timed(
+                "history",
+                lambda: client.get(f"{API}/queries/history", headers=headers),
+            )
+        else:
+            await recorder.timed(
+                "stats",
+                lambda: client.get(f"{API}/queries/stats", headers=headers),
+            )
+
+        if config.think_time_seconds:
+            await asyncio.sleep(rng.expovariate(1 / config.think_time_seconds))
+
+
+async def _stream(
+    client: httpx.AsyncClient, recorder: Recorder, text: str, headers: dict
+) -> None:
+    """Stream a query and record the time until the last event.
+
+    The in-process transport delivers the body only once the stream has
+    finished, so time to first token cannot be observed here.
+    """
+    await recorder.timed(
+        "stream",
+        lambda: client.post(
+            f"{API}/queries/stream", json={"query": text}, headers=headers
+        ),
+    )
@@ -0,0 +1,187 @@
+"""Micro-benchmarks of hot paths.
+
+Imports ``src``, so settings must be configured before this module is
+imported.
+"""
+
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable
+
+from sqlalchemy import Result, select
+
+from benchmarks.stats import summarize
+from src.core.auth import create_access_token, decode_access_token
+from src.core.limiter_algorithms import SlidingWindowLimiter, TokenBucketLimiter
+from src.core.rate_limiter import RateLimiter
+from src.db.database import AsyncSessionLocal
+from src.models import QueryLog, User
+from src.services.llm_service import LLMService, encode_history_cursor
+from src.services.query_log_writer import QueryLogWriter
+
+# Users cycled through by the rate limiter benchmarks
+_LIMITER_USERS = 100
+
+
+def _report(latencies: list[float], elapsed: float) -> dict:
+    """Summarize a micro-benchmark."""
+    return {
+        "iterations": len(latencies),
+        "ops_per_second": round(len(latencies) / elapsed, 3),
+        "latency_ms": summarize(latencies),
+    }
+
+
+def measure_sync(
+    operation: Callable[[int], object], iterations: int, warmup: int
+) -> dict:
+    """Time a synchronous operation.
+
+    Args:
+        operation: Function called with the iteration number.
+        iterations: Timed calls.
+        warmup: Untimed calls made first.
+
+    Returns:
+        Throughput and latency summary.
+    """
+    for number in range(warmup):
+        operation(number)
+    latencies = []
+    start = time.perf_counter()
+    for number in range(iterations):
+        began = time.perf_counter()
+        operation(number)
+        latencies.append(time.perf_counter() - began)
+    return _report(latencies, time.perf_counter() - start)
+
+
+async def measure_async(
+    operation: Callable[[int], Awaitable[object]], iterations: int, warmup: int
+) -> dict:
+    """Time a coroutine function, one call at a time.
+
+    Args:
+        operation: Coroutine function called with the iteration number.
+        iterations: Timed calls.
+        warmup: Untimed calls made first.
+
+    Returns:
+        Throughput and latency summary.
+    """
+    for number in range(warmup):
+        await operation(number)
+    latencies = []
+    start = time.perf_counter()
+    for number in range(iterations):
+        began = time.perf_counter()
+        await operation(number)
+        latencies.append(time.perf_counter() - began)
+    return _report(latencies, time.perf_counter() - start)
+
+
+async def run_micro(iterations: int = 2000, history_rows: int = 1000) -> dict:
+    """Run all micro-benchmarks.
+
+    Args:
+        iterations: Timed calls per benchmark; database benchmarks use a
+            tenth of it.
+        history_rows: Query logs seeded for the history benchmarks.
+
+    Returns:
+        Results per benchmark.
+    """
+    warmup = max(1, iterations // 10)
+    results = {}
+
+    limiter = RateLimiter()
+    results["rate_limiter_reserve"] = await measure_async(
+        lambda n: limiter.reserve(10**6 + n % _LIMITER_USERS), iterations, warmup
+    )
+
+    stacked = RateLimiter(
+        tiers=[
+            TokenBucketLimiter("bench_burst", 10**9, 1.0),
+            SlidingWindowLimiter("bench_daily", 10**9, 86400),
+        ]
+    )
+    results["rate_limiter_reserve_stacked"] = await measure_async(
+        lambda n: stacked.reserve(10**6 + n % _LIMITER_USERS), iterations, warmup
+    )
+
+    token = create_access_token({"sub": "benchmark"})
+    results["decode_access_token"] = measure_sync(
+        lambda n: decode_access_token(token), iterations, warmup
+    )
+
+    user_id, cursor = await _seed_history(history_rows)
+    db_iterations = max(1, iterations // 10)
+    db_warmup = max(1, warmup // 10)
+
+    async def history(preview: bool, from_cursor: bool) -> None:
+        async with AsyncSessionLocal() as db:
+            await LLMService.get_query_history(
+                db,
+                user_id,
+                limit=10,
+                cursor=cursor if from_cursor else None,
+                preview=preview,
+            )
+
+    results["get_query_history"] = await measure_async(
+        lambda n: history(False, False), db_iterations, db_warmup
+    )
+    results["get_query_history_preview"] = await measure_async(
+        lambda n: history(True, False), db_iterations, db_warmup
+    )
+    results["get_query_history_deep_page"] = await measure_async(
+        lambda n: history(False, True), db_iterations, db_warmup
+    )
+    return results
+
+
+async def _seed_history(rows: int) -> tuple[int, str]:
+    """Create a user with query history.
+
+    Returns:
+        User ID and the cursor of a page halfway through the history.
+    """
+    suffix = time.time_ns()
+    async with AsyncSessionLocal() as db:
+        user = User(
+            username=f"bench_history_{suffix}",
+            email=f"bench_history_{suffix}@example.com",
+            hashed_password="benchmark",
+        )
+        db.add(user)
+        await db.commit()
+        user_id = user.id
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    await QueryLogWriter().write_many(
+        [
+            {
+                "user_id": user_id,
+                "query": f"History question {number}",
+                # Some responses repeat, as they do in real traffic
+                "response": f"History answer {number % 50} " * 40,
+                "llm_model_used": "fake-benchmark",
+                "prompt_tokens": 4,
+                "completion_tokens": 160,
+                "tokens_used": 164,
+                "created_at": now - timedelta(seconds=number),
+            }
+            for number in range(rows)
+        ]
+    )
+
+    async with AsyncSessionLocal() as db:
+        result: Result = await db.execute(
+            select(QueryLog.created_at, QueryLog.id)
+            .where(QueryLog.user_id == user_id)
+            .order_by(QueryLog.created_at.desc(), QueryLog.id.desc())
+            .offset(rows // 2)
+            .limit(1)
+        )
+        created_at, log_id = result.one()
+    return user_id, encode_history_cursor(created_at, log_id)
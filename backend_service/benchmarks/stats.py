@@ -0,0 +1,30 @@
+"""Latency summaries shared by the benchmark suites."""
+
+import statistics
+
+
+def summarize(latencies: list[float]) -> dict:
+    """Summarize latencies in milliseconds.
+
+    Args:
+        latencies: Latencies in seconds.
+
+    Returns:
+        Mean, percentiles and maximum in milliseconds.
+    """
+    if not latencies:
+        return {"mean": None, "p50": None, "p95": None, "p99": None, "max": None}
+
+    ms = sorted(latency * 1000 for latency in latencies)
+    if len(ms) > 1:
+        cuts = statistics.quantiles(ms, n=100, method="inclusive")
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    else:
+        p50 = p95 = p99 = ms[0]
+    return {
+        "mean": round(statistics.fmean(ms), 3),
+        "p50": round(p50, 3),
+        "p95": round(p95, 3),
+        "p99": round(p99, 3),
+        "max": round(ms[-1], 3),
+    }
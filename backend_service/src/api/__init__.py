@@ -1,6 +1,7 @@
 """API module."""
 
+from .admin import router as admin_router
 from .auth import router as auth_router
 from .query import router as query_router
 
-__all__ = ["auth_router", "query_router"]
+__all__ = ["admin_router", "auth_router", "query_router"]
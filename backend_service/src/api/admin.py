@@ -0,0 +1,154 @@
+"""Profiling admin API routes."""
+
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+
+from src.core import ProfilingUpdate
+from src.core.profiling import continuous_sampler, is_profiling_token, request_profiler
+from src.utils.logger import get_logger
+from config.settings import get_settings
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+
+def require_profiling_token(
+    token: str | None = Header(None, alias=settings.profiling_header),
+) -> None:
+    """Allow only callers holding the profiling token.
+
+    Raises:
+        HTTPException: If profiling is disabled or the token is wrong.
+    """
+    if not is_profiling_token(token):
+        # Do not reveal whether the endpoints exist
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+
+router = APIRouter(
+    prefix="/admin/profiling",
+    tags=["admin"],
+    dependencies=[Depends(require_profiling_token)],
+)
+
+
+def _state() -> dict:
+    """Current profiling configuration."""
+    return {
+        "sample_rate": request_profiler.sample_rate,
+        "sampled_paths": sorted(request_profiler.sampled_paths),
+        "interval_ms": request_profiler.interval_seconds * 1000,
+        "profiles_kept": len(request_profiler.profiles),
+        "buffer_size": request_profiler.profiles.maxlen,
+        "continuous": continuous_sampler.running,
+        "continuous_interval_ms": continuous_sampler.interval_seconds * 1000,
+    }
+
+
+@router.get("")
+async def get_profiling():
+    """Get the profiling configuration.
+
+    Returns:
+        Sampling settings and buffer usage.
+    """
+    return _state()
+
+
+@router.put("")
+async def update_profiling(update: ProfilingUpdate):
+    """Change the sample rate or start/stop the continuous sampler.
+
+    Args:
+        update: Settings to change.
+
+    Returns:
+        Updated profiling configuration.
+    """
+    if update.sample_rate is not None:
+        request_profiler.sample_rate = update.sample_rate
+    if update.continuous is True:
+        continuous_sampler.start()
+    elif update.continuous is False:
+        continuous_sampler.stop()
+    logger.info("Profiling updated: %s", update.model_dump(exclude_none=True))
+    return _state()
+
+
+@router.get("/profiles")
+async def list_profiles():
+    """List the kept request profiles, newest first.
+
+    Returns:
+        Profile summaries.
+    """
+    return {
+        "profiles": [
+            profile.summary() for profile in reversed(request_profiler.profiles)
+        ]
+    }
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(
+    profile_id: int,
+    format: Literal["json", "collapsed"] = "json",
+    top: int = Query(30, ge=1, le=500),
+):
+    """Get one request profile.
+
+    Args:
+        profile_id: Profile ID.
+        format: ``json`` for the hottest functions, ``collapsed`` for folded
+            stacks to feed a flame graph tool.
+        top: Number of functions in the JSON report.
+
+    Returns:
+        Profile report.
+
+    Raises:
+        HTTPException: If the profile is not (or no longer) kept.
+    """
+    profile = request_profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found"
+        )
+    if format == "collapsed":
+        return PlainTextResponse(profile.stacks.collapsed())
+    return {**profile.summary(), "top": profile.stacks.top(top)}
+
+
+@router.get("/continuous")
+async def get_continuous_profile(
+    format: Literal["json", "collapsed"] = "json",
+    top: int = Query(30, ge=1, le=500),
+):
+    """Get the stacks aggregated by the continuous sampler.
+
+    Args:
+        format: ``json`` for the hottest functions, ``collapsed`` for folded
+            stacks.
+        top: Number of functions in the JSON report.
+
+    Returns:
+        Aggregated profile.
+    """
+    stacks = continuous_sampler.stacks
+    if format == "collapsed":
+        return PlainTextResponse(stacks.collapsed())
+    started_at = continuous_sampler.started_at
+    return {
+        "running": continuous_sampler.running,
+        "started_at": started_at.isoformat() if started_at else None,
+        "samples": stacks.samples,
+        "top": stacks.top(top),
+    }
+
+
+@router.delete("/continuous", status_code=status.HTTP_204_NO_CONTENT)
+async def reset_continuous_profile():
+    """Drop the samples aggregated by the continuous sampler."""
+    continuous_sampler.reset()
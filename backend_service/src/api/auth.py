@@ -3,15 +3,16 @@
 from datetime import timedelta
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.db import get_db
+from src.db import get_async_db
 from src.core import (
     UserRegister,
     UserLogin,
     TokenResponse,
     UserResponse,
     create_access_token,
+    PasswordHasherBusyError,
 )
 from src.services import UserService
 from src.utils.logger import get_logger
@@ -24,7 +25,7 @@ router = APIRouter(prefix="/auth", tags=["auth"])
 @router.post("/register", response_model=UserResponse)
 async def register(
     user_data: UserRegister,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Register a new user.
 
@@ -36,18 +37,25 @@ async def register(
         Created user.
 
     Raises:
-        HTTPException: If registration fails.
+        HTTPException: If registration fails or the server is busy.
     """
     try:
-        user = UserService.create_user(
+        user = await UserService.create_user(
             db,
             username=user_data.username,
             email=user_data.email,
             password=user_data.password,
         )
         return user
+    except PasswordHasherBusyError as e:
+        logger.warning("Registration rejected: password hashing saturated")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server busy, please retry",
+            headers={"Retry-After": str(e.retry_after)},
+        )
     except ValueError as e:
-        logger.warning(f"Registration failed: {e}")
+        logger.warning("Registration failed: %s", e)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e),
@@ -57,7 +65,7 @@ async def register(
 @router.post("/login", response_model=TokenResponse)
 async def login(
     credentials: UserLogin,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Authenticate user and return access token.
 
@@ -69,16 +77,24 @@ async def login(
         Access token.
 
     Raises:
-        HTTPException: If authentication fails.
+        HTTPException: If authentication fails or the server is busy.
     """
-    user = UserService.authenticate_user(
-        db,
-        username=credentials.username,
-        password=credentials.password,
-    )
+    try:
+        user = await UserService.authenticate_user(
+            db,
+            username=credentials.username,
+            password=credentials.password,
+        )
+    except PasswordHasherBusyError as e:
+        logger.warning("Login rejected: password hashing saturated")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server busy, please retry",
+            headers={"Retry-After": str(e.retry_after)},
+        )
 
     if not user:
-        logger.warning(f"Login failed for user: {credentials.username}")
+        logger.warning("Login failed for user: %s", credentials.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials",
@@ -89,6 +105,6 @@ async def login(
         data={"sub": str(user.id)}, expires_delta=access_token_expires
     )
 
-    logger.info(f"User logged in: {user.username}")
+    logger.info("User logged in: %s", user.username)
 
     return TokenResponse(access_token=access_token)
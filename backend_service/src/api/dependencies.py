@@ -1,61 +1,121 @@
-"""Authentication dependencies."""
+"""Authentication and shared service dependencies."""
 
-from fastapi import Depends, HTTPException, status
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Request, status
 
 # from fastapi.security import HTTPBearer, HTTPAuthCredentials
 from fastapi.security import HTTPBearer
 from fastapi.security.http import HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.db import get_db
-from src.core import decode_access_token
-from src.services import UserService
+from src.db import get_async_db
+from src.core import RateLimiter, decode_access_token
+from src.core.metrics import jwt_decode_seconds, user_lookup_seconds
+from src.services import LLMService, UserService
+from src.services.user_cache import UserSnapshot, user_cache
+from config.settings import get_settings
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
+settings = get_settings()
 
 security = HTTPBearer()
 
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db),
-):
+    db: AsyncSession = Depends(get_async_db),
+) -> UserSnapshot:
     """Get current authenticated user.
 
+    Verified token claims and user snapshots are served from the user
+    cache when possible.
+
     Args:
         credentials: HTTP bearer credentials.
         db: Database session.
 
     Returns:
-        Authenticated user.
+        Authenticated user snapshot.
 
     Raises:
         HTTPException: If authentication fails.
     """
     token = credentials.credentials
+    use_cache = settings.user_cache_enabled
 
     try:
-        payload = decode_access_token(token)
+        with jwt_decode_seconds.time():
+            payload = user_cache.get_claims(token) if use_cache else None
+            if payload is None:
+                payload = decode_access_token(token)
+                if use_cache:
+                    user_cache.set_claims(token, payload)
 
-        user_id: int = payload.get("sub")
-        if user_id is None:
+        subject = payload.get("sub")
+        if subject is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid token",
             )
+        user_id = int(subject)
     except Exception as e:
-        logger.error(f"Token validation failed: {e}")
+        logger.error("Token validation failed: %s", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token",
         )
 
-    user = UserService.get_user_by_id(db, user_id)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
-        )
+    with user_lookup_seconds.time():
+        user = await user_cache.get_user(user_id) if use_cache else None
+        if user is not None:
+            return user
+
+        db_user = await UserService.get_user_by_id(db, user_id)
+        if db_user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found",
+            )
+
+        user = UserSnapshot.from_user(db_user)
+        if use_cache:
+            await user_cache.set_user(user)
+        return user
+
+
+def get_llm_service(request: Request) -> LLMService:
+    """Get the LLM service created by the application lifespan.
+
+    Args:
+        request: Current request.
+
+    Returns:
+        Shared LLM service.
+    """
+    return request.app.state.llm_service
+
+
+def get_rate_limiter(request: Request) -> RateLimiter:
+    """Get the daily query limiter created by the application lifespan.
 
-    return user
+    Args:
+        request: Current request.
+
+    Returns:
+        Query rate limiter.
+    """
+    return request.app.state.rate_limiter
+
+
+def get_token_limiter(request: Request) -> Optional[RateLimiter]:
+    """Get the token budget limiter created by the application lifespan.
+
+    Args:
+        request: Current request.
+
+    Returns:
+        Token limiter, or None when token budgets are disabled.
+    """
+    return request.app.state.token_limiter
@@ -1,112 +1,501 @@
 """Query endpoints."""
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-
-from src.db import get_db
-from src.core import QueryRequest, QueryResponse
-from src.core.rate_limiter import RateLimiter
-from src.services import LLMService
-from src.api.dependencies import get_current_user
+import json
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.db import get_async_db
+from src.core import (
+    BatchQueryItem,
+    BatchQueryRequest,
+    BatchQueryResponse,
+    QueryRequest,
+    QueryResponse,
+)
+from src.core.rate_limiter import QuotaStatus, RateLimiter
+from src.core.metrics import rate_limit_seconds
+from src.services import LLMService, LLMUnavailableError, SchedulerBusyError
+from src.api.dependencies import (
+    get_current_user,
+    get_llm_service,
+    get_rate_limiter,
+    get_token_limiter,
+)
 from src.utils.logger import get_logger
+from config.settings import get_settings
 
 logger = get_logger(__name__)
+settings = get_settings()
 
 router = APIRouter(prefix="/queries", tags=["queries"])
-rate_limiter = RateLimiter()
-llm_service = LLMService()
+
+
+def _rate_limit_exceeded(user_id: int, quota: QuotaStatus) -> HTTPException:
+    """Build the error returned when a user is over quota.
+
+    Args:
+        user_id: User ID.
+        quota: Quota status from the rejected reservation.
+
+    Returns:
+        HTTP 429 exception.
+    """
+    logger.warning("Rate limit exceeded for user %s (%s)", user_id, quota.limited_by)
+    headers = None
+    if quota.retry_after is not None:
+        headers = {"Retry-After": str(quota.retry_after)}
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=(
+            f"Query limit exceeded ({quota.limited_by}). "
+            f"Remaining: {quota.remaining}. Resets at {quota.reset_at}"
+        ),
+        headers=headers,
+    )
+
+
+# Errors refusing an LLM call up front, answered with 503 and Retry-After
+LLM_REFUSED = (SchedulerBusyError, LLMUnavailableError)
+LLMRefusedError = SchedulerBusyError | LLMUnavailableError
+
+
+def _refused_detail(error: LLMRefusedError) -> str:
+    """Describe why an LLM call was refused.
+
+    Args:
+        error: ``SchedulerBusyError`` or ``LLMUnavailableError``.
+
+    Returns:
+        Error detail for the client.
+    """
+    if isinstance(error, LLMUnavailableError):
+        return "LLM provider unavailable, please retry"
+    return "Server busy, please retry"
+
+
+def _llm_refused(user_id: int, error: LLMRefusedError) -> HTTPException:
+    """Build the error returned when an LLM call is refused up front.
+
+    Args:
+        user_id: User ID.
+        error: ``SchedulerBusyError`` or ``LLMUnavailableError``.
+
+    Returns:
+        HTTP 503 exception.
+    """
+    logger.warning("Query rejected for user %s: %s", user_id, error)
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=_refused_detail(error),
+        headers={"Retry-After": str(error.retry_after)},
+    )
+
+
+class Quota:
+    """Query and token quota charged for the queries of one request."""
+
+    def __init__(
+        self,
+        rate_limiter: RateLimiter,
+        token_limiter: Optional[RateLimiter],
+        llm_service: LLMService,
+    ):
+        """Initialize quota.
+
+        Args:
+            rate_limiter: Daily query limiter.
+            token_limiter: Token budget limiter, None when disabled.
+            llm_service: LLM service estimating token costs.
+        """
+        self.rate_limiter = rate_limiter
+        self.token_limiter = token_limiter
+        self.llm_service = llm_service
+        # Windows charged by the reservation, refunded there if it rolls over
+        self._query_windows: tuple[Optional[str], ...] = ()
+        self._token_windows: tuple[Optional[str], ...] = ()
+
+    async def reserve(self, user_id: int, queries: list[str]) -> int:
+        """Reserve one query each and the estimated token cost in one step.
+
+        Args:
+            user_id: User ID.
+            queries: User queries.
+
+        Returns:
+            Number of tokens reserved.
+
+        Raises:
+            HTTPException: If either quota is exhausted.
+        """
+        with rate_limit_seconds.time():
+            quota = await self.rate_limiter.reserve(user_id, len(queries))
+            if not quota.allowed:
+                raise _rate_limit_exceeded(user_id, quota)
+            self._query_windows = quota.windows
+
+            if self.token_limiter is None:
+                return 0
+            estimate = sum(self.llm_service.estimate_tokens(query) for query in queries)
+            budget = await self.token_limiter.reserve(user_id, estimate)
+            if not budget.allowed:
+                await self.rate_limiter.refund(
+                    user_id, len(queries), windows=self._query_windows
+                )
+                raise _rate_limit_exceeded(user_id, budget)
+            self._token_windows = budget.windows
+            return estimate
+
+    async def release(self, user_id: int, reserved_tokens: int, count: int = 1) -> None:
+        """Refund a reservation for queries that were not charged.
+
+        Args:
+            user_id: User ID.
+            reserved_tokens: Number of tokens reserved.
+            count: Number of queries reserved.
+        """
+        await self.rate_limiter.refund(user_id, count, windows=self._query_windows)
+        if self.token_limiter is not None:
+            await self.token_limiter.refund(
+                user_id, reserved_tokens, windows=self._token_windows
+            )
+
+    async def settle(
+        self, user_id: int, reserved_tokens: int, results: list[dict], failed: int = 0
+    ) -> None:
+        """Settle a reservation once the query results are known.
+
+        Cached and failed queries are refunded; the token reservation is
+        replaced with the reported usage.
+
+        Args:
+            user_id: User ID.
+            reserved_tokens: Number of tokens reserved.
+            results: Successful query results with ``cached`` and ``tokens_used``.
+            failed: Number of failed queries.
+        """
+        uncharged = failed + sum(1 for result in results if result["cached"])
+        if uncharged:
+            # The request itself stays charged unless none of it was
+            whole = uncharged == len(results) + failed
+            await self.rate_limiter.refund(
+                user_id, uncharged, requests=int(whole), windows=self._query_windows
+            )
+        if self.token_limiter is not None:
+            tokens_used = sum(
+                result["tokens_used"] for result in results if not result["cached"]
+            )
+            await self.token_limiter.settle(
+                user_id, reserved_tokens, tokens_used, windows=self._token_windows
+            )
+
+
+def get_quota(
+    rate_limiter: RateLimiter = Depends(get_rate_limiter),
+    token_limiter: Optional[RateLimiter] = Depends(get_token_limiter),
+    llm_service: LLMService = Depends(get_llm_service),
+) -> Quota:
+    """Get the quota charged by the current request."""
+    return Quota(rate_limiter, token_limiter, llm_service)
 
 
 @router.post("/", response_model=QueryResponse)
 async def create_query(
     query_data: QueryRequest,
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    quota: Quota = Depends(get_quota),
+    llm_service: LLMService = Depends(get_llm_service),
 ):
     """Process a user query with LLM.
 
     Args:
         query_data: Query request data.
         current_user: Current authenticated user.
-        db: Database session.
+        quota: Quota charged for the query.
+        llm_service: LLM service.
 
     Returns:
         Query response from LLM.
 
     Raises:
-        HTTPException: If rate limited or processing fails.
+        HTTPException: If rate limited, the LLM queue is full, no LLM
+            provider is available, or processing fails.
     """
-    # Check rate limit
-    if rate_limiter.is_rate_limited(current_user.id):
-        remaining = rate_limiter.get_remaining_queries(current_user.id)
-        reset_time = rate_limiter.get_reset_time(current_user.id)
-        logger.warning(f"Rate limit exceeded for user {current_user.id}")
-        raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail=f"Query limit exceeded. Remaining: {remaining}. Resets at {reset_time}",
-        )
+    # Reserve quota before calling the LLM
+    reserved_tokens = await quota.reserve(current_user.id, [query_data.query])
+    settled = False
 
     try:
         # Process query
         response = await llm_service.process_query(
             current_user.id,
             query_data.query,
-            db,
         )
 
-        # Increment counter
-        rate_limiter.increment_query_count(current_user.id)
+        # Cache hits do not count against the quota
+        await quota.settle(current_user.id, reserved_tokens, [response])
+        settled = True
 
-        logger.info(f"Query processed for user {current_user.id}")
+        logger.info("Query processed for user %s", current_user.id)
 
         return QueryResponse(**response)
 
+    except LLM_REFUSED as e:
+        raise _llm_refused(current_user.id, e)
     except Exception as e:
-        logger.error(f"Error processing query: {e}")
+        logger.error("Error processing query: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to process query",
         )
+    finally:
+        # Refund failed queries, and ones the client gave up on
+        if not settled:
+            await quota.release(current_user.id, reserved_tokens)
+
+
+@router.post("/batch", response_model=BatchQueryResponse)
+async def create_query_batch(
+    batch_data: BatchQueryRequest,
+    current_user=Depends(get_current_user),
+    quota: Quota = Depends(get_quota),
+    llm_service: LLMService = Depends(get_llm_service),
+):
+    """Process several queries concurrently in one request.
+
+    Quota for the whole batch is reserved up front; cached and failed
+    items are refunded afterwards. Failures are reported per item,
+    including items the LLM call was refused for.
+
+    Args:
+        batch_data: Batch query request data.
+        current_user: Current authenticated user.
+        quota: Quota charged for the queries.
+        llm_service: LLM service.
+
+    Returns:
+        Per-item results in request order.
+
+    Raises:
+        HTTPException: If rate limited, the LLM queue is full, no LLM
+            provider is available, or processing fails.
+    """
+    try:
+        llm_service.admit(current_user.id)
+    except LLM_REFUSED as e:
+        raise _llm_refused(current_user.id, e)
+
+    queries = [item.query for item in batch_data.queries]
+    reserved_tokens = await quota.reserve(current_user.id, queries)
+
+    try:
+        outcomes = await llm_service.process_batch(
+            current_user.id, queries, settings.batch_max_concurrency
+        )
+    except BaseException as e:
+        # Refund the whole batch, also when the client gave up on it
+        await quota.release(current_user.id, reserved_tokens, len(queries))
+        if not isinstance(e, Exception):
+            raise
+        logger.error("Error processing query batch: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to process query batch",
+        )
+
+    results = []
+    succeeded = []
+    for index, outcome in enumerate(outcomes):
+        if isinstance(outcome, LLM_REFUSED):
+            results.append(BatchQueryItem(index=index, error=_refused_detail(outcome)))
+        elif isinstance(outcome, BaseException):
+            results.append(BatchQueryItem(index=index, error="Failed to process query"))
+        else:
+            succeeded.append(outcome)
+            results.append(
+                BatchQueryItem(index=index, response=QueryResponse(**outcome))
+            )
+
+    failed = len(outcomes) - len(succeeded)
+    await quota.settle(current_user.id, reserved_tokens, succeeded, failed)
+
+    logger.info("Query batch processed for user %s", current_user.id)
+
+    return BatchQueryResponse(results=results, succeeded=len(succeeded), failed=failed)
+
+
+@router.post("/stream")
+async def create_query_stream(
+    query_data: QueryRequest,
+    current_user=Depends(get_current_user),
+    quota: Quota = Depends(get_quota),
+    llm_service: LLMService = Depends(get_llm_service),
+):
+    """Process a user query with LLM, streaming tokens as Server-Sent Events.
+
+    Each event carries a JSON object with a ``type`` of ``token``, ``done``
+    or ``error``.
+
+    Args:
+        query_data: Query request data.
+        current_user: Current authenticated user.
+        quota: Quota charged for the query.
+        llm_service: LLM service.
+
+    Returns:
+        Streaming response of LLM tokens.
+
+    Raises:
+        HTTPException: If rate limited, the LLM queue is full, or no LLM
+            provider is available.
+    """
+    # The status is sent with the first event, so reject before streaming
+    user_id = current_user.id
+    try:
+        llm_service.admit(user_id)
+    except LLM_REFUSED as e:
+        raise _llm_refused(user_id, e)
+
+    # Reserve quota before opening the stream
+    reserved_tokens = await quota.reserve(user_id, [query_data.query])
+
+    async def event_stream():
+        settled = False
+        try:
+            async for event in llm_service.stream_query(user_id, query_data.query):
+                if event["type"] == "done":
+                    # Cache hits do not count against the quota
+                    await quota.settle(user_id, reserved_tokens, [event])
+                    settled = True
+                yield f"data: {json.dumps(event)}\n\n"
+        except LLM_REFUSED as e:
+            logger.warning("Stream rejected for user %s: %s", user_id, e)
+            error = {"type": "error", "detail": _refused_detail(e)}
+            yield f"data: {json.dumps(error)}\n\n"
+        except Exception as e:
+            logger.error("Error streaming query: %s", e)
+            error = {"type": "error", "detail": "Failed to process query"}
+            yield f"data: {json.dumps(error)}\n\n"
+        finally:
+            # Refund failed and disconnected streams
+            if not settled:
+                await quota.release(user_id, reserved_tokens)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/history")
 async def get_query_history(
-    limit: int = 10,
+    limit: int = Query(10, ge=1, le=settings.history_max_page_size),
+    cursor: Optional[str] = None,
+    view: Literal["full", "preview"] = "full",
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    """Get query history for current user.
+    """Get a page of query history for current user, newest first.
 
     Args:
         limit: Maximum number of records.
+        cursor: ``next_cursor`` of the previous page.
+        view: ``preview`` to return only the start of each response.
         current_user: Current authenticated user.
         db: Database session.
 
     Returns:
-        List of query history.
+        Page of query history and the cursor of the next page.
+
+    Raises:
+        HTTPException: If the cursor is invalid.
     """
-    history = LLMService.get_query_history(db, current_user.id, limit)
-    return {"queries": history, "count": len(history)}
+    try:
+        history, next_cursor = await LLMService.get_query_history(
+            db, current_user.id, limit, cursor, preview=view == "preview"
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return {"queries": history, "count": len(history), "next_cursor": next_cursor}
 
 
 @router.get("/stats")
 async def get_query_stats(
     current_user=Depends(get_current_user),
+    rate_limiter: RateLimiter = Depends(get_rate_limiter),
+    token_limiter: Optional[RateLimiter] = Depends(get_token_limiter),
 ):
     """Get query statistics for current user.
 
     Args:
         current_user: Current authenticated user.
+        rate_limiter: Daily query limiter.
+        token_limiter: Token budget limiter, None when disabled.
 
     Returns:
         Query statistics.
     """
-    used = rate_limiter.get_user_query_count(current_user.id)
-    remaining = rate_limiter.get_remaining_queries(current_user.id)
-    reset_time = rate_limiter.get_reset_time(current_user.id)
+    quota = await rate_limiter.get_status(current_user.id)
+    stats = {
+        "queries_used_today": quota.used,
+        "queries_remaining": quota.remaining,
+        "reset_at": quota.reset_at,
+        "rate_limit_mode": rate_limiter.mode,
+    }
+
+    if token_limiter is not None:
+        budget = await token_limiter.get_status(current_user.id)
+        stats["tokens_used_today"] = budget.used
+        stats["tokens_remaining"] = budget.remaining
+
+    return stats
+
+
+@router.get("/cache/stats")
+async def get_cache_stats(
+    current_user=Depends(get_current_user),
+    llm_service: LLMService = Depends(get_llm_service),
+):
+    """Get response cache statistics.
+
+    Args:
+        current_user: Current authenticated user.
+        llm_service: LLM service.
 
+    Returns:
+        Hit and miss counters per cache, or None for disabled caches.
+    """
+    return {
+        "exact": llm_service.cache.stats() if llm_service.cache else None,
+        "semantic": (
+            llm_service.semantic_cache.stats() if llm_service.semantic_cache else None
+        ),
+        "single_flight": (
+            llm_service.single_flight.stats() if llm_service.single_flight else None
+        ),
+    }
+
+
+@router.get("/llm/status")
+async def get_llm_status(
+    current_user=Depends(get_current_user),
+    llm_service: LLMService = Depends(get_llm_service),
+):
+    """Get the state of the LLM provider pool and call queue.
+
+    Args:
+        current_user: Current authenticated user.
+        llm_service: LLM service.
+
+    Returns:
+        Circuit breaker, latency and timeout state per provider (None
+        before the pool is created) and the scheduler counters.
+    """
+    router = llm_service.router
     return {
-        "queries_used_today": used,
-        "queries_remaining": remaining,
-        "reset_at": reset_time,
+        "providers": router.stats() if router else None,
+        "scheduler": llm_service.scheduler.stats(),
     }
@@ -3,10 +3,19 @@
 from .auth import (
     hash_password,
     verify_password,
+    hash_password_async,
+    verify_password_async,
+    password_needs_rehash,
+    PasswordHasherBusyError,
     create_access_token,
     decode_access_token,
 )
-from .rate_limiter import RateLimiter
+from .limiter_algorithms import (
+    FixedWindowLimiter,
+    SlidingWindowLimiter,
+    TokenBucketLimiter,
+)
+from .rate_limiter import QuotaStatus, RateLimiter
 from .schemas import (
     UserRegister,
     UserLogin,
@@ -14,13 +23,25 @@ from .schemas import (
     TokenResponse,
     QueryRequest,
     QueryResponse,
+    BatchQueryRequest,
+    BatchQueryItem,
+    BatchQueryResponse,
+    ProfilingUpdate,
 )
 
 __all__ = [
     "hash_password",
     "verify_password",
+    "hash_password_async",
+    "verify_password_async",
+    "password_needs_rehash",
+    "PasswordHasherBusyError",
     "create_access_token",
     "decode_access_token",
+    "FixedWindowLimiter",
+    "SlidingWindowLimiter",
+    "TokenBucketLimiter",
+    "QuotaStatus",
     "RateLimiter",
     "UserRegister",
     "UserLogin",
@@ -28,4 +49,8 @@ __all__ = [
     "TokenResponse",
     "QueryRequest",
     "QueryResponse",
+    "BatchQueryRequest",
+    "BatchQueryItem",
+    "BatchQueryResponse",
+    "ProfilingUpdate",
 ]
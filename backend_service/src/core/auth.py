@@ -1,14 +1,39 @@
 """Authentication utilities."""
 
+import asyncio
 import bcrypt
 import jwt
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
-from typing import Optional
+from typing import Callable, Optional, TypeVar
 
+from src.utils.profiling import RequestProfiler
 from config.settings import get_settings
 
 settings = get_settings()
 
+T = TypeVar("T")
+
+# bcrypt releases the GIL, so a small thread pool keeps it off the event loop
+_password_executor = ThreadPoolExecutor(
+    max_workers=settings.password_hash_workers,
+    thread_name_prefix="password-hash",
+)
+_pending_password_jobs = 0
+
+
+class PasswordHasherBusyError(Exception):
+    """Raised when too many password hashing jobs are already pending."""
+
+    def __init__(self, retry_after: int):
+        """Initialize error.
+
+        Args:
+            retry_after: Seconds the client should wait before retrying.
+        """
+        super().__init__("Password hashing capacity exhausted")
+        self.retry_after = retry_after
+
 
 def hash_password(password: str) -> str:
     """Hash a password using bcrypt.
@@ -19,7 +44,7 @@ def hash_password(password: str) -> str:
     Returns:
         Hashed password.
     """
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=settings.bcrypt_rounds)
     return bcrypt.hashpw(password.encode(), salt).decode()
 
 
@@ -36,6 +61,85 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(plain_password.encode(), hashed_password.encode())
 
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Check whether a hash was made with a different bcrypt cost factor.
+
+    Args:
+        hashed_password: Hashed password.
+
+    Returns:
+        True if the password should be rehashed.
+    """
+    try:
+        rounds = int(hashed_password.split("$")[2])
+    except (IndexError, ValueError):
+        return True
+    return rounds != settings.bcrypt_rounds
+
+
+async def _run_password_job(func: Callable[..., T], *args) -> T:
+    """Run a password hashing job in the bounded pool.
+
+    Args:
+        func: Blocking function to run.
+        *args: Function arguments.
+
+    Returns:
+        Function result.
+
+    Raises:
+        PasswordHasherBusyError: If the admission limit is reached.
+    """
+    global _pending_password_jobs
+    if _pending_password_jobs >= settings.password_hash_max_pending:
+        raise PasswordHasherBusyError(settings.password_hash_retry_after_seconds)
+
+    _pending_password_jobs += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            _password_executor, RequestProfiler.attached(func), *args
+        )
+    finally:
+        _pending_password_jobs -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password without blocking the event loop.
+
+    Args:
+        password: Plain text password.
+
+    Returns:
+        Hashed password.
+
+    Raises:
+        PasswordHasherBusyError: If the admission limit is reached.
+    """
+    return await _run_password_job(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password without blocking the event loop.
+
+    Args:
+        plain_password: Plain text password.
+        hashed_password: Hashed password.
+
+    Returns:
+        True if password matches, False otherwise.
+
+    Raises:
+        PasswordHasherBusyError: If the admission limit is reached.
+    """
+    return await _run_password_job(verify_password, plain_password, hashed_password)
+
+
+def shutdown_password_executor() -> None:
+    """Stop the password hashing pool."""
+    _password_executor.shutdown(wait=False, cancel_futures=True)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token.
 
@@ -0,0 +1,599 @@
+"""Rate limit algorithms that can be stacked as tiers of a RateLimiter.
+
+Every algorithm has a Redis implementation, built on Lua scripts so each
+reservation is one atomic round trip, and a local mirror that is used
+while Redis is unavailable.
+"""
+
+import math
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Optional, cast
+
+import redis.asyncio as aioredis
+
+# Limit passed to the scripts for forced reservations
+_UNLIMITED = 2**53
+
+# Atomically admit ``amount`` units if they fit under the limit.
+# KEYS[1]: counter key. ARGV: amount, limit, expire-at (epoch seconds).
+# Returns {allowed, count}.
+_FIXED_WINDOW_RESERVE = """
+local count = tonumber(redis.call("GET", KEYS[1]) or "0")
+local amount = tonumber(ARGV[1])
+if count + amount > tonumber(ARGV[2]) then
+    return {0, count}
+end
+count = redis.call("INCRBY", KEYS[1], amount)
+if redis.call("TTL", KEYS[1]) < 0 then
+    redis.call("EXPIREAT", KEYS[1], ARGV[3])
+end
+return {1, count}
+"""
+
+# Give back up to ``amount`` previously reserved units, never going below 0.
+# KEYS[1]: counter key. ARGV: amount. Returns the new count.
+_COUNTER_REFUND = """
+local count = tonumber(redis.call("GET", KEYS[1]) or "0")
+local amount = math.min(count, tonumber(ARGV[1]))
+if amount <= 0 then
+    return count
+end
+return redis.call("DECRBY", KEYS[1], amount)
+"""
+
+# Sliding window counter: the previous window counts in proportion to how
+# much of it still overlaps the sliding window.
+# KEYS[1]: current window key, KEYS[2]: previous window key.
+# ARGV: amount, limit, previous window weight, expiry (ms).
+# Returns {allowed, current count, previous count}.
+_SLIDING_WINDOW_RESERVE = """
+local current = tonumber(redis.call("GET", KEYS[1]) or "0")
+local previous = tonumber(redis.call("GET", KEYS[2]) or "0")
+local amount = tonumber(ARGV[1])
+if previous * tonumber(ARGV[3]) + current + amount > tonumber(ARGV[2]) then
+    return {0, current, previous}
+end
+current = redis.call("INCRBY", KEYS[1], amount)
+redis.call("PEXPIRE", KEYS[1], ARGV[4])
+return {1, current, previous}
+"""
+
+# Token bucket refilled continuously at ``rate`` tokens per second.
+# KEYS[1]: bucket hash. ARGV: amount, capacity, rate, now (epoch seconds),
+# expiry (ms), mode ("take", "force" or "give").
+# Returns {allowed, tokens} with tokens as a string to keep fractions.
+_TOKEN_BUCKET = """
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[4])
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "ts")
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * tonumber(ARGV[3]))
+local amount = tonumber(ARGV[1])
+local allowed = 1
+if ARGV[6] == "give" then
+    tokens = math.min(capacity, tokens + amount)
+elseif ARGV[6] == "force" then
+    tokens = tokens - amount
+elseif tokens >= amount then
+    tokens = tokens - amount
+else
+    allowed = 0
+end
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "ts", tostring(now))
+redis.call("PEXPIRE", KEYS[1], ARGV[5])
+return {allowed, tostring(tokens)}
+"""
+
+
+@dataclass(frozen=True)
+class TierStatus:
+    """State of one limiter tier after a reservation or lookup."""
+
+    name: str
+    allowed: bool
+    used: int
+    limit: int
+    reset_after: Optional[float]
+    retry_after: float = 0.0
+    # Window a reservation was charged to, for refunding it there later
+    window: Optional[str] = None
+
+    @property
+    def remaining(self) -> int:
+        """Units still available in this tier."""
+        return max(0, self.limit - self.used)
+
+
+class _LocalState:
+    """In-process values that expire at a given time.
+
+    Expired entries are dropped when read and by a sweep that runs at most
+    once per ``sweep_seconds``, so the state of users who do not come back
+    does not accumulate while Redis is down.
+    """
+
+    def __init__(self, sweep_seconds: float = 60.0):
+        """Initialize state.
+
+        Args:
+            sweep_seconds: Minimum time between sweeps of expired entries.
+        """
+        self.sweep_seconds = sweep_seconds
+        self._entries: dict[str, tuple[object, float]] = {}
+        self._next_sweep = 0.0
+
+    def __len__(self) -> int:
+        """Number of stored entries, including expired ones not swept yet."""
+        return len(self._entries)
+
+    def get(self, key: str, default: object = None) -> object:
+        """Get an unexpired value."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        if entry[1] <= time.time():
+            del self._entries[key]
+            return default
+        return entry[0]
+
+    def set(self, key: str, value: object, expire_at: float) -> None:
+        """Store a value until ``expire_at`` (epoch seconds)."""
+        now = time.time()
+        if now >= self._next_sweep:
+            self._entries = {
+                k: entry for k, entry in self._entries.items() if entry[1] > now
+            }
+            self._next_sweep = now + self.sweep_seconds
+        self._entries[key] = (value, expire_at)
+
+    def expire_at(self, key: str) -> Optional[float]:
+        """Get the expiry of an unexpired value."""
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= time.time():
+            return None
+        return entry[1]
+
+
+class _LocalCounters(_LocalState):
+    """In-process counters that expire at a given time."""
+
+    def get(self, key: str, default: object = 0) -> int:
+        """Get an unexpired counter value."""
+        return cast(int, super().get(key, default))
+
+    def add(self, key: str, amount: int, expire_at: float) -> int:
+        """Add to a counter, never going below 0.
+
+        Returns:
+            Updated count.
+        """
+        count = max(0, self.get(key) + amount)
+        self.set(key, count, self.expire_at(key) or expire_at)
+        return count
+
+
+class LimiterAlgorithm(ABC):
+    """One rate limit tier: at most ``limit`` units per ``window_seconds``."""
+
+    # Charge one unit per request instead of one per query it carries
+    per_request = False
+
+    def __init__(self, name: str, limit: int, window_seconds: float):
+        """Initialize limiter tier.
+
+        Args:
+            name: Tier name, used in Redis keys and error messages.
+            limit: Maximum units per window.
+            window_seconds: Window length in seconds.
+        """
+        self.name = name
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self._scripts: dict[str, object] = {}
+
+    def _key(self, user_id: int, suffix: object) -> str:
+        """Get the Redis key for a user's state in this tier."""
+        return f"rate_limit:{self.name}:{user_id}:{suffix}"
+
+    def _script(self, client: aioredis.Redis, source: str):
+        """Get a registered Lua script, registering it on first use."""
+        script = self._scripts.get(source)
+        if script is None:
+            script = self._scripts[source] = client.register_script(source)
+        return script
+
+    @abstractmethod
+    async def reserve(
+        self, client: aioredis.Redis, user_id: int, amount: int, force: bool = False
+    ) -> TierStatus:
+        """Atomically take ``amount`` units if they are available.
+
+        With ``force`` the units are taken even past the limit, e.g. to
+        settle a reservation that underestimated the real cost.
+        """
+
+    @abstractmethod
+    async def refund(
+        self,
+        client: aioredis.Redis,
+        user_id: int,
+        amount: int,
+        window: Optional[str] = None,
+    ) -> None:
+        """Give back previously reserved units.
+
+        ``window`` is the ``TierStatus.window`` of the reservation, so units
+        go back to the window they were taken from even after it rolled
+        over; without it they go back to the current window.
+        """
+
+    @abstractmethod
+    async def status(self, client: aioredis.Redis, user_id: int) -> TierStatus:
+        """Get the tier state without reserving."""
+
+    @abstractmethod
+    def reserve_local(
+        self, user_id: int, amount: int, force: bool = False
+    ) -> TierStatus:
+        """In-process equivalent of ``reserve``."""
+
+    @abstractmethod
+    def refund_local(
+        self, user_id: int, amount: int, window: Optional[str] = None
+    ) -> None:
+        """In-process equivalent of ``refund``."""
+
+    @abstractmethod
+    def status_local(self, user_id: int) -> TierStatus:
+        """In-process equivalent of ``status``."""
+
+
+class FixedWindowLimiter(LimiterAlgorithm):
+    """Counter that resets at fixed window boundaries.
+
+    Cheap and exact, but a user can spend a whole window's allowance at
+    once, and all counters reset at the same moment.
+    """
+
+    def __init__(
+        self, name: str, limit: int, window_seconds: float, offset_seconds: float = 0
+    ):
+        """Initialize fixed window tier.
+
+        Args:
+            name: Tier name.
+            limit: Maximum units per window.
+            window_seconds: Window length in seconds.
+            offset_seconds: Shift of window boundaries from the epoch, e.g.
+                the reset hour for daily windows.
+        """
+        super().__init__(name, limit, window_seconds)
+        self.offset_seconds = offset_seconds
+        self._local = _LocalCounters()
+
+    def _window(self, suffix: Optional[str] = None) -> tuple[str, float]:
+        """Get a window suffix, the current one by default, and its end time."""
+        if suffix is None:
+            index = int((time.time() - self.offset_seconds) // self.window_seconds)
+        else:
+            index = int(suffix)
+        return str(index), (index + 1) * self.window_seconds + self.offset_seconds
+
+    def _tier_status(
+        self, allowed: bool, count: int, end: float, suffix: Optional[str] = None
+    ) -> TierStatus:
+        """Build the status of the current window."""
+        reset_after = max(0.0, end - time.time())
+        return TierStatus(
+            name=self.name,
+            allowed=allowed,
+            used=count,
+            limit=self.limit,
+            reset_after=reset_after,
+            retry_after=0.0 if allowed else reset_after,
+            window=suffix if allowed else None,
+        )
+
+    async def reserve(
+        self, client: aioredis.Redis, user_id: int, amount: int, force: bool = False
+    ) -> TierStatus:
+        suffix, end = self._window()
+        allowed, count = await self._script(client, _FIXED_WINDOW_RESERVE)(
+            keys=[self._key(user_id, suffix)],
+            args=[amount, _UNLIMITED if force else self.limit, math.ceil(end)],
+            client=client,
+        )
+        return self._tier_status(bool(allowed), int(count), end, suffix)
+
+    async def refund(
+        self,
+        client: aioredis.Redis,
+        user_id: int,
+        amount: int,
+        window: Optional[str] = None,
+    ) -> None:
+        suffix, _ = self._window(window)
+        await self._script(client, _COUNTER_REFUND)(
+            keys=[self._key(user_id, suffix)], args=[amount], client=client
+        )
+
+    async def status(self, client: aioredis.Redis, user_id: int) -> TierStatus:
+        suffix, end = self._window()
+        count = int(await client.get(self._key(user_id, suffix)) or 0)
+        return self._tier_status(count < self.limit, count, end)
+
+    def reserve_local(
+        self, user_id: int, amount: int, force: bool = False
+    ) -> TierStatus:
+        suffix, end = self._window()
+        key = self._key(user_id, suffix)
+        count = self._local.get(key)
+        if count + amount > self.limit and not force:
+            return self._tier_status(False, count, end)
+        count = self._local.add(key, amount, end)
+        return self._tier_status(True, count, end, suffix)
+
+    def refund_local(
+        self, user_id: int, amount: int, window: Optional[str] = None
+    ) -> None:
+        suffix, end = self._window(window)
+        self._local.add(self._key(user_id, suffix), -amount, end)
+
+    def status_local(self, user_id: int) -> TierStatus:
+        suffix, end = self._window()
+        count = self._local.get(self._key(user_id, suffix))
+        return self._tier_status(count < self.limit, count, end)
+
+
+class SlidingWindowLimiter(LimiterAlgorithm):
+    """Sliding window counter.
+
+    Approximates a sliding window log with two fixed-window counters: the
+    previous window is weighted by how much of it the sliding window still
+    covers. Usage drains gradually instead of resetting at a boundary.
+    """
+
+    def __init__(self, name: str, limit: int, window_seconds: float):
+        """Initialize sliding window tier.
+
+        Args:
+            name: Tier name.
+            limit: Maximum units per sliding window.
+            window_seconds: Window length in seconds.
+        """
+        super().__init__(name, limit, window_seconds)
+        self._local = _LocalCounters()
+
+    def _window(self) -> tuple[int, float]:
+        """Get the current window index and the previous window's weight."""
+        index, elapsed = divmod(time.time(), self.window_seconds)
+        return int(index), 1 - elapsed / self.window_seconds
+
+    def _tier_status(
+        self,
+        allowed: bool,
+        amount: int,
+        current: int,
+        previous: int,
+        weight: float,
+        index: Optional[int] = None,
+    ) -> TierStatus:
+        """Build the status of the sliding window."""
+        used = math.ceil(previous * weight) + current
+        until_boundary = weight * self.window_seconds
+        retry_after = 0.0
+        if not allowed:
+            # The previous window's share decays linearly to the boundary
+            excess = previous * weight + current + amount - self.limit
+            if previous and excess <= previous * weight:
+                retry_after = excess / previous * self.window_seconds
+            else:
+                retry_after = until_boundary
+        return TierStatus(
+            name=self.name,
+            allowed=allowed,
+            used=used,
+            limit=self.limit,
+            reset_after=until_boundary + (self.window_seconds if current else 0),
+            retry_after=retry_after,
+            window=str(index) if allowed and index is not None else None,
+        )
+
+    async def reserve(
+        self, client: aioredis.Redis, user_id: int, amount: int, force: bool = False
+    ) -> TierStatus:
+        index, weight = self._window()
+        allowed, current, previous = await self._script(
+            client, _SLIDING_WINDOW_RESERVE
+        )(
+            keys=[self._key(user_id, index), self._key(user_id, index - 1)],
+            args=[
+                amount,
+                _UNLIMITED if force else self.limit,
+                weight,
+                math.ceil(self.window_seconds * 2000),
+            ],
+            client=client,
+        )
+        return self._tier_status(
+            bool(allowed), amount, int(current), int(previous), weight, index
+        )
+
+    async def refund(
+        self,
+        client: aioredis.Redis,
+        user_id: int,
+        amount: int,
+        window: Optional[str] = None,
+    ) -> None:
+        key = window if window is not None else self._window()[0]
+        await self._script(client, _COUNTER_REFUND)(
+            keys=[self._key(user_id, key)], args=[amount], client=client
+        )
+
+    async def status(self, client: aioredis.Redis, user_id: int) -> TierStatus:
+        index, weight = self._window()
+        values = await client.mget(
+            self._key(user_id, index), self._key(user_id, index - 1)
+        )
+        current, previous = (int(value or 0) for value in values)
+        allowed = previous * weight + current < self.limit
+        return self._tier_status(allowed, 1, current, previous, weight)
+
+    def reserve_local(
+        self, user_id: int, amount: int, force: bool = False
+    ) -> TierStatus:
+        index, weight = self._window()
+        key = self._key(user_id, index)
+        current = self._local.get(key)
+        previous = self._local.get(self._key(user_id, index - 1))
+        if previous * weight + current + amount > self.limit and not force:
+            return self._tier_status(False, amount, current, previous, weight)
+        expire_at = time.time() + self.window_seconds * 2
+        current = self._local.add(key, amount, expire_at)
+        return self._tier_status(True, amount, current, previous, weight, index)
+
+    def refund_local(
+        self, user_id: int, amount: int, window: Optional[str] = None
+    ) -> None:
+        key = window if window is not None else self._window()[0]
+        self._local.add(self._key(user_id, key), -amount, time.time())
+
+    def status_local(self, user_id: int) -> TierStatus:
+        index, weight = self._window()
+        current = self._local.get(self._key(user_id, index))
+        previous = self._local.get(self._key(user_id, index - 1))
+        allowed = previous * weight + current < self.limit
+        return self._tier_status(allowed, 1, current, previous, weight)
+
+
+class TokenBucketLimiter(LimiterAlgorithm):
+    """Token bucket holding up to ``limit`` tokens.
+
+    Tokens refill continuously at ``limit / window_seconds`` per second, so
+    a user can burst up to the capacity and is then paced at the refill
+    rate.
+    """
+
+    def __init__(self, name: str, limit: int, window_seconds: float):
+        """Initialize token bucket tier.
+
+        Args:
+            name: Tier name.
+            limit: Bucket capacity.
+            window_seconds: Time to refill an empty bucket.
+        """
+        super().__init__(name, limit, window_seconds)
+        self.rate = limit / window_seconds
+        self._local = _LocalState()
+
+    def _tier_status(self, allowed: bool, amount: int, tokens: float) -> TierStatus:
+        """Build the status of the bucket."""
+        return TierStatus(
+            name=self.name,
+            allowed=allowed,
+            used=self.limit - math.floor(tokens),
+            limit=self.limit,
+            reset_after=(self.limit - tokens) / self.rate,
+            retry_after=0.0 if allowed else (amount - tokens) / self.rate,
+        )
+
+    async def _call(
+        self, client: aioredis.Redis, user_id: int, amount: int, mode: str
+    ) -> tuple[bool, float]:
+        """Run the bucket script in ``take``, ``force`` or ``give`` mode."""
+        allowed, tokens = await self._script(client, _TOKEN_BUCKET)(
+            keys=[self._key(user_id, "bucket")],
+            args=[
+                amount,
+                self.limit,
+                self.rate,
+                time.time(),
+                math.ceil(self.window_seconds * 1000) + 1000,
+                mode,
+            ],
+            client=client,
+        )
+        return bool(allowed), float(tokens)
+
+    async def reserve(
+        self, client: aioredis.Redis, user_id: int, amount: int, force: bool = False
+    ) -> TierStatus:
+        allowed, tokens = await self._call(
+            client, user_id, amount, "force" if force else "take"
+        )
+        return self._tier_status(allowed, amount, tokens)
+
+    async def refund(
+        self,
+        client: aioredis.Redis,
+        user_id: int,
+        amount: int,
+        window: Optional[str] = None,
+    ) -> None:
+        # A bucket has no windows; tokens always go back to the one bucket
+        await self._call(client, user_id, amount, "give")
+
+    async def status(self, client: aioredis.Redis, user_id: int) -> TierStatus:
+        stored, ts = await client.hmget(self._key(user_id, "bucket"), "tokens", "ts")
+        tokens = self._refill(stored, ts)
+        return self._tier_status(tokens >= 1, 1, tokens)
+
+    def _refill(
+        self, tokens: Optional[str | bytes | float], ts: Optional[str | bytes | float]
+    ) -> float:
+        """Get the token count after refilling since ``ts``."""
+        if tokens is None or ts is None:
+            return float(self.limit)
+        elapsed = max(0.0, time.time() - float(ts))
+        return min(float(self.limit), float(tokens) + elapsed * self.rate)
+
+    def _local_bucket(self, key: str) -> tuple[Optional[float], Optional[float]]:
+        """Get the stored tokens and timestamp of a local bucket."""
+        bucket = self._local.get(key, (None, None))
+        return cast(tuple[Optional[float], Optional[float]], bucket)
+
+    def _take_local(self, user_id: int, amount: int, mode: str) -> tuple[bool, float]:
+        """In-process version of the bucket script."""
+        key = self._key(user_id, "bucket")
+        tokens = self._refill(*self._local_bucket(key))
+        allowed = True
+        if mode == "give":
+            tokens = min(float(self.limit), tokens + amount)
+        elif mode == "force":
+            tokens -= amount
+        elif tokens >= amount:
+            tokens -= amount
+        else:
+            allowed = False
+        # Forgotten once full again, which is the state of a missing bucket
+        now = time.time()
+        self._local.set(key, (tokens, now), now + (self.limit - tokens) / self.rate)
+        return allowed, tokens
+
+    def reserve_local(
+        self, user_id: int, amount: int, force: bool = False
+    ) -> TierStatus:
+        allowed, tokens = self._take_local(
+            user_id, amount, "force" if force else "take"
+        )
+        return self._tier_status(allowed, amount, tokens)
+
+    def refund_local(
+        self, user_id: int, amount: int, window: Optional[str] = None
+    ) -> None:
+        self._take_local(user_id, amount, "give")
+
+    def status_local(self, user_id: int) -> TierStatus:
+        tokens = self._refill(*self._local_bucket(self._key(user_id, "bucket")))
+        return self._tier_status(tokens >= 1, 1, tokens)
+
+
+ALGORITHMS: dict[str, type[LimiterAlgorithm]] = {
+    "fixed_window": FixedWindowLimiter,
+    "sliding_window": SlidingWindowLimiter,
+    "token_bucket": TokenBucketLimiter,
+}
@@ -0,0 +1,258 @@
+"""Service metrics exposed on ``/metrics``."""
+
+from typing import Any, Callable, Optional
+
+from src.utils.logger import dropped_records
+from src.utils.metrics import CallbackMetric, Counter, Gauge, Histogram, registry
+
+stage_seconds = registry.register(
+    Histogram(
+        "llm_service_stage_duration_seconds",
+        "Time spent in each stage of request handling.",
+        ("stage",),
+    )
+)
+# Children are bound once so recording skips the label lookup
+jwt_decode_seconds = stage_seconds.labels("jwt_decode")
+user_lookup_seconds = stage_seconds.labels("user_lookup")
+rate_limit_seconds = stage_seconds.labels("rate_limit")
+llm_queue_wait_seconds = stage_seconds.labels("llm_queue_wait")
+llm_first_token_seconds = stage_seconds.labels("llm_first_token")
+llm_total_seconds = stage_seconds.labels("llm_total")
+query_log_commit_seconds = stage_seconds.labels("query_log_commit")
+
+redis_command_seconds = registry.register(
+    Histogram(
+        "llm_service_redis_command_duration_seconds",
+        "Redis round trip time by command.",
+        ("command",),
+    )
+)
+
+db_pool_checkout_seconds = registry.register(
+    Histogram(
+        "llm_service_db_pool_checkout_duration_seconds",
+        "Time to get a connection from the database pool, including waiting.",
+    )
+)
+
+llm_calls = registry.register(
+    Counter("llm_service_llm_calls", "Upstream LLM calls by outcome.", ("outcome",))
+)
+llm_calls_ok = llm_calls.labels("ok")
+llm_calls_error = llm_calls.labels("error")
+
+llm_provider_attempts = registry.register(
+    Counter(
+        "llm_service_llm_provider_attempts",
+        "Calls to each LLM provider by outcome; hedges that lost are cancelled.",
+        ("provider", "outcome"),
+    )
+)
+
+llm_hedges = registry.register(
+    Counter(
+        "llm_service_llm_hedges",
+        "Hedged LLM calls by whether the hedge or the original answered first.",
+        ("result",),
+    )
+)
+
+llm_queue_rejected = registry.register(
+    Counter(
+        "llm_service_llm_queue_rejected",
+        "LLM calls turned away by the fair-share scheduler, by reason.",
+        ("reason",),
+    )
+)
+
+llm_upstream_in_use = registry.register(
+    Gauge(
+        "llm_service_llm_upstream_in_use",
+        "Upstream LLM calls currently holding a concurrency slot.",
+    )
+)
+
+
+def register_service_metrics(get_llm_service: Callable[[], Any], async_engine) -> None:
+    """Export counters kept by the service objects, read at scrape time.
+
+    Args:
+        get_llm_service: Returns the running LLM service, or None outside
+            the application lifespan.
+        async_engine: Async database engine.
+    """
+    pool = async_engine.sync_engine.pool
+
+    def caches() -> list[tuple[str, Any]]:
+        llm_service = get_llm_service()
+        if llm_service is None:
+            return []
+        return [
+            (name, cache)
+            for name, cache in (
+                ("exact", llm_service.cache),
+                ("semantic", llm_service.semantic_cache),
+            )
+            if cache is not None
+        ]
+
+    def cache_lookups() -> dict:
+        values = {}
+        for name, cache in caches():
+            values[(name, "hit")] = cache.hits
+            values[(name, "miss")] = cache.misses
+        return values
+
+    def cache_hit_ratio() -> dict:
+        return {(name,): cache.stats()["hit_rate"] for name, cache in caches()}
+
+    def pool_connections() -> dict:
+        if not hasattr(pool, "checkedout"):
+            return {}
+        return {
+            ("checked_out",): pool.checkedout(),
+            ("idle",): pool.checkedin(),
+            ("overflow",): max(pool.overflow(), 0),
+        }
+
+    def router_stats() -> list[dict]:
+        llm_service = get_llm_service()
+        if llm_service is None or llm_service.router is None:
+            return []
+        return llm_service.router.stats()
+
+    def provider_stats(key: str) -> dict:
+        return {
+            (stats["name"],): float(stats[key])
+            for stats in router_stats()
+            if stats[key] is not None
+        }
+
+    def circuit_states() -> dict:
+        return {
+            (stats["name"], state): float(stats["circuit"]["state"] == state)
+            for stats in router_stats()
+            for state in ("closed", "open", "half_open")
+        }
+
+    def circuit_opened() -> dict:
+        return {
+            (stats["name"],): stats["circuit"]["opened"] for stats in router_stats()
+        }
+
+    def coalesced() -> Optional[int]:
+        llm_service = get_llm_service()
+        if llm_service is None or llm_service.single_flight is None:
+            return None
+        return llm_service.single_flight.coalesced
+
+    def log_writer_stats() -> Optional[dict]:
+        llm_service = get_llm_service()
+        return llm_service.log_writer.stats() if llm_service is not None else None
+
+    def log_rows() -> Optional[dict]:
+        llm_service = get_llm_service()
+        if llm_service is None:
+            return None
+        log_writer = llm_service.log_writer
+        return {("written",): log_writer.written, ("failed",): log_writer.failed}
+
+    def scheduler_stats() -> Optional[dict]:
+        llm_service = get_llm_service()
+        return llm_service.scheduler.stats() if llm_service is not None else None
+
+    def queue_calls() -> Optional[dict]:
+        stats = scheduler_stats()
+        if stats is None:
+            return None
+        return {("in_flight",): stats["in_flight"], ("queued",): stats["queued"]}
+
+    for metric in (
+        CallbackMetric(
+            "llm_service_cache_lookups",
+            "Response cache lookups by cache and result.",
+            cache_lookups,
+            ("cache", "result"),
+            type="counter",
+        ),
+        CallbackMetric(
+            "llm_service_cache_hit_ratio",
+            "Share of response cache lookups that hit, since start.",
+            cache_hit_ratio,
+            ("cache",),
+        ),
+        CallbackMetric(
+            "llm_service_single_flight_coalesced",
+            "LLM calls saved by coalescing identical in-flight queries.",
+            coalesced,
+            type="counter",
+        ),
+        CallbackMetric(
+            "llm_service_db_pool_connections",
+            "Database pool connections by state.",
+            pool_connections,
+            ("state",),
+        ),
+        CallbackMetric(
+            "llm_service_query_log_queued",
+            "Query logs waiting to be written.",
+            lambda: (log_writer_stats() or {}).get("queued"),
+        ),
+        CallbackMetric(
+            "llm_service_query_log_rows",
+            "Query log rows written or dropped by the writer.",
+            log_rows,
+            ("result",),
+            type="counter",
+        ),
+        CallbackMetric(
+            "llm_service_llm_queue_calls",
+            "LLM calls holding a concurrency slot or waiting for one.",
+            queue_calls,
+            ("state",),
+        ),
+        CallbackMetric(
+            "llm_service_llm_queue_waiting_users",
+            "Users with LLM calls waiting for a concurrency slot.",
+            lambda: (scheduler_stats() or {}).get("waiting_users"),
+        ),
+        CallbackMetric(
+            "llm_service_llm_provider_healthy",
+            "Whether each LLM provider's circuit breaker is closed (1) or not (0).",
+            lambda: provider_stats("healthy"),
+            ("provider",),
+        ),
+        CallbackMetric(
+            "llm_service_llm_provider_first_token_p95_seconds",
+            "p95 time to first token over each provider's recent calls.",
+            lambda: provider_stats("latency_p95_seconds"),
+            ("provider",),
+        ),
+        CallbackMetric(
+            "llm_service_llm_provider_first_token_timeout_seconds",
+            "First-token timeout currently applied to each LLM provider.",
+            lambda: provider_stats("first_token_timeout_seconds"),
+            ("provider",),
+        ),
+        CallbackMetric(
+            "llm_service_llm_provider_circuit_state",
+            "Circuit breaker state of each LLM provider (1 for the current state).",
+            circuit_states,
+            ("provider", "state"),
+        ),
+        CallbackMetric(
+            "llm_service_llm_provider_circuit_opened",
+            "Times each LLM provider's circuit breaker has opened.",
+            circuit_opened,
+            ("provider",),
+            type="counter",
+        ),
+        CallbackMetric(
+            "llm_service_log_records_dropped",
+            "Log records dropped because the log queue was full.",
+            dropped_records,
+            type="counter",
+        ),
+    ):
+        registry.register(metric)
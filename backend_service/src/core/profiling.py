@@ -0,0 +1,100 @@
+"""On-demand request profiling and the continuous sampler."""
+
+import random
+import secrets
+import time
+
+from src.utils.profiling import ContinuousSampler, RequestProfiler
+from config.settings import get_settings
+
+settings = get_settings()
+
+request_profiler = RequestProfiler(
+    interval_seconds=settings.profiling_interval_ms / 1000,
+    buffer_size=settings.profiling_buffer_size,
+    max_depth=settings.profiling_max_depth,
+    max_stacks=settings.profiling_max_stacks,
+    sample_rate=settings.profiling_sample_rate,
+    sampled_paths=[
+        path.strip() for path in settings.profiling_paths.split(",") if path.strip()
+    ],
+)
+
+continuous_sampler = ContinuousSampler(
+    interval_seconds=settings.continuous_profiling_interval_ms / 1000,
+    max_depth=settings.profiling_max_depth,
+    max_stacks=settings.profiling_max_stacks,
+)
+
+
+def is_profiling_token(value: str | bytes | None) -> bool:
+    """Check a value against the configured profiling token.
+
+    Args:
+        value: Token sent by the client.
+
+    Returns:
+        True if profiling is enabled and the token matches.
+    """
+    if not settings.profiling_token or not value:
+        return False
+    if isinstance(value, bytes):
+        value = value.decode("latin-1")
+    return secrets.compare_digest(value, settings.profiling_token)
+
+
+class ProfilingMiddleware:
+    """Profile requests that carry the profiling token or are sampled.
+
+    Pure ASGI middleware, so the request keeps running in the task that
+    the profiler watches.
+    """
+
+    def __init__(self, app):
+        """Wrap an ASGI app.
+
+        Args:
+            app: ASGI application.
+        """
+        self.app = app
+        self.header = settings.profiling_header.lower().encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        """Handle an ASGI request."""
+        trigger = self._trigger(scope) if scope["type"] == "http" else None
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = request_profiler.start(scope["method"], scope["path"], trigger)
+        status_code = None
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            request_profiler.finish(profile, status_code, time.perf_counter() - start)
+
+    def _trigger(self, scope) -> str | None:
+        """Decide whether and why to profile a request."""
+        path = scope["path"]
+        if "/admin/" in path:
+            return None
+        if settings.profiling_token:
+            for name, value in scope["headers"]:
+                if name == self.header:
+                    return "header" if is_profiling_token(value) else None
+        rate = request_profiler.sample_rate
+        if (
+            rate > 0
+            and path in request_profiler.sampled_paths
+            and random.random() < rate
+        ):
+            return "sampled"
+        return None
@@ -1,124 +1,332 @@
 """Rate limiting utilities."""
 
-import redis
+import asyncio
+import math
+import time
+from dataclasses import dataclass, replace
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
+from redis.exceptions import RedisError
+
+from src.core.limiter_algorithms import (
+    ALGORITHMS,
+    FixedWindowLimiter,
+    LimiterAlgorithm,
+    TierStatus,
+)
+from src.core.redis_client import get_redis
+from src.utils.logger import get_logger
 from config.settings import get_settings
 
+logger = get_logger(__name__)
 settings = get_settings()
 
 
+@dataclass(frozen=True)
+class QuotaStatus:
+    """Result of a quota reservation or lookup.
+
+    ``used``, ``remaining`` and ``reset_at`` describe the tier that rejected
+    the request, or the daily quota tier otherwise. ``windows`` holds the
+    window each tier charged an allowed reservation to; pass it to
+    ``refund`` and ``settle`` so they give units back where they were taken.
+    """
+
+    allowed: bool
+    used: int
+    remaining: int
+    reset_at: Optional[datetime]
+    retry_after: Optional[int] = None
+    limited_by: Optional[str] = None
+    windows: tuple[Optional[str], ...] = ()
+
+
+def _daily_tier(name: str, algorithm: str, limit: int) -> LimiterAlgorithm:
+    """Build a tier enforcing a daily limit.
+
+    Args:
+        name: Tier name.
+        algorithm: Algorithm name.
+        limit: Maximum units per day.
+
+    Returns:
+        Limiter tier.
+
+    Raises:
+        ValueError: If the algorithm is unknown.
+    """
+    if algorithm == "fixed_window":
+        # Daily windows roll over at the configured reset hour
+        return FixedWindowLimiter(
+            name, limit, 86400, offset_seconds=settings.query_reset_hour * 3600
+        )
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown rate limit algorithm: {algorithm}")
+    return ALGORITHMS[algorithm](name, limit, 86400)
+
+
+def build_tiers() -> list[LimiterAlgorithm]:
+    """Build the query count tiers configured in settings.
+
+    The optional burst tier comes first so bursts are rejected before they
+    touch the daily quota. It limits requests, so a batch is charged once
+    there however many queries it carries.
+
+    Returns:
+        Limiter tiers, ending with the daily quota tier.
+
+    Raises:
+        ValueError: If a configured algorithm is unknown.
+    """
+    tiers = []
+    burst = settings.rate_limit_burst_algorithm
+    if burst != "none":
+        if burst not in ALGORITHMS:
+            raise ValueError(f"Unknown rate limit algorithm: {burst}")
+        burst_tier = ALGORITHMS[burst](
+            "burst",
+            settings.rate_limit_burst_limit,
+            settings.rate_limit_burst_window_seconds,
+        )
+        burst_tier.per_request = True
+        tiers.append(burst_tier)
+    tiers.append(
+        _daily_tier(
+            "daily", settings.rate_limit_daily_algorithm, settings.max_queries_per_day
+        )
+    )
+    return tiers
+
+
+def build_token_tiers() -> list[LimiterAlgorithm]:
+    """Build the daily token budget tier configured in settings.
+
+    Returns:
+        Limiter tiers.
+
+    Raises:
+        ValueError: If the configured algorithm is unknown.
+    """
+    return [
+        _daily_tier(
+            "daily_tokens",
+            settings.token_budget_algorithm,
+            settings.max_tokens_per_day,
+        )
+    ]
+
+
 class RateLimiter:
-    """Rate limiter using Redis."""
+    """Stacked rate limiter using Redis, with a local fallback when Redis degrades."""
 
-    def __init__(self, redis_url: str = settings.redis_url):
+    def __init__(
+        self,
+        tiers: Optional[list[LimiterAlgorithm]] = None,
+        operation_timeout: float = settings.redis_operation_timeout,
+        local_fallback: bool = settings.rate_limit_local_fallback,
+        fallback_seconds: float = settings.rate_limit_fallback_seconds,
+    ):
         """Initialize rate limiter.
 
+        Redis connections come from the shared pool and are only opened on
+        first use.
+
         Args:
-            redis_url: Redis connection URL.
+            tiers: Limiter tiers checked in order, ending with the quota
+                tier. Defaults to the tiers configured in settings.
+            operation_timeout: Maximum time to wait for a Redis call.
+            local_fallback: Whether to use in-process counters when Redis fails.
+            fallback_seconds: How long to stay in local mode after a failure.
         """
-        self.redis_client = redis.from_url(redis_url, decode_responses=True)
+        self.tiers = tiers if tiers is not None else build_tiers()
+        self.operation_timeout = operation_timeout
+        self.local_fallback = local_fallback
+        self.fallback_seconds = fallback_seconds
+        self._degraded_until = 0.0
+
+    @property
+    def mode(self) -> str:
+        """Current backend, ``redis`` or ``local``."""
+        return "local" if self._degraded_until > time.monotonic() else "redis"
+
+    async def reserve(self, user_id: int, amount: int = 1) -> QuotaStatus:
+        """Atomically check and reserve quota in every tier.
 
-    def get_user_query_count(self, user_id: int) -> int:
-        """Get today's query count for a user.
+        Tiers are reserved in order; if one rejects or fails, the tiers
+        already reserved are refunded. The reservation counts against the
+        quota immediately; use ``refund`` to give it back if the query is
+        not charged. Per-request tiers are charged one unit for the whole
+        reservation.
 
         Args:
             user_id: User ID.
+            amount: Number of queries to reserve.
 
         Returns:
-            Number of queries made today.
+            Quota status after the reservation attempt.
         """
-        key = self._get_key(user_id)
-        count = self.redis_client.get(key)
-        return int(count) if count else 0
+        granted: list[tuple[LimiterAlgorithm, Optional[str]]] = []
+        try:
+            for tier in self.tiers:
+                cost = self._cost(tier, amount, 1)
+                tier_status = await self._run(tier, "reserve", user_id, cost)
+                if not tier_status.allowed:
+                    await self._rollback(granted, user_id, amount)
+                    return self._status(tier_status)
+                granted.append((tier, tier_status.window))
+        except BaseException:
+            await self._rollback(granted, user_id, amount)
+            raise
+        windows = tuple(window for _, window in granted)
+        return self._status(tier_status, windows)
 
-    def increment_query_count(self, user_id: int) -> int:
-        """Increment query count for a user.
+    async def refund(
+        self,
+        user_id: int,
+        amount: int = 1,
+        requests: int = 1,
+        windows: tuple[Optional[str], ...] = (),
+    ) -> None:
+        """Give back previously reserved quota in every tier.
 
         Args:
             user_id: User ID.
-
-        Returns:
-            Updated query count.
+            amount: Number of queries to refund.
+            requests: Number of requests to refund in per-request tiers;
+                0 when only part of a request's queries is refunded.
+            windows: ``QuotaStatus.windows`` of the reservation; the current
+                windows are refunded without it.
         """
-        key = self._get_key(user_id)
-        count = self.redis_client.incr(key)
+        for index, tier in enumerate(self.tiers):
+            cost = self._cost(tier, amount, requests)
+            if cost:
+                window = windows[index] if windows else None
+                await self._run(tier, "refund", user_id, cost, window)
 
-        # Set expiration on first increment
-        if count == 1:
-            expire_at = self._get_reset_time()
-            ttl = int((expire_at - datetime.now(timezone.utc)).total_seconds())
-            self.redis_client.expire(key, ttl)
+    async def settle(
+        self,
+        user_id: int,
+        reserved: int,
+        actual: int,
+        windows: tuple[Optional[str], ...] = (),
+    ) -> None:
+        """Replace a reservation with the actual cost.
 
-        return count
-
-    def is_rate_limited(self, user_id: int) -> bool:
-        """Check if user has exceeded rate limit.
+        Overruns are charged even past the limit; overestimates are refunded.
 
         Args:
             user_id: User ID.
-
-        Returns:
-            True if rate limited, False otherwise.
+            reserved: Amount reserved up front.
+            actual: Actual cost.
+            windows: ``QuotaStatus.windows`` of the reservation.
         """
-        count = self.get_user_query_count(user_id)
-        return count >= settings.max_queries_per_day
+        if actual > reserved:
+            for tier in self.tiers:
+                if not tier.per_request:
+                    await self._run(tier, "reserve", user_id, actual - reserved, True)
+        elif actual < reserved:
+            await self.refund(user_id, reserved - actual, requests=0, windows=windows)
 
-    def get_remaining_queries(self, user_id: int) -> int:
-        """Get remaining queries for today.
+    async def get_status(self, user_id: int) -> QuotaStatus:
+        """Get usage, remaining quota and reset time of the quota tier.
 
         Args:
             user_id: User ID.
 
         Returns:
-            Number of remaining queries.
+            Current quota status.
         """
-        count = self.get_user_query_count(user_id)
-        return max(0, settings.max_queries_per_day - count)
+        return self._status(await self._run(self.tiers[-1], "status", user_id))
 
-    def get_reset_time(self, user_id: int) -> Optional[datetime]:
-        """Get query count reset time for a user.
+    async def _rollback(
+        self,
+        granted: list[tuple[LimiterAlgorithm, Optional[str]]],
+        user_id: int,
+        amount: int,
+    ) -> None:
+        """Refund the tiers of a reservation that did not go through.
 
         Args:
+            granted: Tiers already reserved, with the window they charged.
             user_id: User ID.
-
-        Returns:
-            Reset time or None if no queries made today.
+            amount: Number of queries reserved.
         """
-        key = self._get_key(user_id)
-        ttl = self.redis_client.ttl(key)
-        if ttl == -1 or ttl == -2:
-            return None
-        return datetime.now(timezone.utc) + timedelta(seconds=ttl)
+        for tier, window in reversed(granted):
+            cost = self._cost(tier, amount, 1)
+            try:
+                await self._run(tier, "refund", user_id, cost, window)
+            except (RedisError, OSError, asyncio.TimeoutError) as e:
+                logger.warning(
+                    "Failed to refund %s tier for user %s: %r", tier.name, user_id, e
+                )
 
-    @staticmethod
-    def _get_key(user_id: int) -> str:
-        """Get Redis key for user's query count.
+    async def _run(self, tier: LimiterAlgorithm, operation: str, *args) -> TierStatus:
+        """Run a tier operation on Redis, or locally while Redis is degraded.
 
         Args:
-            user_id: User ID.
+            tier: Limiter tier.
+            operation: ``reserve``, ``refund`` or ``status``.
+            *args: Operation arguments after the Redis client.
 
         Returns:
-            Redis key.
+            Operation result.
         """
-        today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-        return f"query_count:{user_id}:{today}"
+        if self.local_fallback and self.mode == "local":
+            return getattr(tier, f"{operation}_local")(*args)
+
+        try:
+            return await asyncio.wait_for(
+                getattr(tier, operation)(get_redis(), *args),
+                timeout=self.operation_timeout,
+            )
+        except (RedisError, OSError, asyncio.TimeoutError) as e:
+            if not self.local_fallback:
+                raise
+            logger.warning(
+                "Redis unavailable for rate limiting, using local counters for %ss: %r",
+                self.fallback_seconds,
+                e,
+            )
+            self._degraded_until = time.monotonic() + self.fallback_seconds
+            if operation == "reserve" and isinstance(e, asyncio.TimeoutError):
+                # Redis may have applied the reservation before the timeout;
+                # admit without charging the local counters a second time
+                tier_status = tier.status_local(args[0])
+                return replace(tier_status, allowed=True, retry_after=0.0)
+            return getattr(tier, f"{operation}_local")(*args)
 
     @staticmethod
-    def _get_reset_time() -> datetime:
-        """Get next reset time based on configuration.
+    def _cost(tier: LimiterAlgorithm, amount: int, requests: int) -> int:
+        """Units a tier is charged for ``amount`` queries in ``requests`` requests."""
+        return requests if tier.per_request else amount
 
-        Returns:
-            Next reset time.
-        """
-        now = datetime.now(timezone.utc)
-        reset_hour = settings.query_reset_hour
+    @staticmethod
+    def _status(
+        tier_status: TierStatus, windows: tuple[Optional[str], ...] = ()
+    ) -> QuotaStatus:
+        """Build a quota status from a tier status.
 
-        # If reset time hasn't passed today, schedule for today
-        reset_time = now.replace(hour=reset_hour, minute=0, second=0, microsecond=0)
-        if reset_time > now:
-            return reset_time
+        Args:
+            tier_status: Status of the deciding tier.
+            windows: Windows charged by an allowed reservation.
 
-        # Otherwise, schedule for tomorrow
-        return reset_time + timedelta(days=1)
+        Returns:
+            Quota status.
+        """
+        reset_at = None
+        if tier_status.reset_after is not None:
+            reset_at = datetime.now(timezone.utc) + timedelta(
+                seconds=tier_status.reset_after
+            )
+        return QuotaStatus(
+            allowed=tier_status.allowed,
+            used=tier_status.used,
+            remaining=tier_status.remaining,
+            reset_at=reset_at,
+            retry_after=(
+                None if tier_status.allowed else math.ceil(tier_status.retry_after)
+            ),
+            limited_by=None if tier_status.allowed else tier_status.name,
+            windows=windows,
+        )
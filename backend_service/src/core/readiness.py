@@ -0,0 +1,88 @@
+"""Worker warm-up and the state reported by the readiness probe."""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional
+
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+WarmUpStep = tuple[str, Callable[[], Awaitable[None]]]
+
+
+class Readiness:
+    """Run warm-up steps in the background and track their progress.
+
+    The worker accepts connections as soon as its lifespan has started the
+    cheap parts; load balancers route traffic to it once ``/ready`` reports
+    that warm-up has finished.
+    """
+
+    def __init__(self):
+        """Initialize readiness state."""
+        self.state = "starting"
+        self.error: Optional[str] = None
+        # Seconds taken by each finished step
+        self.steps: dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._started_at = time.perf_counter()
+
+    @property
+    def ready(self) -> bool:
+        """Whether warm-up has finished and the worker is not stopping."""
+        return self.state == "ready"
+
+    def start(self, steps: list[WarmUpStep]) -> None:
+        """Start running warm-up steps, one after another.
+
+        Args:
+            steps: Step names and the coroutine functions running them.
+        """
+        self.state = "warming"
+        self._task = asyncio.create_task(self._run(steps))
+
+    async def wait(self) -> None:
+        """Wait for warm-up to finish, successfully or not."""
+        if self._task is not None:
+            await asyncio.shield(self._task)
+
+    async def stop(self) -> None:
+        """Report not ready and cancel warm-up if it is still running."""
+        self.state = "stopping"
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def status(self) -> dict:
+        """Describe warm-up progress."""
+        return {
+            "status": self.state,
+            "steps_ms": {
+                name: round(seconds * 1000, 1) for name, seconds in self.steps.items()
+            },
+            "error": self.error,
+        }
+
+    async def _run(self, steps: list[WarmUpStep]) -> None:
+        """Run the steps; a failing step leaves the worker not ready."""
+        for name, step in steps:
+            start = time.perf_counter()
+            try:
+                await step()
+            except Exception as e:
+                logger.exception("Warm-up step %s failed", name)
+                self.state = "failed"
+                self.error = f"{name}: {e!r}"
+                return
+            self.steps[name] = time.perf_counter() - start
+
+        self.state = "ready"
+        logger.info(
+            "Worker ready %.0f ms after start",
+            (time.perf_counter() - self._started_at) * 1000,
+        )
+
+
+readiness = Readiness()
@@ -0,0 +1,69 @@
+"""Shared asyncio Redis client."""
+
+import time
+from typing import Optional
+
+import redis.asyncio as aioredis
+
+from src.core.metrics import redis_command_seconds
+from config.settings import get_settings
+
+settings = get_settings()
+
+_client: Optional[aioredis.Redis] = None
+
+
+class InstrumentedRedis(aioredis.Redis):
+    """Redis client recording the round trip time of every command.
+
+    Pipelines are sent without going through ``execute_command`` and are
+    not timed.
+    """
+
+    async def execute_command(self, *args, **options):
+        """Execute a command and record its duration."""
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            redis_command_seconds.labels(str(args[0]).upper()).observe(
+                time.perf_counter() - start
+            )
+
+
+def init_redis() -> aioredis.Redis:
+    """Create the shared client on an explicit, bounded connection pool.
+
+    Returns:
+        Redis client.
+    """
+    global _client
+    if _client is None:
+        pool = aioredis.BlockingConnectionPool.from_url(
+            settings.redis_url,
+            decode_responses=True,
+            max_connections=settings.redis_max_connections,
+            timeout=settings.redis_pool_timeout,
+            socket_timeout=settings.redis_socket_timeout,
+            socket_connect_timeout=settings.redis_connect_timeout,
+            health_check_interval=30,
+        )
+        _client = InstrumentedRedis(connection_pool=pool)
+    return _client
+
+
+def get_redis() -> aioredis.Redis:
+    """Get the shared asyncio Redis client, creating it on first use.
+
+    Returns:
+        Redis client.
+    """
+    return _client if _client is not None else init_redis()
+
+
+async def close_redis() -> None:
+    """Close the shared asyncio Redis client and its pool."""
+    global _client
+    if _client is not None:
+        await _client.aclose(close_connection_pool=True)
+        _client = None
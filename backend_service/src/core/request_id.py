@@ -0,0 +1,62 @@
+"""Request ID assignment for log correlation."""
+
+import re
+import uuid
+
+from config.settings import get_settings
+from src.utils.logger import request_id_var
+
+settings = get_settings()
+
+# Incoming IDs are reused only if they cannot break log lines
+_VALID_REQUEST_ID = re.compile(r"[A-Za-z0-9._:-]{1,64}")
+
+
+class RequestIdMiddleware:
+    """Give every request an ID, visible in its logs and response headers.
+
+    An ID sent by the client or a proxy in the request ID header is kept;
+    otherwise a new one is generated. Pure ASGI middleware, so the ID is
+    set in the context the endpoint, its dependencies and any tasks they
+    start run in.
+    """
+
+    def __init__(self, app):
+        """Wrap an ASGI app.
+
+        Args:
+            app: ASGI application.
+        """
+        self.app = app
+        self.header = settings.request_id_header.lower().encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        """Handle an ASGI request."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = self._incoming(scope) or uuid.uuid4().hex
+        encoded = request_id.encode("latin-1")
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    *message.get("headers", ()),
+                    (self.header, encoded),
+                ]
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(token)
+
+    def _incoming(self, scope) -> str | None:
+        """Get a usable request ID sent with the request."""
+        for name, value in scope["headers"]:
+            if name == self.header:
+                value = value.decode("latin-1")
+                return value if _VALID_REQUEST_ID.fullmatch(value) else None
+        return None
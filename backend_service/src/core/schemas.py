@@ -55,6 +55,41 @@ class QueryResponse(BaseModel):
     response: str
     llm_model_used: str
     created_at: datetime
+    cached: bool = False
+    # Time spent waiting for an LLM slot; None when the LLM was not called
+    queue_wait_ms: Optional[float] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    tokens_used: Optional[int] = None
+
+
+class BatchQueryRequest(BaseModel):
+    """Batch query request schema."""
+
+    queries: list[QueryRequest] = Field(..., min_length=1, max_length=50)
+
+
+class BatchQueryItem(BaseModel):
+    """Result of one query in a batch."""
+
+    index: int
+    response: Optional[QueryResponse] = None
+    error: Optional[str] = None
+
+
+class BatchQueryResponse(BaseModel):
+    """Batch query response schema."""
+
+    results: list[BatchQueryItem]
+    succeeded: int
+    failed: int
+
+
+class ProfilingUpdate(BaseModel):
+    """Runtime profiling settings; omitted fields are left unchanged."""
+
+    sample_rate: Optional[float] = Field(None, ge=0, le=1)
+    continuous: Optional[bool] = None
 
 
 class ErrorResponse(BaseModel):
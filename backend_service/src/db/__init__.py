@@ -1,5 +1,19 @@
 """Database module."""
 
-from .database import get_db, engine, SessionLocal
+from .database import (
+    get_db,
+    get_async_db,
+    engine,
+    async_engine,
+    SessionLocal,
+    AsyncSessionLocal,
+)
 
-__all__ = ["get_db", "engine", "SessionLocal"]
+__all__ = [
+    "get_db",
+    "get_async_db",
+    "engine",
+    "async_engine",
+    "SessionLocal",
+    "AsyncSessionLocal",
+]
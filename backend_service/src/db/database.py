@@ -1,13 +1,64 @@
 # src/db/database.py
+import time
+
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.ext.declarative import declarative_base
-from typing import Generator
+from typing import AsyncGenerator, Generator
 from config.settings import get_settings
+from src.core.metrics import db_pool_checkout_seconds
 
 Base = declarative_base()
 settings = get_settings()
 
+# Async drivers for the sync URL schemes we support
+_ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def get_async_database_url(url: str) -> str:
+    """Map a database URL onto its async driver.
+
+    Args:
+        url: Sync database URL.
+
+    Returns:
+        Database URL using an async driver.
+    """
+    scheme, sep, rest = url.partition("://")
+    return f"{_ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Connection pool recording how long each checkout takes."""
+
+    def _do_get(self):
+        """Get a connection, waiting for or opening one as needed."""
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_checkout_seconds.observe(time.perf_counter() - start)
+
+
+def _pool_options() -> dict:
+    """Connection pool options for server databases."""
+    if settings.database_url.startswith("sqlite"):
+        return {}
+    return {
+        "poolclass": TimedAsyncQueuePool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+    }
+
+
+# Sync engine, kept for scripts and maintenance tasks
 engine = create_engine(
     settings.database_url,
     echo=settings.debug,
@@ -16,6 +67,18 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine used by the API
+async_engine = create_async_engine(
+    get_async_database_url(settings.database_url),
+    echo=settings.debug,
+    pool_pre_ping=True,
+    **_pool_options(),
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
 
 def get_db() -> Generator[Session, None, None]:
     db = SessionLocal()
@@ -23,3 +86,8 @@ def get_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
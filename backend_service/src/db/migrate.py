@@ -0,0 +1,118 @@
+"""Schema creation and upgrades, run as an explicit deployment step.
+
+    python -m src.db.migrate
+
+Creates missing tables (query_logs partitioned by month where supported),
+then brings existing tables up to the models: adds missing columns and
+indexes, drops superseded indexes and relaxes NOT NULL constraints the
+models no longer have. Every step checks the live schema first, so running
+it again is a no-op.
+
+Takes a sync connection so it can also run through
+``AsyncConnection.run_sync``.
+"""
+
+from datetime import datetime, timezone
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateColumn
+
+from src.db.database import engine
+from src.db.partitions import create_partitioned_table, is_partitioned, is_supported
+from src.models import Base
+from src.utils.logger import get_logger
+from config.settings import get_settings
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+# Indexes replaced by newer ones, by table
+SUPERSEDED_INDEXES = {
+    "query_logs": ["ix_query_logs_user_id"],
+}
+
+
+def migrate(conn: Connection) -> list[str]:
+    """Create or upgrade the schema.
+
+    Args:
+        conn: Database connection, committed by the caller.
+
+    Returns:
+        Descriptions of the changes made.
+    """
+    changes = []
+    if settings.query_log_partitioning_enabled:
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        if create_partitioned_table(conn, now, settings.query_log_partitions_ahead):
+            changes.append("created partitioned table query_logs")
+        elif is_supported(conn) and not is_partitioned(conn):
+            logger.warning(
+                "query_logs exists and is not partitioned; query log retention "
+                "stays disabled until the table is recreated partitioned"
+            )
+
+    inspector = inspect(conn)
+    existing = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing:
+            table.create(conn)
+            changes.append(f"created table {table.name}")
+            continue
+
+        columns = {
+            column["name"]: column for column in inspector.get_columns(table.name)
+        }
+        primary_key = set(
+            inspector.get_pk_constraint(table.name)["constrained_columns"]
+        )
+        for column in table.columns:
+            current = columns.get(column.name)
+            if current is None:
+                ddl = CreateColumn(column).compile(dialect=conn.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+                changes.append(f"added column {table.name}.{column.name}")
+            elif (
+                column.nullable
+                and not current["nullable"]
+                and column.name not in primary_key
+            ):
+                if conn.dialect.name != "postgresql":
+                    logger.warning(
+                        "Column %s.%s is NOT NULL in the database; rebuild the table to relax it",
+                        table.name,
+                        column.name,
+                    )
+                    continue
+                conn.execute(
+                    text(
+                        f"ALTER TABLE {table.name} ALTER COLUMN {column.name} DROP NOT NULL"
+                    )
+                )
+                changes.append(f"made {table.name}.{column.name} nullable")
+
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for name in SUPERSEDED_INDEXES.get(table.name, []):
+            if name in indexes:
+                conn.execute(text(f"DROP INDEX {name}"))
+                changes.append(f"dropped index {name}")
+        for index in table.indexes:
+            if index.name not in indexes:
+                index.create(conn)
+                changes.append(f"created index {index.name}")
+
+    for change in changes:
+        logger.info("Migration: %s", change)
+    return changes
+
+
+def main() -> None:
+    """Migrate the configured database."""
+    with engine.begin() as conn:
+        changes = migrate(conn)
+    print("\n".join(changes) if changes else "Schema is up to date")
+
+
+if __name__ == "__main__":
+    main()
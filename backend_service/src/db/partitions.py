@@ -0,0 +1,192 @@
+"""Monthly range partitioning of query_logs on PostgreSQL.
+
+The functions take a sync connection so they can be used directly with the
+sync engine or through ``AsyncConnection.run_sync``. On other databases
+query_logs stays a plain table and they do nothing.
+"""
+
+import re
+from datetime import datetime
+
+from sqlalchemy import MetaData, PrimaryKeyConstraint, Table, inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from src.models import QueryLog, ResponseBlob, User
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+TABLE_NAME = QueryLog.__tablename__
+DEFAULT_PARTITION = f"{TABLE_NAME}_default"
+_PARTITION_NAME = re.compile(rf"^{TABLE_NAME}_y(\d{{4}})m(\d{{2}})$")
+
+
+def month_start(value: datetime) -> datetime:
+    """Get the first instant of the month containing ``value``."""
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    """Shift a month start by a number of months."""
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month: datetime) -> str:
+    """Get the partition name of a month."""
+    return f"{TABLE_NAME}_y{month.year:04d}m{month.month:02d}"
+
+
+def is_supported(conn: Connection) -> bool:
+    """Whether the database supports declarative partitioning."""
+    return conn.dialect.name == "postgresql"
+
+
+def is_partitioned(conn: Connection) -> bool:
+    """Whether query_logs exists as a partitioned table."""
+    if not is_supported(conn):
+        return False
+    result = conn.execute(
+        text(
+            "SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = :name AND pg_table_is_visible(c.oid)"
+        ),
+        {"name": TABLE_NAME},
+    )
+    return result.first() is not None
+
+
+def _partitioned_table() -> Table:
+    """Copy of the query_logs table, partitioned by month of created_at.
+
+    PostgreSQL requires the partition key in the primary key, so it
+    becomes ``(id, created_at)``.
+    """
+    metadata = MetaData()
+    User.__table__.to_metadata(metadata)
+    ResponseBlob.__table__.to_metadata(metadata)
+    table = QueryLog.__table__.to_metadata(metadata)
+    table.c.created_at.primary_key = True
+    table.c.id.autoincrement = True
+    table.append_constraint(PrimaryKeyConstraint(table.c.id, table.c.created_at))
+    table.dialect_options["postgresql"]["partition_by"] = "RANGE (created_at)"
+    return table
+
+
+def create_partitioned_table(
+    conn: Connection, now: datetime, months_ahead: int
+) -> bool:
+    """Create query_logs as a partitioned table if it does not exist yet.
+
+    Must run before ``create_all``, which then skips the existing table.
+    An existing unpartitioned table is left as it is, and the retention
+    job does not archive from it.
+
+    Args:
+        conn: Database connection.
+        now: Current time (naive UTC).
+        months_ahead: Number of future monthly partitions to create.
+
+    Returns:
+        True if the table was created.
+    """
+    if not is_supported(conn) or inspect(conn).has_table(TABLE_NAME):
+        return False
+
+    # query_logs references users and response blobs
+    User.__table__.create(conn, checkfirst=True)
+    ResponseBlob.__table__.create(conn, checkfirst=True)
+
+    table = _partitioned_table()
+    conn.execute(CreateTable(table))
+    for index in table.indexes:
+        conn.execute(CreateIndex(index))
+    # Catches rows outside the created ranges; kept empty by ensure_partitions
+    conn.execute(
+        text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE_NAME} DEFAULT")
+    )
+    logger.info("Created partitioned table %s", TABLE_NAME)
+    ensure_partitions(conn, now, months_ahead)
+    return True
+
+
+def ensure_partitions(conn: Connection, now: datetime, months_ahead: int) -> list[str]:
+    """Create the partitions for the current and upcoming months.
+
+    Args:
+        conn: Database connection.
+        now: Current time (naive UTC).
+        months_ahead: Number of future months to create.
+
+    Returns:
+        Names of the partitions created.
+    """
+    if not is_partitioned(conn):
+        return []
+
+    existing = {name for name, _ in list_partitions(conn)}
+    created = []
+    current = month_start(now)
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        name = partition_name(month)
+        if name in existing:
+            continue
+        conn.execute(
+            text(
+                f"CREATE TABLE {name} PARTITION OF {TABLE_NAME} "
+                f"FOR VALUES FROM ('{month.isoformat()}') "
+                f"TO ('{add_months(month, 1).isoformat()}')"
+            )
+        )
+        created.append(name)
+        logger.info("Created partition %s", name)
+    return created
+
+
+def list_partitions(conn: Connection) -> list[tuple[str, datetime]]:
+    """List the monthly partitions of query_logs, oldest first.
+
+    Args:
+        conn: Database connection.
+
+    Returns:
+        Partition names and the months they hold.
+    """
+    if not is_partitioned(conn):
+        return []
+
+    result = conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :name AND pg_table_is_visible(p.oid)"
+        ),
+        {"name": TABLE_NAME},
+    )
+    partitions: list[tuple[str, datetime]] = []
+    for (name,) in result.tuples():
+        match = _PARTITION_NAME.match(name)
+        if match:
+            partitions.append((name, datetime(int(match[1]), int(match[2]), 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def drop_partition(conn: Connection, name: str) -> None:
+    """Detach and drop a monthly partition.
+
+    Args:
+        conn: Database connection.
+        name: Partition name.
+
+    Raises:
+        ValueError: If the name is not a monthly partition of query_logs.
+    """
+    if not _PARTITION_NAME.match(name):
+        raise ValueError(f"Not a query log partition: {name}")
+    conn.execute(text(f"ALTER TABLE {TABLE_NAME} DETACH PARTITION {name}"))
+    conn.execute(text(f"DROP TABLE {name}"))
+    logger.info("Dropped partition %s", name)
@@ -1,26 +1,100 @@
 """Main FastAPI application."""
 
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 
 from config.settings import get_settings
-from src.api import auth_router, query_router
-from src.db import engine
-from src.models import Base
+from src.api import admin_router, auth_router, query_router
+from src.core.auth import shutdown_password_executor
+from src.core.metrics import register_service_metrics
+from src.core.profiling import ProfilingMiddleware, continuous_sampler, request_profiler
+from src.core.readiness import readiness
+from src.core.rate_limiter import RateLimiter, build_token_tiers
+from src.core.redis_client import close_redis, init_redis
+from src.core.request_id import RequestIdMiddleware
+from src.db import async_engine, AsyncSessionLocal
+from src.db.migrate import migrate
+from src.services import LLMService, QueryLogRetention
+from src.services.response_store import response_store
 from src.utils.logger import get_logger
+from src.utils.metrics import CONTENT_TYPE, registry
 import uvicorn
 
 logger = get_logger(__name__)
 settings = get_settings()
 
-# Create all tables (users, query_logs, etc. )
-Base.metadata.create_all(bind=engine)
+query_log_retention = QueryLogRetention()
+
+
+async def _connect_redis() -> None:
+    """Open the first Redis connection; the limiters fall back if it fails."""
+    try:
+        await init_redis().ping()
+    except Exception as e:
+        logger.warning("Redis not reachable during warm-up: %r", e)
+
+
+async def _load_caches(llm_service: LLMService) -> None:
+    """Load compression dictionaries and the semantic cache index."""
+    async with AsyncSessionLocal() as db:
+        await response_store.load_dictionaries(db)
+        await llm_service.warm_semantic_cache(db)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Manage application startup and shutdown.
+
+    Only cheap setup runs before the worker starts serving; the rest is
+    warm-up reported by ``/ready``. The services shared by the endpoints
+    are created here, inside the running event loop, and kept on
+    ``app.state``.
+    """
+    if settings.migrate_on_startup:
+        async with async_engine.begin() as conn:
+            await conn.run_sync(migrate)
+    init_redis()
+    app.state.rate_limiter = RateLimiter()
+    app.state.token_limiter = (
+        RateLimiter(tiers=build_token_tiers())
+        if settings.token_budget_enabled
+        else None
+    )
+    app.state.llm_service = llm_service = LLMService()
+    await llm_service.start()
+    await query_log_retention.start()
+    if settings.continuous_profiling_enabled:
+        continuous_sampler.start()
+    readiness.start(
+        [
+            ("redis", _connect_redis),
+            ("caches", lambda: _load_caches(llm_service)),
+            ("llm", llm_service.warm_up),
+        ]
+    )
+    if not settings.warm_up_in_background:
+        await readiness.wait()
+    yield
+    await readiness.stop()
+    continuous_sampler.stop()
+    request_profiler.stop()
+    await query_log_retention.stop()
+    await asyncio.to_thread(llm_service.save_semantic_cache)
+    await llm_service.aclose()
+    await close_redis()
+    await async_engine.dispose()
+    shutdown_password_executor()
+
 
 # Initialize FastAPI app
 app = FastAPI(
     title="LLM Query Service",
     description="LLM-powered query service.",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # Add CORS middleware
@@ -31,10 +105,15 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(RequestIdMiddleware)
+
+register_service_metrics(lambda: getattr(app.state, "llm_service", None), async_engine)
 
 # Include routers
 app.include_router(auth_router, prefix=settings.api_v1_prefix)
 app.include_router(query_router, prefix=settings.api_v1_prefix)
+app.include_router(admin_router, prefix=settings.api_v1_prefix)
 
 
 @app.get("/health")
@@ -43,6 +122,20 @@ async def health_check():
     return {"status": "ok", "version": "0.1.0"}
 
 
+@app.get("/ready")
+async def readiness_check(response: Response):
+    """Readiness endpoint; 503 until warm-up has finished."""
+    if not readiness.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return readiness.status()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics endpoint."""
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
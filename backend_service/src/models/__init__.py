@@ -9,6 +9,7 @@ partially-initialized package error.
 from src.db.database import Base
 
 from .user import User
+from .response_blob import ResponseBlob, ResponseDictionary
 from .query_log import QueryLog
 
-__all__ = ["Base", "User", "QueryLog"]
+__all__ = ["Base", "User", "ResponseBlob", "ResponseDictionary", "QueryLog"]
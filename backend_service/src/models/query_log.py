@@ -2,7 +2,7 @@
 
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, Integer, String, Text, ForeignKey
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text, ForeignKey
 from . import Base
 
 
@@ -12,13 +12,30 @@ class QueryLog(Base):
     __tablename__ = "query_logs"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     query = Column(Text, nullable=False)
+    # Inline text of older rows; newer rows reference a response blob
     response = Column(Text, nullable=True)
+    response_hash = Column(String(64), ForeignKey("response_blobs.hash"), nullable=True)
     llm_model_used = Column(String(255), nullable=False)
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
     tokens_used = Column(Integer, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
     def __repr__(self) -> str:
         """String representation."""
         return f"<QueryLog(id={self.id}, user_id={self.user_id}, model={self.llm_model_used})>"
+
+
+# Serves per-user history pages newest first, including the keyset
+# condition on (created_at, id); also covers plain user_id lookups
+Index(
+    "ix_query_logs_user_id_created_at_id",
+    QueryLog.user_id,
+    QueryLog.created_at.desc(),
+    QueryLog.id.desc(),
+)
+
+# Lets the retention job find response blobs no row references any more
+Index("ix_query_logs_response_hash", QueryLog.response_hash)
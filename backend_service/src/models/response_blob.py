@@ -0,0 +1,36 @@
+"""Compressed response storage models."""
+
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, LargeBinary, String
+from . import Base
+
+
+class ResponseBlob(Base):
+    """Compressed LLM response text, stored once per distinct content."""
+
+    __tablename__ = "response_blobs"
+
+    hash = Column(String(64), primary_key=True)
+    codec = Column(String(32), nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    size = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        """String representation."""
+        return f"<ResponseBlob(hash={self.hash[:12]}, codec={self.codec}, size={self.size})>"
+
+
+class ResponseDictionary(Base):
+    """Trained zstd dictionary used to compress response blobs."""
+
+    __tablename__ = "response_dictionaries"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        """String representation."""
+        return f"<ResponseDictionary(id={self.id})>"
@@ -2,5 +2,26 @@
 
 from .user_service import UserService
 from .llm_service import LLMService
+from .fair_scheduler import FairScheduler, SchedulerBusyError
+from .llm_router import LLMUnavailableError
+from .response_cache import ResponseCache
+from .semantic_cache import SemanticCache
+from .query_log_archive import QueryLogArchive
+from .query_log_retention import QueryLogRetention
+from .response_store import ResponseStore
+from .user_cache import UserCache, UserSnapshot
 
-__all__ = ["UserService", "LLMService"]
+__all__ = [
+    "UserService",
+    "LLMService",
+    "FairScheduler",
+    "SchedulerBusyError",
+    "LLMUnavailableError",
+    "ResponseCache",
+    "SemanticCache",
+    "QueryLogArchive",
+    "QueryLogRetention",
+    "ResponseStore",
+    "UserCache",
+    "UserSnapshot",
+]
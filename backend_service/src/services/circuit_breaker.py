@@ -0,0 +1,197 @@
+"""Circuit breaker guarding calls to one LLM provider."""
+
+import time
+from collections import deque
+
+from config.settings import get_settings
+
+settings = get_settings()
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Stop calling a provider that keeps failing or has become slow.
+
+    Closed, calls go through and their outcomes are kept for the last
+    ``window`` calls. The breaker opens when enough of those failed or
+    were slow to produce their first token, or after ``failure_threshold``
+    failures in a row. Open, calls are refused until ``open_seconds`` have
+    passed; then it is half-open and lets ``half_open_probes`` calls
+    through. A successful probe closes it again, a failed one reopens it.
+    """
+
+    def __init__(
+        self,
+        window: int = settings.llm_breaker_window,
+        min_calls: int = settings.llm_breaker_min_calls,
+        failure_threshold: int = settings.llm_provider_failure_threshold,
+        error_rate: float = settings.llm_breaker_error_rate,
+        slow_call_seconds: float = settings.llm_breaker_slow_call_seconds,
+        slow_call_rate: float = settings.llm_breaker_slow_call_rate,
+        open_seconds: float = settings.llm_provider_cooldown_seconds,
+        half_open_probes: int = settings.llm_breaker_half_open_probes,
+    ):
+        """Initialize breaker, closed.
+
+        Args:
+            window: Number of recent call outcomes kept.
+            min_calls: Outcomes needed before the rates are acted on.
+            failure_threshold: Consecutive failures that open the breaker.
+            error_rate: Share of failed calls in the window that opens it.
+            slow_call_seconds: First-token latency above which a call is slow.
+            slow_call_rate: Share of slow calls in the window that opens it.
+            open_seconds: How long the breaker stays open.
+            half_open_probes: Calls let through at once while half-open.
+        """
+        self.min_calls = min_calls
+        self.failure_threshold = failure_threshold
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        # (failed, slow) per recent call
+        self.outcomes: deque[tuple[bool, bool]] = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.opened = 0
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_started_at = 0.0
+
+    @property
+    def state(self) -> str:
+        """``closed``, ``open`` or ``half_open``."""
+        if (
+            self._state == OPEN
+            and time.monotonic() >= self._opened_at + self.open_seconds
+        ):
+            self._state = HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    @property
+    def retry_after(self) -> float:
+        """Seconds until an open breaker lets a probe through, else 0."""
+        if self.state != OPEN:
+            return 0.0
+        return max(self._opened_at + self.open_seconds - time.monotonic(), 0.0)
+
+    @property
+    def available(self) -> bool:
+        """Whether a call would be let through now."""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == OPEN:
+            return False
+        return self._probes < self.half_open_probes or self._probe_expired()
+
+    def allow(self) -> bool:
+        """Ask to make a call, taking a probe slot when half-open.
+
+        Returns:
+            Whether the call may go ahead. Every allowed call must be
+            followed by ``record_success``, ``record_failure`` or
+            ``release``.
+        """
+        if not self.available:
+            return False
+        if self._state == HALF_OPEN:
+            if self._probe_expired():
+                # A probe that never reported back does not block forever
+                self._probes = 0
+            self._probes += 1
+            self._probe_started_at = time.monotonic()
+        return True
+
+    def record_success(self, first_token_seconds: float) -> None:
+        """Record a completed call.
+
+        Args:
+            first_token_seconds: Time the call took to its first token.
+        """
+        slow = first_token_seconds > self.slow_call_seconds
+        self.consecutive_failures = 0
+        if self._state == HALF_OPEN:
+            self._probes = max(self._probes - 1, 0)
+            if slow:
+                self._open()
+            else:
+                self._close()
+            return
+        self.outcomes.append((False, slow))
+        self._check()
+
+    def record_failure(self, timed_out: bool = False) -> None:
+        """Record a failed call.
+
+        Args:
+            timed_out: Whether it failed by not answering in time, which
+                also counts as slow.
+        """
+        self.consecutive_failures += 1
+        if self._state == HALF_OPEN:
+            self._probes = max(self._probes - 1, 0)
+            self._open()
+            return
+        self.outcomes.append((True, timed_out))
+        self._check()
+
+    def release(self) -> None:
+        """Give back a probe slot of a call abandoned without an outcome."""
+        if self._state == HALF_OPEN:
+            self._probes = max(self._probes - 1, 0)
+
+    def stats(self) -> dict:
+        """Describe the breaker state and the rates it acts on."""
+        calls = len(self.outcomes)
+        return {
+            "state": self.state,
+            "error_rate": (
+                sum(failed for failed, _ in self.outcomes) / calls if calls else None
+            ),
+            "slow_call_rate": (
+                sum(slow for _, slow in self.outcomes) / calls if calls else None
+            ),
+            "consecutive_failures": self.consecutive_failures,
+            "opened": self.opened,
+            "retry_after_seconds": self.retry_after,
+        }
+
+    def _check(self) -> None:
+        """Open the breaker if the recent outcomes cross a threshold."""
+        if self._state != CLOSED:
+            return
+        if self.consecutive_failures >= self.failure_threshold:
+            self._open()
+            return
+        calls = len(self.outcomes)
+        if calls < self.min_calls:
+            return
+        failed = sum(failed for failed, _ in self.outcomes)
+        slow = sum(slow for _, slow in self.outcomes)
+        if failed >= self.error_rate * calls or slow >= self.slow_call_rate * calls:
+            self._open()
+
+    def _open(self) -> None:
+        """Refuse calls for ``open_seconds``."""
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self.opened += 1
+
+    def _close(self) -> None:
+        """Resume normal calls with a fresh window."""
+        self._state = CLOSED
+        self.outcomes.clear()
+        self.consecutive_failures = 0
+
+    def _probe_expired(self) -> bool:
+        """Whether the last probe has been out longer than a full open period."""
+        return (
+            self._probes > 0
+            and time.monotonic() >= self._probe_started_at + self.open_seconds
+        )
@@ -0,0 +1,55 @@
+"""Local embedding models for the semantic cache.
+
+``SEMANTIC_CACHE_EMBEDDER`` names a ``module:function`` that takes a text
+and returns its embedding. ``sentence_transformer_embedding`` runs the
+sentence-transformers model named by ``SEMANTIC_CACHE_MODEL`` on this
+machine. The package is in the optional ``semantic`` extra::
+
+    uv sync --extra semantic
+"""
+
+import threading
+from typing import Any, Optional
+
+from src.utils.logger import get_logger
+from config.settings import get_settings
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+_model: Optional[Any] = None
+_model_lock = threading.Lock()
+
+
+def _load_model() -> Any:
+    """Load the configured model once; a failed load is retried next call.
+
+    Raises:
+        ImportError: If sentence-transformers is not installed.
+    """
+    global _model
+    with _model_lock:
+        if _model is None:
+            try:
+                from sentence_transformers import (  # type: ignore[import-not-found]
+                    SentenceTransformer,
+                )
+            except ImportError as e:
+                raise ImportError(
+                    "sentence_transformer_embedding needs the semantic extra"
+                ) from e
+            _model = SentenceTransformer(settings.semantic_cache_model)
+            logger.info("Loaded embedding model %s", settings.semantic_cache_model)
+    return _model
+
+
+def sentence_transformer_embedding(text: str) -> list[float]:
+    """Embed text with the configured sentence-transformers model.
+
+    Args:
+        text: Text to embed.
+
+    Returns:
+        L2-normalized embedding vector.
+    """
+    return _load_model().encode(text, normalize_embeddings=True).tolist()
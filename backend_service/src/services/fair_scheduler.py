@@ -0,0 +1,239 @@
+"""Fair-share admission of upstream LLM calls."""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from src.core.metrics import llm_queue_rejected
+from config.settings import get_settings
+
+settings = get_settings()
+
+
+class SchedulerBusyError(Exception):
+    """Raised when an LLM call cannot be queued or waited too long."""
+
+    def __init__(self, retry_after: int, reason: str):
+        """Initialize error.
+
+        Args:
+            retry_after: Seconds the client should wait before retrying.
+            reason: ``queue_full``, ``user_queue_full`` or ``timeout``.
+        """
+        super().__init__(f"LLM call rejected ({reason})")
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class _Waiter:
+    """A call waiting for a concurrency slot."""
+
+    __slots__ = ("user_id", "cost", "future")
+
+    def __init__(self, user_id: int, cost: int, future: asyncio.Future):
+        """Initialize waiter.
+
+        Args:
+            user_id: User ID.
+            cost: Estimated tokens of the call, charged to its user's deficit.
+            future: Resolved when the call is given a slot.
+        """
+        self.user_id = user_id
+        self.cost = cost
+        self.future = future
+
+
+class FairScheduler:
+    """Limit concurrent LLM calls and share waiting capacity between users.
+
+    Calls run immediately while slots are free. Once they are all taken,
+    each user gets a queue of their own and freed slots go to the queues
+    by deficit round robin: every round a queue earns ``quantum`` tokens of
+    credit and its next call runs once the credit covers the call's
+    estimated cost. A user with a burst of queued calls therefore waits
+    behind their own calls, not in front of everyone else's.
+
+    The queue is bounded overall and per user, and calls that wait too
+    long give up; all three fail fast with ``SchedulerBusyError``.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = settings.llm_max_concurrency,
+        max_queue_depth: int = settings.llm_queue_max_depth,
+        max_queue_per_user: int = settings.llm_queue_max_per_user,
+        max_wait_seconds: float = settings.llm_queue_max_wait_seconds,
+        quantum: int = settings.llm_queue_quantum_tokens,
+        retry_after_seconds: int = settings.llm_queue_retry_after_seconds,
+    ):
+        """Initialize scheduler.
+
+        Args:
+            max_concurrency: Calls allowed in flight at once.
+            max_queue_depth: Calls allowed to wait, across all users.
+            max_queue_per_user: Calls allowed to wait for a single user.
+            max_wait_seconds: How long a call may wait for a slot.
+            quantum: Credit, in estimated tokens, a queue earns per round.
+            retry_after_seconds: Retry delay suggested to rejected clients.
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue_depth = max_queue_depth
+        self.max_queue_per_user = max_queue_per_user
+        self.max_wait_seconds = max_wait_seconds
+        self.quantum = quantum
+        self.retry_after_seconds = retry_after_seconds
+        self.in_flight = 0
+        self.queued = 0
+        self.rejected = 0
+        self._queues: dict[int, deque[_Waiter]] = {}
+        # Users with waiting calls, in service order, and their credit
+        self._active: deque[int] = deque()
+        self._deficit: dict[int, int] = {}
+
+    def admit(self, user_id: int) -> None:
+        """Check that a call for the user could start or queue right now.
+
+        Lets callers reject a request before committing to a response,
+        such as a stream whose status has to be sent first.
+
+        Args:
+            user_id: User ID.
+
+        Raises:
+            SchedulerBusyError: If the call would be rejected.
+        """
+        if self.in_flight < self.max_concurrency and not self.queued:
+            return
+        if self.queued >= self.max_queue_depth:
+            self._reject("queue_full")
+        if len(self._queues.get(user_id, ())) >= self.max_queue_per_user:
+            self._reject("user_queue_full")
+
+    @asynccontextmanager
+    async def slot(self, user_id: int, cost: int = 1) -> AsyncIterator[float]:
+        """Hold a concurrency slot for the duration of the block.
+
+        Args:
+            user_id: User the call is made for.
+            cost: Estimated tokens of the call.
+
+        Yields:
+            Seconds spent waiting for the slot.
+
+        Raises:
+            SchedulerBusyError: If the queue is full or the wait times out.
+        """
+        waited = await self.acquire(user_id, cost)
+        try:
+            yield waited
+        finally:
+            self.release()
+
+    async def acquire(self, user_id: int, cost: int = 1) -> float:
+        """Take a concurrency slot, waiting for a fair turn if none is free.
+
+        Args:
+            user_id: User the call is made for.
+            cost: Estimated tokens of the call.
+
+        Returns:
+            Seconds spent waiting for the slot.
+
+        Raises:
+            SchedulerBusyError: If the queue is full or the wait times out.
+        """
+        # Skip the queue only when nobody is already waiting
+        if self.in_flight < self.max_concurrency and not self.queued:
+            self.in_flight += 1
+            return 0.0
+
+        self.admit(user_id)
+        waiter = _Waiter(
+            user_id, max(cost, 1), asyncio.get_running_loop().create_future()
+        )
+        self._enqueue(waiter)
+
+        start = time.perf_counter()
+        try:
+            await asyncio.wait((waiter.future,), timeout=self.max_wait_seconds)
+        except BaseException:
+            # Cancelled while waiting: hand back a slot granted meanwhile
+            if waiter.future.done():
+                self.release()
+            else:
+                self._remove(waiter)
+            raise
+
+        if not waiter.future.done():
+            self._remove(waiter)
+            self._reject("timeout")
+        return time.perf_counter() - start
+
+    def release(self) -> None:
+        """Return a slot and pass it to the next waiting call, if any."""
+        self.in_flight -= 1
+        while self.queued and self.in_flight < self.max_concurrency:
+            self.in_flight += 1
+            self._next().future.set_result(None)
+
+    def stats(self) -> dict:
+        """Get scheduler counters.
+
+        Returns:
+            Calls in flight and waiting, users waiting, and rejections.
+        """
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "waiting_users": len(self._active),
+            "rejected": self.rejected,
+        }
+
+    def _enqueue(self, waiter: _Waiter) -> None:
+        """Add a call to the end of its user's queue."""
+        queue = self._queues.get(waiter.user_id)
+        if queue is None:
+            queue = self._queues[waiter.user_id] = deque()
+            self._active.append(waiter.user_id)
+            self._deficit[waiter.user_id] = 0
+        queue.append(waiter)
+        self.queued += 1
+
+    def _remove(self, waiter: _Waiter) -> None:
+        """Take a call that gave up out of its user's queue."""
+        queue = self._queues[waiter.user_id]
+        queue.remove(waiter)
+        self.queued -= 1
+        if not queue:
+            self._drop_user(waiter.user_id)
+
+    def _drop_user(self, user_id: int) -> None:
+        """Forget a user with no waiting calls, including their credit."""
+        del self._queues[user_id]
+        del self._deficit[user_id]
+        self._active.remove(user_id)
+
+    def _next(self) -> _Waiter:
+        """Pick the next call to run by deficit round robin."""
+        while True:
+            user_id = self._active[0]
+            queue = self._queues[user_id]
+            waiter = queue[0]
+            if self._deficit[user_id] >= waiter.cost:
+                self._deficit[user_id] -= waiter.cost
+                queue.popleft()
+                self.queued -= 1
+                if not queue:
+                    self._drop_user(user_id)
+                return waiter
+            # Not enough credit: earn this round's share and let the next user go
+            self._deficit[user_id] += self.quantum
+            self._active.rotate(-1)
+
+    def _reject(self, reason: str) -> None:
+        """Count a rejected call and raise the error for it."""
+        self.rejected += 1
+        llm_queue_rejected.labels(reason).inc()
+        raise SchedulerBusyError(self.retry_after_seconds, reason)
@@ -0,0 +1,661 @@
+"""Routing of LLM calls across a pool of providers.
+
+Providers are tried in order of their recent time to first token. A
+provider that fails or times out before its first token is skipped for the
+rest of the call and the next one is tried. Each provider has a circuit
+breaker: while it is open the provider is left out of routing, and when
+every breaker is open calls fail at once with ``LLMUnavailableError``. The
+first-token timeout follows each provider's observed latency. With
+hedging, a second provider is started when the first has not produced a
+token by its observed p95 latency; whichever answers first is kept and the
+other is cancelled.
+
+Providers are configured as ``kind:model[?option=value&...]`` entries
+separated by ``;``, for example::
+
+    openai:gpt-4o-mini;openai:gpt-4o-mini?base_url=https://backup.example/v1
+    stub:fast?latency=lognormal:0.2,0.5;stub:flaky?error_rate=0.3
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Iterable, Mapping, Optional
+from urllib.parse import parse_qsl
+
+from src.core.metrics import llm_hedges, llm_provider_attempts
+from src.services.circuit_breaker import CLOSED, CircuitBreaker
+from src.utils.logger import get_logger
+from config.settings import get_settings
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+# Weight of the newest sample in a provider's latency average
+EWMA_ALPHA = 0.2
+
+
+class LLMUnavailableError(Exception):
+    """Raised when the circuit breaker of every provider is open."""
+
+    def __init__(self, retry_after: int):
+        """Initialize error.
+
+        Args:
+            retry_after: Seconds until a provider accepts calls again.
+        """
+        super().__init__("No LLM provider is accepting calls")
+        self.retry_after = retry_after
+
+
+class Provider:
+    """One chat model in the pool, with its observed latency and health."""
+
+    def __init__(
+        self,
+        name: str,
+        model: str,
+        llm: Any,
+        window: int = settings.llm_latency_window,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        """Initialize provider.
+
+        Args:
+            name: Name used in logs and metrics.
+            model: Model name recorded with the queries it answers.
+            llm: LangChain chat model.
+            window: Number of recent first-token latencies kept.
+            breaker: Circuit breaker, one with the configured thresholds
+                by default.
+        """
+        self.name = name
+        self.model = model
+        self.llm = llm
+        self.latencies: deque[float] = deque(maxlen=window)
+        self.latency_ewma: Optional[float] = None
+        self.breaker = breaker or CircuitBreaker()
+
+    @property
+    def healthy(self) -> bool:
+        """Whether the provider's circuit breaker is closed."""
+        return self.breaker.state == CLOSED
+
+    def record_latency(self, seconds: float) -> None:
+        """Record the time a call took to produce its first token."""
+        self.latencies.append(seconds)
+        if self.latency_ewma is None:
+            self.latency_ewma = seconds
+        else:
+            self.latency_ewma += EWMA_ALPHA * (seconds - self.latency_ewma)
+
+    def latency_quantile(
+        self, quantile: float, min_samples: int = 1
+    ) -> Optional[float]:
+        """Get a quantile of the recent first-token latencies.
+
+        Args:
+            quantile: Quantile between 0 and 1.
+            min_samples: Samples needed for a meaningful value.
+
+        Returns:
+            Latency in seconds, or None with too few samples.
+        """
+        if len(self.latencies) < max(min_samples, 1):
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(int(quantile * len(ordered)), len(ordered) - 1)]
+
+    def stats(self) -> dict:
+        """Describe the provider's latency and health."""
+        return {
+            "name": self.name,
+            "model": self.model,
+            "healthy": self.healthy,
+            "circuit": self.breaker.stats(),
+            "latency_ewma_seconds": self.latency_ewma,
+            "latency_p95_seconds": self.latency_quantile(0.95),
+        }
+
+
+class _Attempt:
+    """One provider's answer to a call, read up to its first token."""
+
+    def __init__(
+        self, provider: Provider, query: str, timeout: float, hedge: bool = False
+    ):
+        """Start the call.
+
+        Args:
+            provider: Provider to call.
+            query: User query.
+            timeout: Time allowed for the first token.
+            hedge: Whether this is a hedge of a slower attempt.
+        """
+        self.provider = provider
+        self.hedge = hedge
+        self.started = time.perf_counter()
+        self.first_token_seconds: Optional[float] = None
+        self.chunks: list = []
+        self.finished = False
+        self.stream = provider.llm.astream(query).__aiter__()
+        self.task = asyncio.ensure_future(asyncio.wait_for(self._read_first(), timeout))
+
+    async def _read_first(self) -> None:
+        """Buffer chunks until one carries content or the stream ends."""
+        while True:
+            try:
+                chunk = await self.stream.__anext__()
+            except StopAsyncIteration:
+                self.finished = True
+                return
+            self.chunks.append(chunk)
+            if chunk.content:
+                return
+
+    async def cancel(self) -> None:
+        """Abandon the call, close its stream and free its breaker probe."""
+        self.provider.breaker.release()
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        await close_stream(self.stream)
+
+
+async def close_stream(stream: AsyncIterator) -> None:
+    """Close a provider stream, ignoring errors from a broken one."""
+    aclose = getattr(stream, "aclose", None)
+    if aclose is not None:
+        try:
+            await aclose()
+        except Exception as e:
+            logger.debug("Failed to close LLM stream: %r", e)
+
+
+class RoutedStream:
+    """The answer of the provider that won a call, from its first chunk."""
+
+    def __init__(self, router: "LLMRouter", attempt: _Attempt, deadline: float):
+        """Wrap a winning attempt.
+
+        Args:
+            router: Router recording the outcome.
+            attempt: Attempt that produced the first token.
+            deadline: ``time.monotonic()`` value by which the whole answer
+                must have arrived.
+        """
+        if attempt.first_token_seconds is None:
+            raise ValueError("Attempt has not produced its first token")
+        self.router = router
+        self.provider = attempt.provider
+        self.model = attempt.provider.model
+        self.deadline = deadline
+        self.first_token_seconds = attempt.first_token_seconds
+        self._attempt = attempt
+
+    async def chunks(self) -> AsyncIterator:
+        """Yield the answer's chunks until the call's deadline.
+
+        Yields:
+            LangChain message chunks.
+
+        Raises:
+            TimeoutError: If the answer is not complete by the deadline.
+        """
+        attempt = self._attempt
+        try:
+            for chunk in attempt.chunks:
+                yield chunk
+            if attempt.finished:
+                self.router.record_success(self.provider, self.first_token_seconds)
+                return
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(
+                        attempt.stream.__anext__(),
+                        timeout=max(self.deadline - time.monotonic(), 0.0),
+                    )
+                except StopAsyncIteration:
+                    break
+                yield chunk
+        except Exception as e:
+            self.router.record_failure(self.provider, e)
+            raise
+        except BaseException:
+            # Abandoned by the caller: no outcome to record
+            self.provider.breaker.release()
+            raise
+        finally:
+            await close_stream(attempt.stream)
+        self.router.record_success(self.provider, self.first_token_seconds)
+
+    async def collect(self) -> tuple[str, Optional[Mapping[str, Any]]]:
+        """Read the whole answer.
+
+        Returns:
+            Response text and the usage reported with it, if any.
+        """
+        from langchain_core.messages.ai import add_usage
+
+        content = []
+        usage_metadata = None
+        async for chunk in self.chunks():
+            if chunk.usage_metadata:
+                usage_metadata = add_usage(usage_metadata, chunk.usage_metadata)
+            content.append(str(chunk.content))
+        return "".join(content), usage_metadata
+
+
+class LLMRouter:
+    """Route calls to a pool of providers with fallback and hedging."""
+
+    def __init__(
+        self,
+        providers: list[Provider],
+        routing: str = settings.llm_routing,
+        first_token_timeout: float = settings.llm_first_token_timeout_seconds,
+        adaptive_timeout: bool = settings.llm_adaptive_timeout_enabled,
+        timeout_quantile: float = settings.llm_adaptive_timeout_quantile,
+        timeout_multiplier: float = settings.llm_adaptive_timeout_multiplier,
+        min_timeout: float = settings.llm_adaptive_timeout_min_seconds,
+        timeout_min_samples: int = settings.llm_adaptive_timeout_min_samples,
+        hedging: bool = settings.llm_hedging_enabled,
+        hedge_quantile: float = settings.llm_hedge_quantile,
+        hedge_min_samples: int = settings.llm_hedge_min_samples,
+    ):
+        """Initialize router.
+
+        Args:
+            providers: Provider pool, in configured order.
+            routing: "latency" to try the fastest provider first, or
+                "ordered" to keep the configured order.
+            first_token_timeout: Time a provider has to produce its first
+                token before the next one is tried; the ceiling of the
+                adaptive timeout.
+            adaptive_timeout: Derive each provider's first-token timeout
+                from its observed latency.
+            timeout_quantile: Latency quantile the adaptive timeout is
+                based on.
+            timeout_multiplier: Factor applied to that quantile.
+            min_timeout: Floor of the adaptive timeout.
+            timeout_min_samples: Latency samples needed before adapting.
+            hedging: Start a second provider when the first is slow.
+            hedge_quantile: Latency quantile of the first provider after
+                which the hedge starts.
+            hedge_min_samples: Latency samples needed before hedging.
+
+        Raises:
+            ValueError: If the pool is empty or the routing is unknown.
+        """
+        if not providers:
+            raise ValueError("At least one LLM provider is required")
+        if routing not in ("latency", "ordered"):
+            raise ValueError(f"Unknown LLM routing: {routing}")
+        self.providers = providers
+        self.routing = routing
+        self.first_token_timeout = first_token_timeout
+        self.adaptive_timeout = adaptive_timeout
+        self.timeout_quantile = timeout_quantile
+        self.timeout_multiplier = timeout_multiplier
+        self.min_timeout = min_timeout
+        self.timeout_min_samples = timeout_min_samples
+        self.hedging = hedging
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+
+    @classmethod
+    def from_settings(cls, http_client: Any) -> "LLMRouter":
+        """Build the provider pool configured in settings.
+
+        Args:
+            http_client: Shared HTTP client for OpenAI providers.
+
+        Returns:
+            Router over the configured providers.
+        """
+        return cls(
+            [
+                Provider(name, model, _FACTORIES[kind](model, options, http_client))
+                for name, kind, model, options in parse_providers(
+                    settings.llm_providers
+                )
+            ]
+        )
+
+    @property
+    def default_model(self) -> str:
+        """Model of the first configured provider."""
+        return self.providers[0].model
+
+    def route(self) -> list[Provider]:
+        """Order the providers for a new call.
+
+        Returns:
+            Providers whose circuit breaker lets a call through, fastest
+            first with latency routing.
+        """
+        available = [
+            provider for provider in self.providers if provider.breaker.available
+        ]
+        if self.routing == "latency":
+            # Providers without samples yet go first so they get measured
+            available.sort(key=lambda provider: provider.latency_ewma or 0.0)
+        return available
+
+    def ensure_available(self) -> None:
+        """Fail fast when no provider would accept a call.
+
+        Raises:
+            LLMUnavailableError: If every circuit breaker is open.
+        """
+        if not any(provider.breaker.available for provider in self.providers):
+            raise self._unavailable()
+
+    def timeout_for(self, provider: Provider) -> float:
+        """Get the time a provider has to produce its first token.
+
+        Args:
+            provider: Provider about to be called.
+
+        Returns:
+            A multiple of its observed latency quantile, kept between the
+            minimum and the configured first-token timeout.
+        """
+        if not self.adaptive_timeout:
+            return self.first_token_timeout
+        observed = provider.latency_quantile(
+            self.timeout_quantile, self.timeout_min_samples
+        )
+        if observed is None:
+            return self.first_token_timeout
+        return min(
+            max(observed * self.timeout_multiplier, self.min_timeout),
+            self.first_token_timeout,
+        )
+
+    async def open(
+        self,
+        query: str,
+        exclude: Iterable[Provider] = (),
+        deadline: Optional[float] = None,
+    ) -> RoutedStream:
+        """Start a call and wait until a provider produces its first token.
+
+        The first-token timeout only decides when to fail over; the whole
+        call, including fallbacks and reading the answer, has to finish by
+        ``deadline``.
+
+        Args:
+            query: User query.
+            exclude: Providers not to use, e.g. ones that already failed.
+            deadline: ``time.monotonic()`` value by which the call must be
+                complete; ``LLM_TIMEOUT_SECONDS`` from now by default.
+
+        Returns:
+            Stream of the provider that answered first.
+
+        Raises:
+            LLMUnavailableError: If no provider accepts calls.
+            TimeoutError: If the deadline passes before a provider answers.
+            Exception: The last provider error if every provider failed.
+        """
+        if deadline is None:
+            deadline = time.monotonic() + settings.llm_timeout_seconds
+        if deadline <= time.monotonic():
+            raise TimeoutError("LLM call deadline exceeded")
+        excluded = set(exclude)
+        queue = [provider for provider in self.route() if provider not in excluded]
+        first = self._take(queue)
+        if first is None:
+            raise self._unavailable()
+
+        running: dict[asyncio.Future, _Attempt] = {}
+        error: Optional[BaseException] = None
+        hedge_at: Optional[float] = None
+        hedged = False
+
+        def start(provider: Provider, hedge: bool = False) -> _Attempt:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                provider.breaker.release()
+                raise TimeoutError("LLM call deadline exceeded")
+            timeout = min(self.timeout_for(provider), remaining)
+            attempt = _Attempt(provider, query, timeout, hedge)
+            running[attempt.task] = attempt
+            return attempt
+
+        def schedule_hedge(attempt: _Attempt) -> Optional[float]:
+            if not self.hedging or hedged:
+                return None
+            delay = attempt.provider.latency_quantile(
+                self.hedge_quantile, self.hedge_min_samples
+            )
+            return None if delay is None else attempt.started + delay
+
+        try:
+            hedge_at = schedule_hedge(start(first))
+            while running:
+                timeout = None
+                if hedge_at is not None and not hedged:
+                    timeout = max(hedge_at - time.perf_counter(), 0.0)
+                done, _ = await asyncio.wait(
+                    running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if not done:
+                    # Slower than usual: race another provider, or the same
+                    # one again if it is alone
+                    primary = next(iter(running.values()))
+                    provider = self._take(queue)
+                    if provider is None and primary.provider.breaker.allow():
+                        provider = primary.provider
+                    hedged = True
+                    if provider is not None:
+                        start(provider, hedge=True)
+                        logger.info(
+                            "Hedging LLM call to %s with %s",
+                            primary.provider.name,
+                            provider.name,
+                        )
+                    continue
+
+                # A success wins even if another attempt failed at the same time
+                for task in sorted(done, key=lambda task: task.exception() is not None):
+                    attempt = running.pop(task)
+                    failure = task.exception()
+                    if failure is None:
+                        return await self._won(attempt, running, hedged, deadline)
+                    error = failure
+                    self.record_failure(attempt.provider, failure)
+
+                provider = self._take(queue) if not running else None
+                if provider is not None:
+                    logger.warning(
+                        "LLM provider %s failed (%r), falling back to %s",
+                        attempt.provider.name,
+                        error,
+                        provider.name,
+                    )
+                    hedge_at = schedule_hedge(start(provider))
+        except BaseException:
+            for attempt in running.values():
+                await attempt.cancel()
+            raise
+        if error is None:
+            # Attempts only stop running by winning or failing
+            raise RuntimeError("LLM call ended without an outcome")
+        raise error
+
+    async def _won(
+        self,
+        attempt: _Attempt,
+        running: dict[asyncio.Future, _Attempt],
+        hedged: bool,
+        deadline: float,
+    ) -> RoutedStream:
+        """Keep the attempt that produced the first token and drop the rest."""
+        attempt.first_token_seconds = time.perf_counter() - attempt.started
+        attempt.provider.record_latency(attempt.first_token_seconds)
+        for other in list(running.values()):
+            llm_provider_attempts.labels(other.provider.name, "cancelled").inc()
+            await other.cancel()
+        running.clear()
+        if hedged:
+            llm_hedges.labels("won" if attempt.hedge else "lost").inc()
+        return RoutedStream(self, attempt, deadline)
+
+    def record_success(self, provider: Provider, first_token_seconds: float) -> None:
+        """Record a completed answer.
+
+        Args:
+            provider: Provider that answered.
+            first_token_seconds: Time it took to produce the first token.
+        """
+        llm_provider_attempts.labels(provider.name, "ok").inc()
+        state = provider.breaker.state
+        provider.breaker.record_success(first_token_seconds)
+        self._log_transition(provider, state)
+
+    def record_failure(self, provider: Provider, error: BaseException) -> None:
+        """Record a failed or timed out call with the provider's breaker.
+
+        A timeout is not a latency sample: feeding the timeout back into
+        the reservoir would raise the adaptive timeout after every stall.
+        The breaker counts it as a slow call instead.
+        """
+        timed_out = isinstance(error, TimeoutError)
+        llm_provider_attempts.labels(
+            provider.name, "timeout" if timed_out else "error"
+        ).inc()
+        state = provider.breaker.state
+        provider.breaker.record_failure(timed_out)
+        self._log_transition(provider, state)
+
+    def stats(self) -> list[dict]:
+        """Describe every provider."""
+        return [
+            {
+                **provider.stats(),
+                "first_token_timeout_seconds": self.timeout_for(provider),
+            }
+            for provider in self.providers
+        ]
+
+    @staticmethod
+    def _take(queue: list[Provider]) -> Optional[Provider]:
+        """Pop the next provider whose breaker lets a call through."""
+        while queue:
+            provider = queue.pop(0)
+            if provider.breaker.allow():
+                return provider
+        return None
+
+    def _unavailable(self) -> LLMUnavailableError:
+        """Build the error for a pool with every breaker open."""
+        retry_after = min(provider.breaker.retry_after for provider in self.providers)
+        return LLMUnavailableError(max(math.ceil(retry_after), 1))
+
+    @staticmethod
+    def _log_transition(provider: Provider, before: str) -> None:
+        """Log a change of the provider's breaker state."""
+        after = provider.breaker.state
+        if after == before:
+            return
+        if after == CLOSED:
+            logger.info("LLM provider %s circuit closed", provider.name)
+        else:
+            logger.warning(
+                "LLM provider %s circuit %s (%s)",
+                provider.name,
+                after,
+                provider.breaker.stats(),
+            )
+
+
+def parse_providers(spec: str) -> list[tuple[str, str, str, dict]]:
+    """Parse a provider pool specification.
+
+    Args:
+        spec: ``kind:model[?option=value&...]`` entries separated by ``;``.
+            Empty means a single OpenAI provider for ``LLM_MODEL``.
+
+    Returns:
+        Name, kind, model and options of each provider. The name is the
+        ``name`` option, or ``kind:model``.
+
+    Raises:
+        ValueError: If an entry is malformed or of an unknown kind.
+    """
+    providers = []
+    for entry in (spec or f"openai:{settings.llm_model}").split(";"):
+        entry = entry.strip()
+        if not entry:
+            continue
+        target, _, query = entry.partition("?")
+        kind, sep, model = target.partition(":")
+        if not sep or not model or kind not in _FACTORIES:
+            raise ValueError(f"Invalid LLM provider: {entry!r}")
+        options = dict(parse_qsl(query))
+        providers.append((options.pop("name", target), kind, model, options))
+    return providers
+
+
+def configured_models() -> list[str]:
+    """Models of the configured provider pool."""
+    return [model for _, _, model, _ in parse_providers(settings.llm_providers)]
+
+
+def _openai(model: str, options: dict, http_client: Any) -> Any:
+    """Build an OpenAI-compatible chat model.
+
+    Options: ``base_url``, and ``api_key_env`` naming the environment
+    variable holding the key (OPENAI_API_KEY's value by default).
+    """
+    from langchain_openai import ChatOpenAI
+    from pydantic import SecretStr
+
+    api_key = settings.openai_api_key
+    if "api_key_env" in options:
+        api_key = os.getenv(options.pop("api_key_env"), "")
+    base_url = options.pop("base_url", None)
+    if options:
+        raise ValueError(f"Unknown openai provider options: {sorted(options)}")
+    return ChatOpenAI(
+        temperature=settings.llm_temperature,
+        model=model,
+        api_key=SecretStr(api_key),
+        base_url=base_url,
+        http_async_client=http_client,
+        timeout=settings.llm_timeout_seconds,
+        max_retries=settings.llm_max_retries,
+        stream_usage=True,
+    )
+
+
+def _stub(model: str, options: dict, http_client: Any) -> Any:
+    """Build a local stub chat model.
+
+    Options: ``latency`` (time to first token, e.g. ``lognormal:0.3,0.5``),
+    ``tokens_per_second``, ``response_words``, ``error_rate`` and ``seed``.
+    """
+    from src.services.stub_llm import LatencyDistribution, StubChatModel
+
+    stub = StubChatModel(
+        first_token_latency=LatencyDistribution.parse(
+            options.pop("latency", "constant:0")
+        ),
+        tokens_per_second=float(options.pop("tokens_per_second", 0)),
+        response_words=int(options.pop("response_words", 60)),
+        error_rate=float(options.pop("error_rate", 0)),
+        seed=int(options.pop("seed", 0)),
+    )
+    if options:
+        raise ValueError(f"Unknown stub provider options: {sorted(options)}")
+    return stub
+
+
+_FACTORIES: dict[str, Callable[[str, dict, Any], Any]] = {
+    "openai": _openai,
+    "stub": _stub,
+}
@@ -1,14 +1,43 @@
 """LLM service using LangChain."""
 
+import asyncio
+import base64
+import json
+import time
 from datetime import datetime, timezone
-from sqlalchemy.orm import Session
+from typing import Any, AsyncIterator, Mapping, Optional
 
+import httpx
+from sqlalchemy import ColumnElement, Select, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.metrics import (
+    llm_calls_error,
+    llm_calls_ok,
+    llm_first_token_seconds,
+    llm_queue_wait_seconds,
+    llm_total_seconds,
+    llm_upstream_in_use,
+)
 from src.models.query_log import QueryLog
+from src.models.response_blob import ResponseBlob
+from src.services.fair_scheduler import FairScheduler, SchedulerBusyError
+from src.services.llm_router import (
+    LLMRouter,
+    LLMUnavailableError,
+    Provider,
+    configured_models,
+)
+from src.services.query_log_archive import query_log_archive
+from src.services.query_log_writer import QueryLogWriter
+from src.services.response_cache import ResponseCache
+from src.services.response_store import response_store
+from src.services.semantic_cache import SemanticCache
+from src.services.single_flight import SingleFlight
 from src.utils.logger import get_logger
+from src.utils.tokens import count_prompt_tokens, count_tokens, load_encoding
 from config.settings import get_settings
 
-from langchain_openai import ChatOpenAI
-
 logger = get_logger(__name__)
 settings = get_settings()
 
@@ -18,75 +47,674 @@ class LLMService:
 
     def __init__(self):
         """Initialize LLM service."""
-        # Initialize LangChain components
+        # Shared, pooled HTTP client reused by every upstream call
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.llm_max_connections,
+                max_keepalive_connections=settings.llm_max_keepalive_connections,
+            ),
+            timeout=httpx.Timeout(settings.llm_timeout_seconds),
+        )
+
+        # Cap on concurrent upstream calls from this worker, shared fairly
+        # between users once it is reached
+        self.scheduler = FairScheduler()
+
+        self.cache = ResponseCache() if settings.cache_enabled else None
+        self.semantic_cache = (
+            SemanticCache() if settings.semantic_cache_enabled else None
+        )
+        self.single_flight = SingleFlight() if settings.singleflight_enabled else None
+        self.log_writer = QueryLogWriter()
+
+        # Provider pool, created by init_llm during warm-up or on first use
+        self.router: Optional[LLMRouter] = None
+
+    @property
+    def initialized(self) -> bool:
+        """Whether the provider pool has been created."""
+        return self.router is not None
+
+    def init_llm(self) -> bool:
+        """Create the provider pool if it does not exist yet.
+
+        The OpenAI client takes about a second to import, so it is imported
+        here rather than with this module. Call from a worker thread.
+
+        Returns:
+            True if the provider pool is available.
+        """
+        if self.router is not None:
+            return True
         try:
-            self.llm = ChatOpenAI(
-                temperature=0.7,
-                model_name=settings.llm_model,
-                openai_api_key=settings.openai_api_key,
-            )
-            self.initialized = True
+            self.router = LLMRouter.from_settings(self.http_client)
         except Exception as e:
-            logger.error(f"Failed to initialize LLM: {e}")
-            self.initialized = False
+            logger.error("Failed to initialize LLM: %s", e)
+        return self.router is not None
+
+    def _require_llm(self) -> LLMRouter:
+        """Make sure the provider pool exists before serving a query.
 
-    async def process_query(self, user_id: int, query: str, db: Session) -> dict:
+        Returns:
+            Provider pool.
+
+        Raises:
+            RuntimeError: If the provider pool cannot be created.
+        """
+        if self.router is None:
+            self.init_llm()
+        if self.router is None:
+            raise RuntimeError("LLM service not initialized")
+        return self.router
+
+    def admit(self, user_id: int) -> None:
+        """Check that an LLM call for the user would be accepted right now.
+
+        Args:
+            user_id: User ID.
+
+        Raises:
+            LLMUnavailableError: If every provider's circuit is open.
+            SchedulerBusyError: If the call queue has no room for it.
+        """
+        if self.router is not None:
+            self.router.ensure_available()
+        self.scheduler.admit(user_id)
+
+    async def process_query(self, user_id: int, query: str) -> dict:
         """Process user query with LLM.
 
         Args:
             user_id: User ID.
             query: User query.
-            db: Database session.
 
         Returns:
-            Dictionary with response and metadata.
+            Dictionary with response and metadata. ``cached`` is True when
+            the response was served from the cache; token counts and
+            ``queue_wait_ms`` are None for cached responses.
+
+        Raises:
+            SchedulerBusyError: If the LLM call queue is full or the wait
+                for a slot timed out.
+            LLMUnavailableError: If every provider's circuit is open.
         """
-        if not self.initialized:
-            raise RuntimeError("LLM service not initialized")
+        self._require_llm()
 
         try:
-            # Process query with LLM
-            response = self.llm.invoke(query)
-
-            # Log query
-            query_log = QueryLog(
-                user_id=user_id,
-                query=query,
-                response=str(response.content),
-                llm_model_used=settings.llm_model,
-                created_at=datetime.now(timezone.utc),
+            content, cached, usage, model, queue_wait_ms = await self._answer(
+                user_id, query
             )
-            db.add(query_log)
-            db.commit()
+            created_at = await self._log_query(user_id, query, content, usage, model)
+
+            logger.info(
+                "Query processed for user %s (cached=%s)",
+                user_id,
+                cached,
+                extra={"user_id": user_id, "cached": cached},
+            )
+
+            return self._result(
+                content, cached, usage, model, queue_wait_ms, created_at
+            )
+
+        except (SchedulerBusyError, LLMUnavailableError):
+            raise
+        except Exception as e:
+            logger.error("Error processing query: %s", e)
+            raise
+
+    async def process_batch(
+        self, user_id: int, queries: list[str], max_concurrency: int
+    ) -> list[dict | BaseException]:
+        """Process several queries concurrently and log them in one insert.
+
+        Args:
+            user_id: User ID.
+            queries: User queries.
+            max_concurrency: Maximum queries of the batch in flight at once.
+
+        Returns:
+            For each query, in order, a result dictionary as returned by
+            ``process_query`` or the exception that made it fail.
+        """
+        self._require_llm()
+
+        semaphore = asyncio.Semaphore(max_concurrency)
 
-            logger.info(f"Query processed for user {user_id}")
+        async def answer(query: str) -> tuple[str, bool, dict, str, Optional[float]]:
+            async with semaphore:
+                return await self._answer(user_id, query)
+
+        outcomes = await asyncio.gather(
+            *(answer(query) for query in queries), return_exceptions=True
+        )
+
+        created_at = datetime.now(timezone.utc)
+        results: list[dict | BaseException] = []
+        rows = []
+        for query, outcome in zip(queries, outcomes):
+            if isinstance(outcome, BaseException):
+                logger.error("Error processing batch query: %s", outcome)
+                results.append(outcome)
+                continue
+            content, cached, usage, model, queue_wait_ms = outcome
+            rows.append(
+                self._log_row(user_id, query, content, usage, model, created_at)
+            )
+            results.append(
+                self._result(content, cached, usage, model, queue_wait_ms, created_at)
+            )
+
+        if rows:
+            await self.log_writer.write_many(rows)
+
+        logger.info(
+            "Batch of %s queries processed for user %s (%s succeeded)",
+            len(queries),
+            user_id,
+            len(rows),
+        )
+        return results
+
+    async def _answer(
+        self, user_id: int, query: str
+    ) -> tuple[str, bool, dict, str, Optional[float]]:
+        """Answer a query from the caches or the LLM.
+
+        Args:
+            user_id: User ID.
+            query: User query.
+
+        Returns:
+            Response text, whether it was cached, token usage, the model
+            that answered, and milliseconds spent waiting for an LLM slot.
+            Cached answers are credited to the default model and did not
+            wait.
+        """
+        router = self._require_llm()
+        cache_key = self._cache_key(query)
+        content = await self._get_cached(cache_key, query)
+        if content is not None:
+            return content, True, self._no_usage(), router.default_model, None
+
+        # Identical concurrent queries share one upstream call, queued for
+        # the user who made it first
+        if self.single_flight:
+            result, shared = await self.single_flight.do(
+                cache_key, lambda: self._invoke(user_id, query), decode=tuple
+            )
+        else:
+            result, shared = await self._invoke(user_id, query), False
+        content, usage, model, queue_wait_ms = result
+        if not shared:
+            await self._set_cached(cache_key, query, content)
+        return content, False, usage, model, queue_wait_ms
+
+    @staticmethod
+    def _result(
+        content: str,
+        cached: bool,
+        usage: dict,
+        model: str,
+        queue_wait_ms: Optional[float],
+        created_at: datetime,
+    ) -> dict:
+        """Build the result dictionary of a processed query."""
+        return {
+            "response": content,
+            "llm_model_used": model,
+            "created_at": created_at,
+            "cached": cached,
+            "queue_wait_ms": queue_wait_ms,
+            **usage,
+        }
+
+    async def _invoke(self, user_id: int, query: str) -> tuple[str, dict, str, float]:
+        """Get a complete answer from the provider pool.
+
+        The call first waits for its turn in the scheduler. Nothing has
+        reached the client yet, so a provider failing partway through its
+        answer is replaced by the next one.
+
+        Args:
+            user_id: User the call is made for.
+            query: User query.
+
+        Returns:
+            LLM response text, token usage, the model that answered, and
+            milliseconds spent waiting for a slot.
+
+        Raises:
+            SchedulerBusyError: If the call was not given a slot.
+            LLMUnavailableError: If every provider's circuit is open.
+            TimeoutError: If no answer completed within ``LLM_TIMEOUT_SECONDS``.
+        """
+        router = self._require_llm()
+        # Do not queue for providers that would refuse the call anyway
+        router.ensure_available()
+        async with self.scheduler.slot(
+            user_id, self.estimate_tokens(query)
+        ) as queue_wait:
+            llm_queue_wait_seconds.observe(queue_wait)
+            llm_upstream_in_use.inc()
+            start = time.perf_counter()
+            # One deadline for the whole call, fallbacks included, so a
+            # provider trickling tokens cannot hold the slot indefinitely
+            deadline = time.monotonic() + settings.llm_timeout_seconds
+            failed: list[Provider] = []
+            try:
+                async with asyncio.timeout(settings.llm_timeout_seconds):
+                    while True:
+                        routed = await router.open(
+                            query, exclude=failed, deadline=deadline
+                        )
+                        if not failed:
+                            llm_first_token_seconds.observe(time.perf_counter() - start)
+                        try:
+                            content, usage_metadata = await routed.collect()
+                            break
+                        except Exception:
+                            failed.append(routed.provider)
+                            if len(failed) == len(router.providers):
+                                raise
+            except BaseException:
+                llm_calls_error.inc()
+                raise
+            finally:
+                llm_upstream_in_use.dec()
+                llm_total_seconds.observe(time.perf_counter() - start)
+        llm_calls_ok.inc()
+        usage = self._usage(query, content, usage_metadata, routed.model)
+        return content, usage, routed.model, round(queue_wait * 1000, 1)
+
+    def estimate_tokens(self, query: str) -> int:
+        """Estimate the total tokens a query will cost before calling the LLM.
+
+        Args:
+            query: User query.
+
+        Returns:
+            Prompt tokens plus the expected completion size.
+        """
+        return (
+            count_prompt_tokens(query, settings.llm_model)
+            + settings.token_budget_completion_estimate
+        )
+
+    @staticmethod
+    def _usage(
+        query: str,
+        content: str,
+        usage_metadata: Optional[Mapping[str, Any]],
+        model: str,
+    ) -> dict:
+        """Build token usage from the model response.
+
+        Falls back to local counts when the provider reports no usage.
+
+        Args:
+            query: User query.
+            content: LLM response text.
+            usage_metadata: Usage reported with the response, if any.
+            model: Model that answered.
 
-            return {
-                "response": str(response.content),
-                "llm_model_used": settings.llm_model,
-                "created_at": query_log.created_at,
+        Returns:
+            Prompt, completion and total token counts.
+        """
+        if usage_metadata:
+            prompt_tokens = usage_metadata["input_tokens"]
+            completion_tokens = usage_metadata["output_tokens"]
+        else:
+            prompt_tokens = count_prompt_tokens(query, model)
+            completion_tokens = count_tokens(content, model)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "tokens_used": prompt_tokens + completion_tokens,
+        }
+
+    @staticmethod
+    def _no_usage() -> dict:
+        """Token usage of a response that did not call the LLM."""
+        return {"prompt_tokens": None, "completion_tokens": None, "tokens_used": None}
+
+    async def stream_query(self, user_id: int, query: str) -> AsyncIterator[dict]:
+        """Stream user query tokens from the LLM as they are produced.
+
+        The query is logged once the stream has completed. A cached response
+        is sent as a single token event.
+
+        Args:
+            user_id: User ID.
+            query: User query.
+
+        Yields:
+            Token events followed by a final completion event.
+
+        Raises:
+            SchedulerBusyError: If the LLM call was not given a slot.
+            LLMUnavailableError: If every provider's circuit is open.
+        """
+        router = self._require_llm()
+
+        chunks: list[str] = []
+        usage_metadata = None
+        queue_wait_ms = None
+        try:
+            cache_key = self._cache_key(query)
+            content = await self._get_cached(cache_key, query)
+            cached = content is not None
+            model = router.default_model
+
+            if content is not None:
+                chunks.append(content)
+                yield {"type": "token", "content": content}
+            else:
+                router.ensure_available()
+                cost = self.estimate_tokens(query)
+                async with self.scheduler.slot(user_id, cost) as queue_wait:
+                    llm_queue_wait_seconds.observe(queue_wait)
+                    queue_wait_ms = round(queue_wait * 1000, 1)
+                    llm_upstream_in_use.inc()
+                    start = time.perf_counter()
+                    try:
+                        # Tokens go straight to the client, so only failures
+                        # before the first token can move to another provider.
+                        # The stream stops at LLM_TIMEOUT_SECONDS either way.
+                        routed = await router.open(query)
+                        model = routed.model
+                        async for chunk in routed.chunks():
+                            if chunk.usage_metadata:
+                                from langchain_core.messages.ai import add_usage
+
+                                usage_metadata = add_usage(
+                                    usage_metadata, chunk.usage_metadata
+                                )
+
+                            token = str(chunk.content)
+                            if token:
+                                if not chunks:
+                                    llm_first_token_seconds.observe(
+                                        time.perf_counter() - start
+                                    )
+                                chunks.append(token)
+                                yield {"type": "token", "content": token}
+                    except BaseException:
+                        llm_calls_error.inc()
+                        raise
+                    finally:
+                        llm_upstream_in_use.dec()
+                        llm_total_seconds.observe(time.perf_counter() - start)
+                    llm_calls_ok.inc()
+
+            content = "".join(chunks)
+            usage = self._no_usage()
+            if not cached:
+                usage = self._usage(query, content, usage_metadata, model)
+                await self._set_cached(cache_key, query, content)
+
+            created_at = await self._log_query(user_id, query, content, usage, model)
+
+            logger.info(
+                "Streamed query processed for user %s (cached=%s)",
+                user_id,
+                cached,
+                extra={"user_id": user_id, "cached": cached},
+            )
+
+            yield {
+                "type": "done",
+                "llm_model_used": model,
+                "created_at": created_at.isoformat(),
+                "cached": cached,
+                "queue_wait_ms": queue_wait_ms,
+                **usage,
             }
 
+        except (SchedulerBusyError, LLMUnavailableError):
+            raise
         except Exception as e:
-            logger.error(f"Error processing query: {e}")
+            logger.error("Error streaming query: %s", e)
             raise
 
     @staticmethod
-    def get_query_history(db: Session, user_id: int, limit: int = 10) -> list:
-        """Get query history for user.
+    def _cache_key(query: str) -> str:
+        """Build the response cache key for a query.
+
+        Args:
+            query: User query.
+
+        Returns:
+            Cache key.
+        """
+        return ResponseCache.make_key(
+            query, settings.llm_model, settings.llm_temperature
+        )
+
+    async def _get_cached(self, cache_key: str, query: str) -> Optional[str]:
+        """Look up a query in the exact-match cache, then the semantic cache.
+
+        Args:
+            cache_key: Exact-match cache key.
+            query: User query.
+
+        Returns:
+            Cached response or None.
+        """
+        content = await self.cache.get(cache_key) if self.cache else None
+        if content is None and self.semantic_cache:
+            content = await self.semantic_cache.lookup(query)
+        return content
+
+    async def _set_cached(self, cache_key: str, query: str, content: str) -> None:
+        """Store an LLM response in the enabled caches.
+
+        Args:
+            cache_key: Exact-match cache key.
+            query: User query.
+            content: LLM response text.
+        """
+        if self.cache:
+            await self.cache.set(cache_key, content)
+        if self.semantic_cache:
+            await self.semantic_cache.add(query, content)
+
+    async def warm_semantic_cache(self, db: AsyncSession) -> None:
+        """Load the persisted semantic index and add newer query logs.
+
+        Args:
+            db: Database session.
+        """
+        if self.semantic_cache:
+            await asyncio.to_thread(self.semantic_cache.load)
+            await self.semantic_cache.rebuild_from_db(db)
+
+    def save_semantic_cache(self) -> None:
+        """Persist the semantic index to disk."""
+        if self.semantic_cache:
+            self.semantic_cache.save()
+
+    async def _log_query(
+        self, user_id: int, query: str, response: str, usage: dict, model: str
+    ) -> datetime:
+        """Queue a processed query for persistence.
+
+        Args:
+            user_id: User ID.
+            query: User query.
+            response: LLM response text.
+            usage: Prompt, completion and total token counts.
+            model: Model that answered.
+
+        Returns:
+            Query log creation time.
+        """
+        created_at = datetime.now(timezone.utc)
+        await self.log_writer.write(
+            self._log_row(user_id, query, response, usage, model, created_at)
+        )
+        return created_at
+
+    @staticmethod
+    def _log_row(
+        user_id: int,
+        query: str,
+        response: str,
+        usage: dict,
+        model: str,
+        created_at: datetime,
+    ) -> dict:
+        """Build the QueryLog column values of a processed query."""
+        return {
+            "user_id": user_id,
+            "query": query,
+            "response": response,
+            "llm_model_used": model,
+            # Stored as naive UTC, matching the column and partition bounds
+            "created_at": created_at.replace(tzinfo=None),
+            **usage,
+        }
+
+    async def start(self) -> None:
+        """Start background workers."""
+        await self.log_writer.start()
+
+    async def warm_up(self) -> None:
+        """Create the provider pool and load tokenizers off the event loop."""
+        await asyncio.to_thread(self.init_llm)
+        for model in configured_models():
+            await asyncio.to_thread(load_encoding, model)
+
+    async def aclose(self) -> None:
+        """Flush pending query logs and close the shared HTTP client."""
+        await self.log_writer.stop()
+        await self.http_client.aclose()
+
+    @staticmethod
+    async def get_query_history(
+        db: AsyncSession,
+        user_id: int,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        preview: bool = False,
+    ) -> tuple[list[dict], Optional[str]]:
+        """Get a page of query history for user, newest first.
+
+        Pages are read with keyset pagination on ``(created_at, id)``, so
+        every page costs the same regardless of how deep it is. Once the
+        hot table runs out, the page continues from the archive. Stored
+        responses are decompressed only for the rows returned, and only as
+        far as the preview needs.
 
         Args:
             db: Database session.
             user_id: User ID.
             limit: Maximum number of records.
+            cursor: Cursor returned with the previous page.
+            preview: Return only the start of each response.
 
         Returns:
-            List of query logs.
+            Query logs and the cursor of the next page, if any.
+
+        Raises:
+            ValueError: If the cursor is invalid.
         """
-        return (
-            db.query(QueryLog)
-            .filter(QueryLog.user_id == user_id)
-            .order_by(QueryLog.created_at.desc())
-            .limit(limit)
-            .all()
+        response: ColumnElement[Any] = QueryLog.response
+        if preview:
+            response = func.substr(QueryLog.response, 1, settings.history_preview_chars)
+        stmt: Select = (
+            select(
+                QueryLog.id,
+                QueryLog.query,
+                QueryLog.llm_model_used,
+                QueryLog.created_at,
+                QueryLog.prompt_tokens,
+                QueryLog.completion_tokens,
+                QueryLog.tokens_used,
+                response.label("response"),
+                ResponseBlob.codec,
+                ResponseBlob.data,
+            )
+            .outerjoin(ResponseBlob, ResponseBlob.hash == QueryLog.response_hash)
+            .where(QueryLog.user_id == user_id)
+        )
+        before = None
+        if cursor is not None:
+            before = decode_history_cursor(cursor)
+            stmt = stmt.where(
+                tuple_(QueryLog.created_at, QueryLog.id) < tuple_(*before)
+            )
+
+        # Fetch one extra row to know whether another page follows
+        result = await db.execute(
+            stmt.order_by(QueryLog.created_at.desc(), QueryLog.id.desc()).limit(
+                limit + 1
+            )
+        )
+        rows = [dict(row) for row in result.mappings()]
+
+        # The archive is only read once something was archived; reading it
+        # stays off the hot path of deployments that never archive
+        if len(rows) <= limit and query_log_archive.months():
+            if rows:
+                before = (rows[-1]["created_at"], rows[-1]["id"])
+            archived = await asyncio.to_thread(
+                query_log_archive.read_user, user_id, before, limit + 1 - len(rows)
+            )
+            for row in archived:
+                row.pop("user_id", None)
+            rows.extend(archived)
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_history_cursor(rows[-1]["created_at"], rows[-1]["id"])
+
+        # Only the rows actually returned are decompressed
+        await response_store.load_missing_dictionaries(
+            db, (row.get("codec") for row in rows)
         )
+        max_chars = settings.history_preview_chars if preview else None
+        key = "response_preview" if preview else "response"
+        for row in rows:
+            row[key] = response_store.resolve(
+                row.pop("response"),
+                row.pop("codec", None),
+                row.pop("data", None),
+                max_chars,
+            )
+        return rows, next_cursor
+
+
+def encode_history_cursor(created_at: datetime, log_id: int) -> str:
+    """Encode the position after a history row as an opaque cursor.
+
+    Args:
+        created_at: Row creation time.
+        log_id: Row ID.
+
+    Returns:
+        URL-safe cursor.
+    """
+    payload = json.dumps([created_at.isoformat(), log_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_history_cursor(cursor: str) -> tuple[datetime, int]:
+    """Decode a history cursor.
+
+    Args:
+        cursor: Cursor from ``encode_history_cursor``.
+
+    Returns:
+        Row creation time and ID.
+
+    Raises:
+        ValueError: If the cursor is invalid.
+    """
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, log_id = json.loads(payload)
+        return datetime.fromisoformat(created_at), int(log_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid history cursor") from e
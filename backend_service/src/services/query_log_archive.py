@@ -0,0 +1,193 @@
+"""Compressed on-disk archive of old query logs.
+
+Each archived month is one ``YYYY-MM.ndjson.gz`` file holding one gzip
+member per user, with rows newest first, plus a ``YYYY-MM.index.json``
+mapping user IDs to the byte range of their member. The file as a whole
+is a normal gzip stream; a single user's rows are read by seeking to
+their member and decompressing only that.
+"""
+
+import gzip
+import json
+import os
+import threading
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+
+from src.utils.logger import get_logger
+from config.settings import get_settings
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+_MANIFEST = "manifest.json"
+
+
+class ArchiveMonthWriter:
+    """Write one archived month, one user at a time."""
+
+    def __init__(self, directory: str, month: str):
+        """Open the month file for writing.
+
+        Args:
+            directory: Archive directory.
+            month: Month label, ``YYYY-MM``.
+        """
+        self.data_path = os.path.join(directory, f"{month}.ndjson.gz")
+        self.index_path = os.path.join(directory, f"{month}.index.json")
+        self.rows = 0
+        self._index: dict[str, list[int]] = {}
+        self._file = open(f"{self.data_path}.tmp", "wb")
+
+    def write_user(self, user_id: int, rows: list[dict]) -> None:
+        """Append all of a user's rows for the month as one gzip member.
+
+        Args:
+            user_id: User ID.
+            rows: Rows sorted newest first.
+        """
+        lines = "".join(json.dumps(row, default=str) + "\n" for row in rows)
+        member = gzip.compress(lines.encode(), compresslevel=6)
+        self._index[str(user_id)] = [self._file.tell(), len(member), len(rows)]
+        self._file.write(member)
+        self.rows += len(rows)
+
+    def commit(self) -> None:
+        """Flush the month to disk and move it into place."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        with open(f"{self.index_path}.tmp", "w") as f:
+            json.dump(self._index, f)
+        os.replace(f"{self.data_path}.tmp", self.data_path)
+        os.replace(f"{self.index_path}.tmp", self.index_path)
+
+    def abort(self) -> None:
+        """Discard a partially written month."""
+        self._file.close()
+        for path in (f"{self.data_path}.tmp", f"{self.index_path}.tmp"):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class QueryLogArchive:
+    """Read and write archived query log months."""
+
+    def __init__(self, directory: str = settings.query_log_archive_dir):
+        """Initialize archive.
+
+        Args:
+            directory: Archive directory.
+        """
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def open_month(self, month: str) -> ArchiveMonthWriter:
+        """Start writing a month.
+
+        Args:
+            month: Month label, ``YYYY-MM``.
+
+        Returns:
+            Month writer; call ``commit`` and then ``mark_archived``.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        return ArchiveMonthWriter(self.directory, month)
+
+    def months(self) -> list[str]:
+        """List the archived months, newest first.
+
+        A month is listed once its file is complete, just before its rows
+        are removed from the hot table. Only the manifest's modification
+        time is checked while it is unchanged, so this is cheap to call on
+        every request.
+
+        Returns:
+            Month labels.
+        """
+        return list(
+            _read_manifest(os.path.join(self.directory, _MANIFEST), self._mtime())
+        )
+
+    def mark_archived(self, month: str) -> None:
+        """Record that a month's archive file is complete.
+
+        Args:
+            month: Month label, ``YYYY-MM``.
+        """
+        with self._lock:
+            months = set(self.months())
+            months.add(month)
+            path = os.path.join(self.directory, _MANIFEST)
+            with open(f"{path}.tmp", "w") as f:
+                json.dump(sorted(months, reverse=True), f)
+            os.replace(f"{path}.tmp", path)
+
+    def read_user(
+        self,
+        user_id: int,
+        before: Optional[tuple[datetime, int]],
+        limit: int,
+    ) -> list[dict]:
+        """Read a user's archived rows, newest first.
+
+        Args:
+            user_id: User ID.
+            before: Only rows strictly before this ``(created_at, id)``.
+            limit: Maximum number of rows.
+
+        Returns:
+            Query log rows.
+        """
+        rows: list[dict] = []
+        for month in self.months():
+            if before is not None and month > before[0].strftime("%Y-%m"):
+                continue
+
+            for row in self._read_month(month, user_id):
+                row["created_at"] = datetime.fromisoformat(row["created_at"])
+                if before is None or (row["created_at"], row["id"]) < before:
+                    rows.append(row)
+                    if len(rows) >= limit:
+                        return rows
+        return rows
+
+    def _read_month(self, month: str, user_id: int) -> list[dict]:
+        """Decompress a user's member of a month file."""
+        index_path = os.path.join(self.directory, f"{month}.index.json")
+        entry = _read_index(index_path, os.path.getmtime(index_path)).get(str(user_id))
+        if entry is None:
+            return []
+
+        offset, length, _ = entry
+        with open(os.path.join(self.directory, f"{month}.ndjson.gz"), "rb") as f:
+            f.seek(offset)
+            data = gzip.decompress(f.read(length))
+        return [json.loads(line) for line in data.splitlines()]
+
+    def _mtime(self) -> float:
+        """Manifest modification time, 0 if there is none."""
+        try:
+            return os.path.getmtime(os.path.join(self.directory, _MANIFEST))
+        except OSError:
+            return 0.0
+
+
+@lru_cache(maxsize=4)
+def _read_manifest(path: str, mtime: float) -> tuple[str, ...]:
+    """Load the archived months, cached until the manifest changes."""
+    if not mtime:
+        return ()
+    with open(path) as f:
+        return tuple(json.load(f))
+
+
+@lru_cache(maxsize=64)
+def _read_index(path: str, mtime: float) -> dict:
+    """Load a month index, cached until the file changes."""
+    with open(path) as f:
+        return json.load(f)
+
+
+query_log_archive = QueryLogArchive()
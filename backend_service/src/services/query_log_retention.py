@@ -0,0 +1,285 @@
+"""Partition maintenance and archiving of old query logs."""
+
+import asyncio
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import delete, func, select, text
+
+from src.db.database import async_engine
+from src.db.partitions import (
+    add_months,
+    drop_partition,
+    ensure_partitions,
+    is_partitioned,
+    list_partitions,
+    month_start,
+)
+from src.models.query_log import QueryLog
+from src.models.response_blob import ResponseBlob
+from src.services.query_log_archive import QueryLogArchive, query_log_archive
+from src.services.response_store import response_store
+from src.utils.logger import get_logger
+from config.settings import get_settings
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+# Arbitrary key serializing maintenance across workers on PostgreSQL
+_ADVISORY_LOCK_KEY = 0x71756572
+
+
+class QueryLogRetention:
+    """Keep monthly partitions ahead of time and archive expired months.
+
+    Months older than the retention period are written to the archive and
+    then removed from the hot table: by dropping the partition where
+    query_logs is partitioned, by deleting the rows otherwise. Response
+    blobs left without a referencing row are deleted afterwards; the
+    archive holds the response texts inline.
+
+    On PostgreSQL archiving needs the partitioned table. An unpartitioned
+    query_logs, created before partitioning was introduced, is left alone:
+    deleting a month of rows from it would hold locks and bloat the table
+    for as long as it takes. Recreate the table partitioned to enable
+    retention there.
+    """
+
+    def __init__(
+        self,
+        archive: QueryLogArchive = query_log_archive,
+        retention_months: int = settings.query_log_retention_months,
+        months_ahead: int = settings.query_log_partitions_ahead,
+        interval_seconds: float = settings.query_log_retention_interval_seconds,
+    ):
+        """Initialize retention job.
+
+        Args:
+            archive: Archive that receives expired months.
+            retention_months: Full months kept in the hot table besides the
+                current one; 0 disables archiving.
+            months_ahead: Number of future monthly partitions to keep ready.
+            interval_seconds: Time between runs.
+        """
+        self.archive = archive
+        self.retention_months = retention_months
+        self.months_ahead = months_ahead
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Start the periodic background job."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Stop the background job."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def run_once(self) -> list[str]:
+        """Create upcoming partitions and archive expired months.
+
+        Returns:
+            Labels of the months archived.
+        """
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        async with async_engine.connect() as conn:
+            if not await self._try_lock(conn):
+                logger.info("Query log maintenance already running elsewhere")
+                return []
+            try:
+                await conn.run_sync(ensure_partitions, now, self.months_ahead)
+                await conn.commit()
+
+                if self.retention_months <= 0:
+                    return []
+                if conn.dialect.name == "postgresql" and not await conn.run_sync(
+                    is_partitioned
+                ):
+                    logger.warning(
+                        "query_logs is not partitioned; archiving is disabled until it is"
+                    )
+                    return []
+                cutoff = add_months(month_start(now), -self.retention_months)
+                archived = []
+                done = set(await asyncio.to_thread(self.archive.months))
+                for month, partition in await self._expired_months(conn, cutoff):
+                    if month.strftime("%Y-%m") in done:
+                        # Never overwrite an archived month; leave late rows hot
+                        logger.warning(
+                            "Query logs from archived month %s left in place",
+                            month.strftime("%Y-%m"),
+                        )
+                        continue
+                    if await self._archive_month(conn, month, partition):
+                        archived.append(month.strftime("%Y-%m"))
+                if archived:
+                    await self._delete_unreferenced_blobs(conn)
+                return archived
+            finally:
+                await conn.rollback()
+                await self._unlock(conn)
+
+    async def _loop(self) -> None:
+        """Run the job every interval until cancelled."""
+        while True:
+            try:
+                archived = await self.run_once()
+                if archived:
+                    logger.info("Archived query logs for %s", ", ".join(archived))
+            except Exception as e:
+                logger.error("Query log maintenance failed: %s", e)
+            await asyncio.sleep(self.interval_seconds)
+
+    async def _expired_months(
+        self, conn, cutoff: datetime
+    ) -> list[tuple[datetime, Optional[str]]]:
+        """List months before the cutoff that still have hot rows.
+
+        Returns:
+            Months, oldest first, with their partition name if partitioned.
+        """
+        if await conn.run_sync(is_partitioned):
+            partitions = await conn.run_sync(list_partitions)
+            return [(month, name) for name, month in partitions if month < cutoff]
+
+        oldest = await conn.scalar(
+            select(func.min(QueryLog.created_at)).where(QueryLog.created_at < cutoff)
+        )
+        months: list[tuple[datetime, Optional[str]]] = []
+        month = month_start(oldest) if oldest is not None else cutoff
+        while month < cutoff:
+            months.append((month, None))
+            month = add_months(month, 1)
+        return months
+
+    async def _archive_month(
+        self, conn, month: datetime, partition: Optional[str]
+    ) -> bool:
+        """Write a month to the archive and remove it from the hot table.
+
+        Returns:
+            True if any rows were archived.
+        """
+        label = month.strftime("%Y-%m")
+        start, end = month, add_months(month, 1)
+        # Blobs may use dictionaries trained after this worker started; they
+        # must be known before the month's responses are inlined
+        await response_store.load_dictionaries(conn)
+        writer = await asyncio.to_thread(self.archive.open_month, label)
+
+        try:
+            result = await conn.stream(
+                select(
+                    QueryLog.id,
+                    QueryLog.user_id,
+                    QueryLog.query,
+                    QueryLog.response,
+                    QueryLog.llm_model_used,
+                    QueryLog.prompt_tokens,
+                    QueryLog.completion_tokens,
+                    QueryLog.tokens_used,
+                    QueryLog.created_at,
+                    ResponseBlob.codec,
+                    ResponseBlob.data,
+                )
+                .outerjoin(ResponseBlob, ResponseBlob.hash == QueryLog.response_hash)
+                .where(QueryLog.created_at >= start, QueryLog.created_at < end)
+                .order_by(
+                    QueryLog.user_id, QueryLog.created_at.desc(), QueryLog.id.desc()
+                )
+                .execution_options(yield_per=1000)
+            )
+
+            # Rows arrive grouped by user; each user becomes one gzip member
+            user_id, rows = None, []
+            async for row in result.mappings():
+                if row["user_id"] != user_id and rows:
+                    await asyncio.to_thread(self._write_user, writer, user_id, rows)
+                    rows = []
+                user_id = row["user_id"]
+                rows.append(dict(row))
+            if rows:
+                await asyncio.to_thread(self._write_user, writer, user_id, rows)
+            await conn.commit()
+
+            if writer.rows:
+                await asyncio.to_thread(writer.commit)
+            else:
+                await asyncio.to_thread(writer.abort)
+        except BaseException:
+            await asyncio.to_thread(writer.abort)
+            raise
+
+        if not writer.rows:
+            # Nothing to keep; an empty partition can simply go
+            if partition is not None:
+                await conn.run_sync(drop_partition, partition)
+                await conn.commit()
+            return False
+
+        # Listed before the rows are removed so they are never unreachable;
+        # history reads continue strictly after the last row, so rows
+        # present in both are not returned twice
+        await asyncio.to_thread(self.archive.mark_archived, label)
+
+        if partition is not None:
+            await conn.run_sync(drop_partition, partition)
+        else:
+            await conn.execute(
+                delete(QueryLog).where(
+                    QueryLog.created_at >= start, QueryLog.created_at < end
+                )
+            )
+        await conn.commit()
+        logger.info("Archived %s query logs from %s", writer.rows, label)
+        return True
+
+    @staticmethod
+    async def _delete_unreferenced_blobs(conn) -> None:
+        """Delete the response blobs only archived rows referenced."""
+        try:
+            deleted = await response_store.delete_unreferenced(conn)
+        except Exception as e:
+            # Tried again after the next archived month
+            await conn.rollback()
+            logger.warning("Failed to delete unreferenced response blobs: %s", e)
+            return
+        if deleted:
+            logger.info("Deleted %s unreferenced response blobs", deleted)
+
+    @staticmethod
+    def _write_user(writer, user_id: int, rows: list[dict]) -> None:
+        """Inline stored responses and write a user's rows to the archive."""
+        for row in rows:
+            row["response"] = response_store.resolve(
+                row["response"], row.pop("codec"), row.pop("data")
+            )
+        writer.write_user(user_id, rows)
+
+    @staticmethod
+    async def _try_lock(conn) -> bool:
+        """Take the maintenance lock; always succeeds without PostgreSQL."""
+        if conn.dialect.name != "postgresql":
+            return True
+        acquired = await conn.scalar(
+            text("SELECT pg_try_advisory_lock(:key)"), {"key": _ADVISORY_LOCK_KEY}
+        )
+        await conn.commit()
+        return bool(acquired)
+
+    @staticmethod
+    async def _unlock(conn) -> None:
+        """Release the maintenance lock."""
+        if conn.dialect.name == "postgresql":
+            await conn.execute(
+                text("SELECT pg_advisory_unlock(:key)"), {"key": _ADVISORY_LOCK_KEY}
+            )
+            await conn.commit()
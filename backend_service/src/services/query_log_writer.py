@@ -0,0 +1,207 @@
+"""Write-behind, batched persistence of query logs."""
+
+import asyncio
+from typing import Optional
+
+from sqlalchemy import insert
+
+from src.core.metrics import query_log_commit_seconds
+from src.db.database import AsyncSessionLocal
+from src.models.query_log import QueryLog
+from src.services.response_store import response_store
+from src.utils.logger import get_logger
+from config.settings import get_settings
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+
+class QueryLogWriter:
+    """Queue query log rows in memory and flush them as multi-row inserts.
+
+    Rows are flushed when a batch fills up or the flush interval elapses.
+    The queue is bounded: producers wait for space (backpressure) and fall
+    back to an inline insert if none frees up in time.
+
+    A batch that fails to insert is retried with exponential backoff. If it
+    still fails, its rows are inserted one at a time so that a single bad
+    row only loses itself.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = settings.query_log_batch_size,
+        flush_interval_seconds: float = settings.query_log_flush_interval_seconds,
+        max_queue_size: int = settings.query_log_queue_size,
+        enqueue_timeout_seconds: float = settings.query_log_enqueue_timeout_seconds,
+        flush_retries: int = settings.query_log_flush_retries,
+        retry_backoff_seconds: float = settings.query_log_retry_backoff_seconds,
+    ):
+        """Initialize query log writer.
+
+        Args:
+            batch_size: Maximum rows per insert.
+            flush_interval_seconds: Maximum time a row waits before flushing.
+            max_queue_size: Maximum number of queued rows.
+            enqueue_timeout_seconds: How long producers wait for queue space.
+            flush_retries: Retries of a failed batch by the background task.
+            retry_backoff_seconds: Delay before the first retry, doubled
+                for each further one.
+        """
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_queue_size = max_queue_size
+        self.enqueue_timeout_seconds = enqueue_timeout_seconds
+        self.flush_retries = flush_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.written = 0
+        self.failed = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Start the background flush task."""
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._task = asyncio.create_task(self._run(self._queue))
+
+    async def stop(self) -> None:
+        """Flush all queued rows and stop the background task."""
+        if self._task is None or self._queue is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        self._queue = None
+
+    async def write(self, row: dict) -> None:
+        """Queue a query log row for insertion.
+
+        Args:
+            row: QueryLog column values.
+        """
+        if self._task is None or self._queue is None:
+            await self._flush([row])
+            return
+
+        try:
+            await asyncio.wait_for(self._queue.put(row), self.enqueue_timeout_seconds)
+        except asyncio.TimeoutError:
+            logger.warning("Query log queue full, writing inline")
+            await self._flush([row])
+
+    async def write_many(self, rows: list[dict]) -> None:
+        """Insert query log rows immediately in one statement.
+
+        Args:
+            rows: QueryLog column values.
+        """
+        await self._flush(rows)
+
+    def stats(self) -> dict:
+        """Get writer counters.
+
+        Returns:
+            Writer statistics.
+        """
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "written": self.written,
+            "failed": self.failed,
+        }
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        """Collect queued rows into batches and flush them.
+
+        Args:
+            queue: Queue of rows, ended by a None sentinel.
+        """
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            batch = []
+            row = await queue.get()
+            deadline = loop.time() + self.flush_interval_seconds
+
+            while row is not None:
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    break
+
+                if not queue.empty():
+                    row = queue.get_nowait()
+                    continue
+
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+
+            # A None row is the shutdown sentinel
+            stopping = row is None
+            if batch:
+                await self._flush(batch, self.flush_retries)
+
+    async def _flush(self, rows: list[dict], retries: int = 0) -> None:
+        """Insert rows as one batch, retrying it, then row by row.
+
+        Inline writes from the request path do not wait for retries.
+
+        Args:
+            rows: QueryLog column values.
+            retries: Retries of the batch before it is split up.
+        """
+        for attempt in range(retries + 1):
+            try:
+                await self._insert(rows)
+                self.written += len(rows)
+                return
+            except Exception as e:
+                error = e
+            if attempt < retries:
+                delay = self.retry_backoff_seconds * 2**attempt
+                logger.warning(
+                    "Failed to write %s query logs (%s), retrying in %.1fs",
+                    len(rows),
+                    error,
+                    delay,
+                )
+                await asyncio.sleep(delay)
+
+        if len(rows) == 1:
+            self.failed += 1
+            logger.error("Failed to write query log: %s", error)
+            return
+
+        logger.warning(
+            "Failed to write %s query logs (%s), writing one by one", len(rows), error
+        )
+        for row in rows:
+            try:
+                await self._insert([row])
+                self.written += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(
+                    "Failed to write query log for user %s: %s", row.get("user_id"), e
+                )
+
+    @staticmethod
+    async def _insert(rows: list[dict]) -> None:
+        """Store the responses and insert rows in one multi-row statement.
+
+        Args:
+            rows: QueryLog column values, left unchanged so they can be
+                written again if the transaction fails.
+        """
+        # The response store replaces each response with its hash
+        rows = [dict(row) for row in rows]
+        with query_log_commit_seconds.time():
+            async with AsyncSessionLocal() as db:
+                await response_store.store(db, rows)
+                await db.execute(insert(QueryLog), rows)
+                await db.commit()
@@ -0,0 +1,194 @@
+"""Exact-match response cache for LLM queries."""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Optional, cast
+
+from redis.exceptions import RedisError
+
+from src.core.redis_client import get_redis
+from src.utils.logger import get_logger
+from config.settings import get_settings
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+
+class LRUCache:
+    """In-process LRU cache with TTL and size-based eviction."""
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: int):
+        """Initialize LRU cache.
+
+        Args:
+            max_entries: Maximum number of entries.
+            max_bytes: Maximum total size of cached values in bytes.
+            ttl_seconds: Time to live of each entry.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.total_bytes = 0
+        self._entries: OrderedDict[str, tuple[float, str, int]] = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        """Get a cached value.
+
+        Args:
+            key: Cache key.
+
+        Returns:
+            Cached value or None if missing or expired.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        """Store a value, evicting least recently used entries as needed.
+
+        Args:
+            key: Cache key.
+            value: Value to cache.
+        """
+        size = len(value.encode())
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value, size)
+        self.total_bytes += size
+
+        while (
+            len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes
+        ):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+
+    def __len__(self) -> int:
+        """Number of cached entries."""
+        return len(self._entries)
+
+    def _remove(self, key: str) -> None:
+        """Remove an entry and release its size.
+
+        Args:
+            key: Cache key.
+        """
+        _, _, size = self._entries.pop(key)
+        self.total_bytes -= size
+
+
+class ResponseCache:
+    """Two-tier response cache: in-process LRU backed by Redis."""
+
+    KEY_PREFIX = "llm_cache:"
+
+    def __init__(
+        self,
+        max_entries: int = settings.cache_max_entries,
+        max_bytes: int = settings.cache_max_bytes,
+        ttl_seconds: int = settings.cache_ttl_seconds,
+        use_redis: bool = settings.cache_redis_enabled,
+    ):
+        """Initialize response cache.
+
+        Args:
+            max_entries: Maximum number of in-process entries.
+            max_bytes: Maximum in-process size in bytes.
+            ttl_seconds: Time to live of cached responses.
+            use_redis: Whether to use the shared Redis tier.
+        """
+        self.local = LRUCache(max_entries, max_bytes, ttl_seconds)
+        self.ttl_seconds = ttl_seconds
+        self.use_redis = use_redis
+        self.hits = 0
+        self.misses = 0
+        self.redis_hits = 0
+
+    @staticmethod
+    def make_key(query: str, model: str, temperature: float) -> str:
+        """Build a cache key from the normalized query and sampling parameters.
+
+        Args:
+            query: User query.
+            model: LLM model name.
+            temperature: Sampling temperature.
+
+        Returns:
+            Cache key.
+        """
+        normalized = " ".join(query.split()).casefold()
+        payload = json.dumps([model, temperature, normalized])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        """Look up a cached response.
+
+        Args:
+            key: Cache key.
+
+        Returns:
+            Cached response or None.
+        """
+        value = self.local.get(key)
+        if value is None and self.use_redis:
+            try:
+                # The shared client decodes replies to str
+                value = cast(
+                    Optional[str], await get_redis().get(self.KEY_PREFIX + key)
+                )
+            except RedisError as e:
+                logger.warning("Response cache lookup failed: %s", e)
+                value = None
+            if value is not None:
+                self.redis_hits += 1
+                self.local.set(key, value)
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: str) -> None:
+        """Store a response in both tiers.
+
+        Args:
+            key: Cache key.
+            value: LLM response text.
+        """
+        self.local.set(key, value)
+        if self.use_redis:
+            try:
+                await get_redis().set(self.KEY_PREFIX + key, value, ex=self.ttl_seconds)
+            except RedisError as e:
+                logger.warning("Response cache store failed: %s", e)
+
+    def stats(self) -> dict:
+        """Get cache hit and miss counters.
+
+        Returns:
+            Cache statistics.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "redis_hits": self.redis_hits,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.local),
+            "bytes": self.local.total_bytes,
+        }
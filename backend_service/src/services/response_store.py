@@ -0,0 +1,373 @@
+"""Content-addressed, compressed storage of LLM responses.
+
+Each distinct response text is stored once in ``response_blobs`` under its
+SHA-256 and referenced from ``query_logs.response_hash``. Blobs are
+compressed with zlib, or with zstd and an optional trained dictionary when
+the ``zstandard`` package is installed.
+
+Train a dictionary from recent responses with::
+
+    python -m src.services.response_store train
+"""
+
+import argparse
+import asyncio
+import hashlib
+import zlib
+from typing import Iterable, Optional
+
+from sqlalchemy import CursorResult, Result, Select, delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from src.models.query_log import QueryLog
+from src.models.response_blob import ResponseBlob, ResponseDictionary
+from src.utils.logger import get_logger
+from config.settings import get_settings
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None  # type: ignore[assignment]
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+
+class ResponseStore:
+    """Compress, deduplicate and restore response texts."""
+
+    def __init__(
+        self,
+        enabled: bool = settings.response_store_enabled,
+        compression: str = settings.response_compression,
+        level: int = settings.response_compression_level,
+    ):
+        """Initialize response store.
+
+        Args:
+            enabled: Store new responses as blobs; otherwise they stay
+                inline in query_logs.
+            compression: ``zlib`` or ``zstd``; zstd falls back to zlib when
+                ``zstandard`` is not installed.
+            level: Compression level.
+        """
+        if compression == "zstd" and zstandard is None:
+            logger.warning(
+                "zstandard is not installed, compressing responses with zlib"
+            )
+            compression = "zlib"
+        self.enabled = enabled
+        self.compression = compression
+        self.level = level
+        self._dictionaries: dict[int, zstandard.ZstdCompressionDict] = {}
+        self._dictionary_id: Optional[int] = None
+
+    @staticmethod
+    def make_hash(text: str) -> str:
+        """Get the content address of a response text.
+
+        Args:
+            text: Response text.
+
+        Returns:
+            Hex SHA-256 digest.
+        """
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def compress(self, text: str) -> tuple[str, bytes]:
+        """Compress a response text.
+
+        Args:
+            text: Response text.
+
+        Returns:
+            Codec name and compressed payload.
+        """
+        raw = text.encode()
+        if self.compression == "zstd":
+            dictionary = None
+            if self._dictionary_id is not None:
+                dictionary = self._dictionaries.get(self._dictionary_id)
+            compressor = zstandard.ZstdCompressor(
+                level=self.level, dict_data=dictionary
+            )
+            codec = f"zstd:{self._dictionary_id}" if dictionary is not None else "zstd"
+            return codec, compressor.compress(raw)
+        return "zlib", zlib.compress(raw, self.level)
+
+    def decompress(
+        self, codec: str, data: bytes, max_chars: Optional[int] = None
+    ) -> str:
+        """Restore a response text.
+
+        With ``max_chars`` only enough of the payload is decompressed to
+        produce that many characters.
+
+        Args:
+            codec: Codec name from ``compress``.
+            data: Compressed payload.
+            max_chars: Maximum number of characters to return.
+
+        Returns:
+            Response text.
+
+        Raises:
+            ValueError: If the codec or its dictionary is unknown.
+        """
+        # UTF-8 needs at most 4 bytes per character
+        max_bytes = max_chars * 4 if max_chars is not None else None
+
+        if codec == "zlib":
+            if max_bytes is None:
+                raw = zlib.decompress(data)
+            else:
+                raw = zlib.decompressobj().decompress(data, max_bytes)
+        elif codec.startswith("zstd") and zstandard is not None:
+            dictionary = None
+            if codec != "zstd":
+                dictionary = self._dictionaries.get(int(codec.partition(":")[2]))
+                if dictionary is None:
+                    raise ValueError(f"Unknown compression dictionary: {codec}")
+            decompressor = zstandard.ZstdDecompressor(dict_data=dictionary)
+            if max_bytes is None:
+                raw = decompressor.decompress(data)
+            else:
+                raw = decompressor.stream_reader(data).read(max_bytes)
+        else:
+            raise ValueError(f"Unsupported response codec: {codec}")
+
+        text = raw.decode(errors="ignore" if max_bytes is not None else "strict")
+        return text if max_chars is None else text[:max_chars]
+
+    def resolve(
+        self,
+        text: Optional[str],
+        codec: Optional[str],
+        data: Optional[bytes],
+        max_chars: Optional[int] = None,
+    ) -> Optional[str]:
+        """Get the response of a query log row, inline or from its blob.
+
+        Args:
+            text: Inline response of older rows.
+            codec: Codec of the referenced blob.
+            data: Payload of the referenced blob.
+            max_chars: Maximum number of characters to return.
+
+        Returns:
+            Response text, or None if the row has none.
+        """
+        if text is not None:
+            return text if max_chars is None else text[:max_chars]
+        if codec is None or data is None:
+            return None
+        try:
+            return self.decompress(codec, data, max_chars)
+        except (ValueError, zlib.error) as e:
+            logger.error("Failed to decompress response: %s", e)
+            return None
+
+    async def store(self, db: AsyncSession | AsyncConnection, rows: list[dict]) -> None:
+        """Move the response texts of query log rows into response blobs.
+
+        Each row's ``response`` is replaced by a ``response_hash``; blobs
+        that already exist are reused. Runs in the caller's transaction.
+        Does nothing when the store is disabled.
+
+        Args:
+            db: Database session or connection.
+            rows: QueryLog column values, updated in place.
+        """
+        if not self.enabled:
+            return
+
+        texts = {}
+        for row in rows:
+            text = row.pop("response", None)
+            if text is None:
+                row["response_hash"] = None
+                continue
+            content_hash = self.make_hash(text)
+            row["response_hash"] = content_hash
+            texts[content_hash] = text
+        if not texts:
+            return
+
+        existing: Result = await db.execute(
+            select(ResponseBlob.hash).where(ResponseBlob.hash.in_(texts))
+        )
+        for (content_hash,) in existing:
+            texts.pop(content_hash)
+        if not texts:
+            return
+
+        blobs = await asyncio.to_thread(self._encode, texts)
+        await db.execute(self._insert_ignore(db), blobs)
+
+    def _encode(self, texts: dict[str, str]) -> list[dict]:
+        """Compress texts into response blob rows."""
+        blobs = []
+        for content_hash, text in texts.items():
+            codec, data = self.compress(text)
+            blobs.append(
+                {"hash": content_hash, "codec": codec, "data": data, "size": len(text)}
+            )
+        return blobs
+
+    @staticmethod
+    def _insert_ignore(db: AsyncSession | AsyncConnection):
+        """Blob insert that skips hashes written concurrently by another worker."""
+        dialect = (
+            db.get_bind().dialect.name
+            if isinstance(db, AsyncSession)
+            else db.dialect.name
+        )
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+            return pg_insert(ResponseBlob).on_conflict_do_nothing(
+                index_elements=["hash"]
+            )
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+            return sqlite_insert(ResponseBlob).on_conflict_do_nothing(
+                index_elements=["hash"]
+            )
+        return insert(ResponseBlob)
+
+    @staticmethod
+    async def delete_unreferenced(conn: AsyncConnection, batch_size: int = 1000) -> int:
+        """Delete the blobs no query log references any more.
+
+        Runs in batches, each committed on its own, so locks are held
+        briefly. A blob that a concurrent insert starts referencing is
+        protected by the foreign key; the delete fails and is retried on
+        the next run.
+
+        Args:
+            conn: Database connection.
+            batch_size: Blobs deleted per statement.
+
+        Returns:
+            Number of blobs deleted.
+        """
+        referenced: Select = select(QueryLog.id).where(
+            QueryLog.response_hash == ResponseBlob.hash
+        )
+        unreferenced = (
+            select(ResponseBlob.hash).where(~referenced.exists()).limit(batch_size)
+        ).scalar_subquery()
+        deleted = 0
+        while True:
+            result: CursorResult = await conn.execute(
+                delete(ResponseBlob).where(ResponseBlob.hash.in_(unreferenced))
+            )
+            await conn.commit()
+            deleted += result.rowcount
+            if result.rowcount < batch_size:
+                return deleted
+
+    async def load_dictionaries(self, db: AsyncSession | AsyncConnection) -> None:
+        """Load trained dictionaries; the newest one is used for new blobs.
+
+        Args:
+            db: Database session or connection.
+        """
+        if zstandard is None:
+            return
+        result: Result = await db.execute(
+            select(ResponseDictionary.id, ResponseDictionary.data).order_by(
+                ResponseDictionary.created_at
+            )
+        )
+        for row in result:
+            self._dictionaries[row.id] = zstandard.ZstdCompressionDict(row.data)
+            self._dictionary_id = row.id
+        if self._dictionaries:
+            logger.info("Loaded %s compression dictionaries", len(self._dictionaries))
+
+    async def load_missing_dictionaries(
+        self, db: AsyncSession | AsyncConnection, codecs: Iterable[Optional[str]]
+    ) -> None:
+        """Reload dictionaries if a codec uses one that is not loaded.
+
+        Dictionaries trained after this worker started are only known once
+        reloaded; call this before resolving rows that may use them.
+
+        Args:
+            db: Database session or connection.
+            codecs: Codecs of the blobs about to be resolved.
+        """
+        if zstandard is None:
+            return
+        for codec in codecs:
+            if codec is None or not codec.startswith("zstd:"):
+                continue
+            if int(codec.partition(":")[2]) not in self._dictionaries:
+                await self.load_dictionaries(db)
+                return
+
+    async def train_dictionary(self, db: AsyncSession, samples: int, size: int) -> int:
+        """Train a zstd dictionary from recent responses and store it.
+
+        Args:
+            db: Database session.
+            samples: Number of recent responses to train on.
+            size: Dictionary size in bytes.
+
+        Returns:
+            Dictionary ID.
+
+        Raises:
+            RuntimeError: If zstandard is not installed.
+        """
+        if zstandard is None:
+            raise RuntimeError("Training a dictionary requires the zstandard package")
+
+        await self.load_dictionaries(db)
+        result: Result = await db.execute(
+            select(QueryLog.response, ResponseBlob.codec, ResponseBlob.data)
+            .outerjoin(ResponseBlob, ResponseBlob.hash == QueryLog.response_hash)
+            .order_by(QueryLog.id.desc())
+            .limit(samples)
+        )
+        texts = [self.resolve(*row) for row in result]
+        corpus = [text.encode() for text in texts if text]
+
+        dictionary = await asyncio.to_thread(zstandard.train_dictionary, size, corpus)
+        dictionary_id = dictionary.dict_id()
+        db.add(ResponseDictionary(id=dictionary_id, data=dictionary.as_bytes()))
+        await db.commit()
+        logger.info(
+            "Trained dictionary %s from %s responses", dictionary_id, len(corpus)
+        )
+        return dictionary_id
+
+
+response_store = ResponseStore()
+
+
+async def _main() -> None:
+    """Command line entry point."""
+    from src.db.database import AsyncSessionLocal, async_engine
+
+    parser = argparse.ArgumentParser(description="Response store maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train = commands.add_parser("train", help="Train a zstd compression dictionary")
+    train.add_argument(
+        "--samples", type=int, default=settings.response_dictionary_samples
+    )
+    train.add_argument("--size", type=int, default=settings.response_dictionary_size)
+    args = parser.parse_args()
+
+    async with AsyncSessionLocal() as db:
+        dictionary_id = await response_store.train_dictionary(
+            db, args.samples, args.size
+        )
+    await async_engine.dispose()
+    print(f"Trained dictionary {dictionary_id}")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
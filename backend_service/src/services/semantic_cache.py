@@ -0,0 +1,374 @@
+"""Semantic (embedding-similarity) response cache for LLM queries."""
+
+import asyncio
+import importlib
+import json
+import math
+import operator
+import os
+import random
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from sqlalchemy import Result, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.query_log import QueryLog
+from src.models.response_blob import ResponseBlob
+from src.services.llm_router import configured_models
+from src.services.response_store import response_store
+from src.utils.logger import get_logger
+from config.settings import get_settings
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+Embedder = Callable[[str], list[float]]
+
+# Query logs embedded and indexed per worker-thread hop during a rebuild
+REBUILD_CHUNK_SIZE = 256
+
+
+def load_embedder(path: str) -> Embedder:
+    """Load an embedding function from a ``module:function`` path.
+
+    Args:
+        path: Import path of the embedding function.
+
+    Returns:
+        Embedding function.
+
+    Raises:
+        ValueError: If no path is given.
+    """
+    if not path:
+        # Similarity is only as good as the embedding; a lexical one matches
+        # prompts that differ in a single word, e.g. "odd" and "even"
+        raise ValueError(
+            "The semantic cache needs an embedding model: set SEMANTIC_CACHE_EMBEDDER, "
+            "e.g. to src.services.embeddings:sentence_transformer_embedding"
+        )
+    module_name, _, attr = path.partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def _dot(a: list[float], b: list[float]) -> float:
+    """Dot product of two vectors."""
+    return sum(map(operator.mul, a, b))
+
+
+def _normalize(vector: list[float]) -> list[float]:
+    """Scale a vector to unit length."""
+    norm = math.sqrt(_dot(vector, vector))
+    return [v / norm for v in vector] if norm else vector
+
+
+class LSHIndex:
+    """Approximate nearest-neighbour index using random-hyperplane LSH."""
+
+    def __init__(
+        self, dim: int, num_tables: int = 8, num_bits: int = 12, seed: int = 0
+    ):
+        """Initialize LSH index.
+
+        Args:
+            dim: Vector dimension.
+            num_tables: Number of hash tables.
+            num_bits: Hyperplanes (signature bits) per table.
+            seed: Seed for the random hyperplanes.
+        """
+        rng = random.Random(seed)
+        self.planes = [
+            [[rng.gauss(0.0, 1.0) for _ in range(dim)] for _ in range(num_bits)]
+            for _ in range(num_tables)
+        ]
+        self.tables: list[dict[int, set[int]]] = [{} for _ in range(num_tables)]
+        self.vectors: dict[int, list[float]] = {}
+
+    def add(self, item_id: int, vector: list[float]) -> None:
+        """Add a unit vector to the index.
+
+        Args:
+            item_id: Item ID.
+            vector: Unit-length vector.
+        """
+        self.vectors[item_id] = vector
+        for table, signature in zip(self.tables, self._signatures(vector)):
+            table.setdefault(signature, set()).add(item_id)
+
+    def remove(self, item_id: int) -> None:
+        """Remove an item from the index.
+
+        Args:
+            item_id: Item ID.
+        """
+        vector = self.vectors.pop(item_id, None)
+        if vector is None:
+            return
+        for table, signature in zip(self.tables, self._signatures(vector)):
+            bucket = table.get(signature)
+            if bucket is not None:
+                bucket.discard(item_id)
+                if not bucket:
+                    del table[signature]
+
+    def nearest(self, vector: list[float]) -> tuple[Optional[int], float]:
+        """Find the most similar indexed item among LSH candidates.
+
+        Args:
+            vector: Unit-length query vector.
+
+        Returns:
+            Tuple of best item ID (or None) and its cosine similarity.
+        """
+        candidates: set[int] = set()
+        for table, signature in zip(self.tables, self._signatures(vector)):
+            candidates |= table.get(signature, set())
+
+        best_id, best_score = None, -1.0
+        for item_id in candidates:
+            score = _dot(vector, self.vectors[item_id])
+            if score > best_score:
+                best_id, best_score = item_id, score
+        return best_id, best_score
+
+    def _signatures(self, vector: list[float]) -> list[int]:
+        """Compute the per-table bit signatures of a vector."""
+        signatures = []
+        for planes in self.planes:
+            signature = 0
+            for plane in planes:
+                signature = (signature << 1) | (_dot(vector, plane) >= 0.0)
+            signatures.append(signature)
+        return signatures
+
+
+class SemanticCache:
+    """Response cache keyed on embedding similarity of past queries.
+
+    Embedding and index work is CPU-bound, so the async methods run it in
+    worker threads. A lock keeps the index consistent between them; it is
+    not held while embedding.
+    """
+
+    def __init__(
+        self,
+        embedder: str = settings.semantic_cache_embedder,
+        threshold: float = settings.semantic_cache_threshold,
+        max_entries: int = settings.semantic_cache_max_entries,
+        path: str = settings.semantic_cache_path,
+    ):
+        """Initialize semantic cache.
+
+        Args:
+            embedder: Import path of the embedding function; required.
+            threshold: Minimum cosine similarity for a hit.
+            max_entries: Maximum number of stored query/response pairs.
+            path: File the index is persisted to.
+        """
+        self.embedder_path = embedder
+        self.embed = load_embedder(embedder)
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.path = path
+        self.index: Optional[LSHIndex] = None
+        self.entries: OrderedDict[int, tuple[str, str]] = OrderedDict()
+        self._ids_by_query: dict[str, int] = {}
+        self.last_log_id = 0
+        self.hits = 0
+        self.misses = 0
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    async def lookup(self, query: str) -> Optional[str]:
+        """Find a stored response for a similar query.
+
+        Args:
+            query: User query.
+
+        Returns:
+            Stored response or None if no entry is similar enough.
+        """
+        if self.index is None or not self.entries:
+            self.misses += 1
+            return None
+        return await asyncio.to_thread(self._lookup, query)
+
+    async def add(self, query: str, response: str) -> None:
+        """Store a query/response pair, evicting the oldest when full.
+
+        Queries already in the index are skipped.
+
+        Args:
+            query: User query.
+            response: LLM response text.
+        """
+        await asyncio.to_thread(self._embed_and_add, [(query, response)])
+
+    def load(self) -> bool:
+        """Load the persisted index from disk.
+
+        Returns:
+            True if a compatible snapshot was loaded.
+        """
+        if not os.path.exists(self.path):
+            return False
+
+        try:
+            with open(self.path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Failed to read semantic cache snapshot: %s", e)
+            return False
+
+        if (
+            snapshot.get("embedder") != self.embedder_path
+            or snapshot.get("embedding_model") != settings.semantic_cache_model
+            or snapshot.get("model") != settings.llm_model
+        ):
+            logger.info("Semantic cache snapshot is stale, ignoring it")
+            return False
+
+        with self._lock:
+            for query, response, vector in snapshot["entries"]:
+                self._add(query, response, vector)
+        self.last_log_id = snapshot.get("last_log_id", 0)
+        return True
+
+    def save(self) -> None:
+        """Persist the index to disk."""
+        if self.index is None:
+            return
+
+        with self._lock:
+            entries = [
+                [query, response, [round(v, 6) for v in self.index.vectors[item_id]]]
+                for item_id, (query, response) in self.entries.items()
+            ]
+        snapshot = {
+            "embedder": self.embedder_path,
+            "embedding_model": settings.semantic_cache_model,
+            "model": settings.llm_model,
+            "last_log_id": self.last_log_id,
+            "entries": entries,
+        }
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, self.path)
+        logger.info("Saved semantic cache with %s entries", len(self.entries))
+
+    async def rebuild_from_db(self, db: AsyncSession) -> int:
+        """Add query logs newer than the loaded snapshot to the index.
+
+        Rows are embedded and indexed in worker threads, a chunk at a time,
+        so requests keep being served meanwhile.
+
+        Args:
+            db: Database session.
+
+        Returns:
+            Number of query logs added.
+        """
+        result: Result = await db.execute(
+            select(
+                QueryLog.id,
+                QueryLog.query,
+                QueryLog.response,
+                ResponseBlob.codec,
+                ResponseBlob.data,
+            )
+            .outerjoin(ResponseBlob, ResponseBlob.hash == QueryLog.response_hash)
+            .where(
+                QueryLog.id > self.last_log_id,
+                QueryLog.llm_model_used.in_(configured_models()),
+                or_(QueryLog.response.isnot(None), QueryLog.response_hash.isnot(None)),
+            )
+            .order_by(QueryLog.id.desc())
+            .limit(self.max_entries)
+        )
+        rows = result.all()
+        await response_store.load_missing_dictionaries(db, (row.codec for row in rows))
+
+        oldest_first = rows[::-1]
+        for start in range(0, len(oldest_first), REBUILD_CHUNK_SIZE):
+            await asyncio.to_thread(
+                self._add_rows, oldest_first[start : start + REBUILD_CHUNK_SIZE]
+            )
+        if rows:
+            self.last_log_id = rows[0].id
+
+        logger.info("Semantic cache rebuilt with %s query logs", len(rows))
+        return len(rows)
+
+    def stats(self) -> dict:
+        """Get semantic cache hit and miss counters.
+
+        Returns:
+            Cache statistics.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.entries),
+        }
+
+    def _lookup(self, query: str) -> Optional[str]:
+        """Embed a query and search the index; runs in a worker thread."""
+        vector = _normalize(self.embed(query))
+        with self._lock:
+            if self.index is None:
+                self.misses += 1
+                return None
+            item_id, score = self.index.nearest(vector)
+            if item_id is None or score < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self.entries[item_id][1]
+
+    def _add_rows(self, rows: list) -> None:
+        """Resolve stored responses of query log rows and index them."""
+        pairs = []
+        for row in rows:
+            response = response_store.resolve(row.response, row.codec, row.data)
+            if response is not None:
+                pairs.append((row.query, response))
+        self._embed_and_add(pairs)
+
+    def _embed_and_add(self, pairs: list[tuple[str, str]]) -> None:
+        """Embed query/response pairs, then index them under the lock."""
+        vectors = [_normalize(self.embed(query)) for query, _ in pairs]
+        with self._lock:
+            for (query, response), vector in zip(pairs, vectors):
+                self._add(query, response, vector)
+
+    def _add(self, query: str, response: str, vector: list[float]) -> None:
+        """Index a query/response pair with a precomputed unit vector.
+
+        Callers hold the lock.
+        """
+        normalized = " ".join(query.split()).casefold()
+        if normalized in self._ids_by_query:
+            return
+
+        if self.index is None:
+            self.index = LSHIndex(len(vector))
+
+        item_id = self._next_id
+        self._next_id += 1
+        self.entries[item_id] = (query, response)
+        self._ids_by_query[normalized] = item_id
+        self.index.add(item_id, vector)
+
+        while len(self.entries) > self.max_entries:
+            oldest, (oldest_query, _) = self.entries.popitem(last=False)
+            self._ids_by_query.pop(" ".join(oldest_query.split()).casefold(), None)
+            self.index.remove(oldest)
@@ -0,0 +1,199 @@
+"""Single-flight coalescing of identical in-flight LLM calls."""
+
+import asyncio
+import json
+import uuid
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+from redis.exceptions import RedisError
+
+from src.core.redis_client import get_redis
+from src.utils.logger import get_logger
+from config.settings import get_settings
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+T = TypeVar("T")
+
+# Delete the lock only if it is still held by this worker
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+def _unchanged(value: Any) -> Any:
+    """Default decoder: use a remote result as JSON returned it."""
+    return value
+
+
+class SingleFlight:
+    """Share one pending call between concurrent callers with the same key.
+
+    Within a worker, callers await the same task. Across workers, an
+    optional Redis lock elects a leader that publishes its result on a
+    channel the other workers wait on.
+    """
+
+    LOCK_PREFIX = "singleflight:lock:"
+    RESULT_PREFIX = "singleflight:result:"
+
+    def __init__(
+        self,
+        use_redis: bool = settings.singleflight_redis_enabled,
+        lock_ttl_seconds: float = settings.singleflight_lock_ttl_seconds,
+        wait_timeout_seconds: float = settings.singleflight_wait_timeout_seconds,
+    ):
+        """Initialize single-flight group.
+
+        Args:
+            use_redis: Whether to coalesce across workers through Redis.
+            lock_ttl_seconds: Lifetime of the cross-worker leader lock.
+            wait_timeout_seconds: How long followers wait for a remote leader.
+        """
+        self.use_redis = use_redis
+        self.lock_ttl_ms = int(lock_ttl_seconds * 1000)
+        self.wait_timeout_seconds = wait_timeout_seconds
+        self.coalesced = 0
+        self._calls: dict[str, asyncio.Task] = {}
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[T]],
+        decode: Callable[[Any], T] = _unchanged,
+    ) -> tuple[T, bool]:
+        """Run ``fn`` once for all concurrent callers sharing ``key``.
+
+        A caller being cancelled does not cancel the shared call. Results
+        shared across workers go through JSON, so they must be
+        JSON-serializable.
+
+        Args:
+            key: Coalescing key.
+            fn: Coroutine function producing the result.
+            decode: Rebuilds a result received from another worker from its
+                JSON form, e.g. ``tuple`` for results that are tuples.
+
+        Returns:
+            Tuple of result and whether it was produced by another caller.
+        """
+        task = self._calls.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(self._execute(key, fn, decode))
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.coalesced += 1
+
+        result, remote = await asyncio.shield(task)
+        return result, shared or remote
+
+    def stats(self) -> dict:
+        """Get single-flight counters.
+
+        Returns:
+            Coalescing statistics.
+        """
+        return {"coalesced": self.coalesced, "in_flight": len(self._calls)}
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        """Drop a finished call and mark its exception as retrieved."""
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()
+
+    async def _execute(
+        self, key: str, fn: Callable[[], Awaitable[T]], decode: Callable[[Any], T]
+    ) -> tuple[T, bool]:
+        """Run the call, coordinating with other workers when enabled.
+
+        Returns:
+            Tuple of result and whether it came from another worker.
+        """
+        if not self.use_redis:
+            return await fn(), False
+
+        redis = get_redis()
+        lock_key = self.LOCK_PREFIX + key
+        token = uuid.uuid4().hex
+
+        try:
+            acquired = await redis.set(lock_key, token, nx=True, px=self.lock_ttl_ms)
+        except RedisError as e:
+            logger.warning("Single-flight lock failed, calling directly: %s", e)
+            return await fn(), False
+
+        if not acquired:
+            result = await self._wait_for_leader(key)
+            if result is not None:
+                self.coalesced += 1
+                return decode(result), True
+            # Leader failed or timed out; make the call ourselves
+            return await fn(), False
+
+        try:
+            result = await fn()
+            await self._publish(key, {"ok": True, "result": result})
+            return result, False
+        except Exception:
+            await self._publish(key, {"ok": False})
+            raise
+        finally:
+            try:
+                await redis.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+            except RedisError as e:
+                logger.warning("Single-flight lock release failed: %s", e)
+
+    async def _publish(self, key: str, message: dict) -> None:
+        """Publish the leader outcome and keep it briefly for late followers."""
+        redis = get_redis()
+        payload = json.dumps(message)
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.set(self.RESULT_PREFIX + key, payload, ex=5)
+                pipe.publish(self.RESULT_PREFIX + key, payload)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning("Single-flight publish failed: %s", e)
+
+    async def _wait_for_leader(self, key: str) -> Optional[Any]:
+        """Wait for another worker to publish the result for ``key``.
+
+        Returns:
+            Leader result as decoded from JSON, or None if it failed or
+            did not answer in time.
+        """
+        redis = get_redis()
+        channel = self.RESULT_PREFIX + key
+        pubsub = redis.pubsub()
+        try:
+            await pubsub.subscribe(channel)
+
+            # The leader may have finished before we subscribed
+            payload = await redis.get(channel)
+
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.wait_timeout_seconds
+            while payload is None:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return None
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=remaining
+                )
+                if message is not None:
+                    payload = message["data"]
+
+            message = json.loads(payload)
+            return message["result"] if message["ok"] else None
+        except RedisError as e:
+            logger.warning("Single-flight wait failed: %s", e)
+            return None
+        finally:
+            await pubsub.aclose()
@@ -0,0 +1,235 @@
+"""Deterministic stub chat model with configurable latency and failures.
+
+Used as the ``stub`` LLM provider to exercise routing, fallback and hedging
+locally, and by the benchmark suite in place of a real model.
+"""
+
+import asyncio
+import hashlib
+import math
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.messages.ai import UsageMetadata
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict
+
+_WORDS = (
+    "the model returns a short deterministic answer built from this fixed "
+    "vocabulary so that responses have realistic length and compress like text"
+).split()
+
+
+@dataclass(frozen=True)
+class LatencyDistribution:
+    """Random delay in seconds.
+
+    Kinds and their parameters:
+
+    - ``constant:a``: always ``a``.
+    - ``uniform:a,b``: uniform between ``a`` and ``b``.
+    - ``normal:mean,stddev``: normal, clipped at 0.
+    - ``lognormal:median,sigma``: log-normal, the usual shape of LLM latency.
+    """
+
+    kind: str
+    a: float
+    b: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyDistribution":
+        """Parse a ``kind:a[,b]`` specification.
+
+        Args:
+            spec: Distribution specification, e.g. ``lognormal:0.5,0.6``.
+
+        Returns:
+            Latency distribution.
+
+        Raises:
+            ValueError: If the specification is invalid.
+        """
+        kind, _, params = spec.partition(":")
+        values = [float(value) for value in params.split(",") if value]
+        expected = 1 if kind == "constant" else 2
+        if (
+            kind not in ("constant", "uniform", "normal", "lognormal")
+            or len(values) != expected
+        ):
+            raise ValueError(f"Invalid latency distribution: {spec}")
+        return cls(kind, *values)
+
+    def sample(self, rng: random.Random) -> float:
+        """Draw a delay.
+
+        Args:
+            rng: Random number generator.
+
+        Returns:
+            Delay in seconds.
+        """
+        if self.kind == "constant":
+            return self.a
+        if self.kind == "uniform":
+            return rng.uniform(self.a, self.b)
+        if self.kind == "normal":
+            return max(0.0, rng.gauss(self.a, self.b))
+        return rng.lognormvariate(math.log(self.a), self.b)
+
+    def __str__(self) -> str:
+        """Specification string."""
+        if self.kind == "constant":
+            return f"{self.kind}:{self.a}"
+        return f"{self.kind}:{self.a},{self.b}"
+
+
+class StubProviderError(Exception):
+    """Simulated upstream failure."""
+
+
+class StubChatModel(BaseChatModel):
+    """Chat model that answers instantly-computed text after a simulated delay.
+
+    The response to a prompt is derived from its hash, so the same prompt
+    always gets the same answer. Latency is the time to first token drawn
+    from ``first_token_latency`` plus ``response_words / tokens_per_second``,
+    spread across stream chunks. A share ``error_rate`` of calls fails
+    after the first token delay, before producing anything.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    first_token_latency: LatencyDistribution = LatencyDistribution("constant", 0.0)
+    tokens_per_second: float = 0.0
+    response_words: int = 60
+    chunk_words: int = 4
+    error_rate: float = 0.0
+    seed: int = 0
+    calls: int = 0
+
+    def model_post_init(self, __context: Any) -> None:
+        """Create the latency random number generator."""
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        """Model type name."""
+        return "stub"
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        """Answer synchronously."""
+        prompt, words = self._answer(messages)
+        time.sleep(self._total_delay())
+        self._maybe_fail()
+        return self._result(prompt, words)
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        """Answer after the simulated delay without blocking the loop."""
+        prompt, words = self._answer(messages)
+        await asyncio.sleep(self._total_delay())
+        self._maybe_fail()
+        return self._result(prompt, words)
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        """Stream synchronously."""
+        prompt, words = self._answer(messages)
+        time.sleep(self.first_token_latency.sample(self._rng))
+        self._maybe_fail()
+        for chunk in self._chunks(prompt, words):
+            time.sleep(self._chunk_delay())
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        """Stream chunks paced like a real model."""
+        prompt, words = self._answer(messages)
+        await asyncio.sleep(self.first_token_latency.sample(self._rng))
+        self._maybe_fail()
+        for chunk in self._chunks(prompt, words):
+            await asyncio.sleep(self._chunk_delay())
+            yield chunk
+
+    def _answer(self, messages: list[BaseMessage]) -> tuple[str, list[str]]:
+        """Build the deterministic answer to a prompt."""
+        self.calls += 1
+        prompt = "".join(str(message.content) for message in messages)
+        digest = hashlib.sha256(prompt.encode()).digest()
+        rng = random.Random(digest)
+        return prompt, [rng.choice(_WORDS) for _ in range(self.response_words)]
+
+    def _maybe_fail(self) -> None:
+        """Fail a share ``error_rate`` of calls.
+
+        Raises:
+            StubProviderError: If this call is chosen to fail.
+        """
+        if self.error_rate > 0 and self._rng.random() < self.error_rate:
+            raise StubProviderError("Simulated provider failure")
+
+    def _total_delay(self) -> float:
+        """Delay of a complete, non-streamed answer."""
+        delay = self.first_token_latency.sample(self._rng)
+        if self.tokens_per_second > 0:
+            delay += self.response_words / self.tokens_per_second
+        return delay
+
+    def _chunk_delay(self) -> float:
+        """Delay before each stream chunk."""
+        if self.tokens_per_second <= 0:
+            return 0.0
+        return self.chunk_words / self.tokens_per_second
+
+    def _result(self, prompt: str, words: list[str]) -> ChatResult:
+        """Wrap an answer with its token usage."""
+        message = AIMessage(
+            content=" ".join(words), usage_metadata=_usage(prompt, words)
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _chunks(self, prompt: str, words: list[str]) -> Iterator[ChatGenerationChunk]:
+        """Split an answer into chunks; usage comes with the last one."""
+        for start in range(0, len(words), self.chunk_words):
+            text = " ".join(words[start : start + self.chunk_words])
+            if start:
+                text = " " + text
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+        yield ChatGenerationChunk(
+            message=AIMessageChunk(content="", usage_metadata=_usage(prompt, words))
+        )
+
+
+def _usage(prompt: str, words: list[str]) -> UsageMetadata:
+    """Token usage, counting one token per word."""
+    input_tokens = len(prompt.split())
+    return UsageMetadata(
+        input_tokens=input_tokens,
+        output_tokens=len(words),
+        total_tokens=input_tokens + len(words),
+    )
@@ -0,0 +1,220 @@
+"""Cache of verified token claims and authenticated user snapshots."""
+
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Optional
+
+from redis.exceptions import RedisError
+from sqlalchemy import event
+
+from src.core.redis_client import get_redis
+from src.models.user import User
+from src.utils.logger import get_logger
+from config.settings import get_settings
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """Immutable view of the user fields needed by authenticated requests."""
+
+    id: int
+    username: str
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserSnapshot":
+        """Build a snapshot from a user model.
+
+        Args:
+            user: User model.
+
+        Returns:
+            User snapshot.
+        """
+        return cls(id=user.id, username=user.username, is_active=user.is_active)
+
+
+class _TTLCache:
+    """Bounded in-process mapping whose entries expire at a given time."""
+
+    def __init__(self, max_entries: int):
+        """Initialize cache.
+
+        Args:
+            max_entries: Maximum number of entries.
+        """
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Any, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Any) -> Any:
+        """Get an unexpired value or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+        return value
+
+    def set(self, key: Any, value: Any, expires_at: float) -> None:
+        """Store a value until ``expires_at`` (epoch seconds)."""
+        self._entries.pop(key, None)
+        self._entries[key] = (expires_at, value)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Any) -> None:
+        """Remove a value if present."""
+        self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        """Number of stored entries."""
+        return len(self._entries)
+
+
+class UserCache:
+    """TTL cache for verified JWT claims and user snapshots.
+
+    Snapshots are optionally shared through Redis. Local entries of other
+    workers expire within the TTL after an update.
+    """
+
+    KEY_PREFIX = "user_snapshot:"
+
+    def __init__(
+        self,
+        ttl_seconds: int = settings.user_cache_ttl_seconds,
+        max_entries: int = settings.user_cache_max_entries,
+        use_redis: bool = settings.user_cache_redis_enabled,
+    ):
+        """Initialize user cache.
+
+        Args:
+            ttl_seconds: Time to live of cached entries.
+            max_entries: Maximum entries per in-process map.
+            use_redis: Whether to share user snapshots through Redis.
+        """
+        self.ttl_seconds = ttl_seconds
+        self.use_redis = use_redis
+        self._claims = _TTLCache(max_entries)
+        self._users = _TTLCache(max_entries)
+        self._pending: set[asyncio.Task] = set()
+
+    def get_claims(self, token: str) -> Optional[dict]:
+        """Get previously verified claims for a token.
+
+        Args:
+            token: JWT token string.
+
+        Returns:
+            Token claims or None.
+        """
+        return self._claims.get(token)
+
+    def set_claims(self, token: str, claims: dict) -> None:
+        """Remember verified claims until the TTL or token expiry.
+
+        Args:
+            token: JWT token string.
+            claims: Decoded token claims.
+        """
+        expires_at = time.time() + self.ttl_seconds
+        if "exp" in claims:
+            expires_at = min(expires_at, float(claims["exp"]))
+        self._claims.set(token, claims, expires_at)
+
+    async def get_user(self, user_id: int) -> Optional[UserSnapshot]:
+        """Get a cached user snapshot.
+
+        Args:
+            user_id: User ID.
+
+        Returns:
+            User snapshot or None.
+        """
+        snapshot = self._users.get(user_id)
+        if snapshot is None and self.use_redis:
+            try:
+                data = await get_redis().get(f"{self.KEY_PREFIX}{user_id}")
+            except RedisError as e:
+                logger.warning("User cache lookup failed: %s", e)
+                data = None
+            if data is not None:
+                snapshot = UserSnapshot(**json.loads(data))
+                self._users.set(user_id, snapshot, time.time() + self.ttl_seconds)
+        return snapshot
+
+    async def set_user(self, snapshot: UserSnapshot) -> None:
+        """Cache a user snapshot.
+
+        Args:
+            snapshot: User snapshot.
+        """
+        self._users.set(snapshot.id, snapshot, time.time() + self.ttl_seconds)
+        if self.use_redis:
+            try:
+                await get_redis().set(
+                    f"{self.KEY_PREFIX}{snapshot.id}",
+                    json.dumps(asdict(snapshot)),
+                    ex=self.ttl_seconds,
+                )
+            except RedisError as e:
+                logger.warning("User cache store failed: %s", e)
+
+    async def invalidate(self, user_id: int) -> None:
+        """Drop a user snapshot from both tiers.
+
+        Args:
+            user_id: User ID.
+        """
+        self._users.pop(user_id)
+        if self.use_redis:
+            try:
+                await get_redis().delete(f"{self.KEY_PREFIX}{user_id}")
+            except RedisError as e:
+                logger.warning("User cache invalidation failed: %s", e)
+
+    def invalidate_soon(self, user_id: int) -> None:
+        """Drop a user snapshot from sync code.
+
+        The local entry is removed immediately; the Redis entry is removed
+        in the background when an event loop is running.
+
+        Args:
+            user_id: User ID.
+        """
+        self._users.pop(user_id)
+        if not self.use_redis:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self.invalidate(user_id))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    def stats(self) -> dict:
+        """Get cache sizes.
+
+        Returns:
+            Cache statistics.
+        """
+        return {"claims": len(self._claims), "users": len(self._users)}
+
+
+user_cache = UserCache()
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_user(mapper, connection, target: User) -> None:
+    """Invalidate cached snapshots whenever a user row changes."""
+    user_cache.invalidate_soon(target.id)
@@ -1,10 +1,16 @@
 """User service."""
 
-from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
 from src.models.user import User
-from src.core.auth import hash_password, verify_password
+from src.core.auth import (
+    PasswordHasherBusyError,
+    hash_password_async,
+    password_needs_rehash,
+    verify_password_async,
+)
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -14,7 +20,9 @@ class UserService:
     """User service for database operations."""
 
     @staticmethod
-    def create_user(db: Session, username: str, email: str, password: str) -> User:
+    async def create_user(
+        db: AsyncSession, username: str, email: str, password: str
+    ) -> User:
         """Create a new user.
 
         Args:
@@ -28,23 +36,24 @@ class UserService:
 
         Raises:
             ValueError: If username or email already exists.
+            PasswordHasherBusyError: If password hashing is saturated.
         """
-        hashed_password = hash_password(password)
+        hashed_password = await hash_password_async(password)
         user = User(username=username, email=email, hashed_password=hashed_password)
 
         try:
             db.add(user)
-            db.commit()
-            db.refresh(user)
-            logger.info(f"User created: {username}")
+            await db.commit()
+            await db.refresh(user)
+            logger.info("User created: %s", username)
             return user
         except IntegrityError:
-            db.rollback()
-            logger.error(f"Failed to create user: {username} (duplicate)")
+            await db.rollback()
+            logger.error("Failed to create user: %s (duplicate)", username)
             raise ValueError("Username or email already exists")
 
     @staticmethod
-    def get_user_by_username(db: Session, username: str) -> User | None:
+    async def get_user_by_username(db: AsyncSession, username: str) -> User | None:
         """Get user by username.
 
         Args:
@@ -54,10 +63,11 @@ class UserService:
         Returns:
             User object or None.
         """
-        return db.query(User).filter(User.username == username).first()
+        result = await db.execute(select(User).where(User.username == username))
+        return result.scalars().first()
 
     @staticmethod
-    def get_user_by_id(db: Session, user_id: int) -> User | None:
+    async def get_user_by_id(db: AsyncSession, user_id: int) -> User | None:
         """Get user by ID.
 
         Args:
@@ -67,10 +77,13 @@ class UserService:
         Returns:
             User object or None.
         """
-        return db.query(User).filter(User.id == user_id).first()
+        result = await db.execute(select(User).where(User.id == user_id))
+        return result.scalars().first()
 
     @staticmethod
-    def authenticate_user(db: Session, username: str, password: str) -> User | None:
+    async def authenticate_user(
+        db: AsyncSession, username: str, password: str
+    ) -> User | None:
         """Authenticate user.
 
         Args:
@@ -80,10 +93,31 @@ class UserService:
 
         Returns:
             User object if authentication successful, None otherwise.
+
+        Raises:
+            PasswordHasherBusyError: If password hashing is saturated.
         """
-        user = UserService.get_user_by_username(db, username)
+        user = await UserService.get_user_by_username(db, username)
         if not user:
             return None
-        if not verify_password(password, user.hashed_password):
+        if not await verify_password_async(password, user.hashed_password):
             return None
+
+        # Transparently upgrade hashes made with an outdated cost factor
+        if password_needs_rehash(user.hashed_password):
+            try:
+                new_hash = await hash_password_async(password)
+            except PasswordHasherBusyError:
+                # Try again on a later login
+                return user
+
+            user.hashed_password = new_hash
+            try:
+                await db.commit()
+                logger.info("Rehashed password for user: %s", username)
+            except SQLAlchemyError as e:
+                logger.warning("Password rehash failed for user %s: %s", username, e)
+                await db.rollback()
+                await db.refresh(user)
+
         return user
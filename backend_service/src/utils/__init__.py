@@ -1,5 +1,6 @@
 """Utilities module."""
 
 from .logger import get_logger
+from .tokens import count_prompt_tokens, count_tokens
 
-__all__ = ["get_logger"]
+__all__ = ["get_logger", "count_prompt_tokens", "count_tokens"]
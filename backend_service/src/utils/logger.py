@@ -1,15 +1,197 @@
-"""Utility functions."""
+"""Utility functions.
 
+Records are handed to a bounded in-memory queue and written to stderr by a
+background thread, so request handlers never block on the log stream.
+Messages use lazy ``%`` arguments and are only rendered in that thread.
+"""
+
+import atexit
+import json
 import logging
+import queue
+import random
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
 from config.settings import get_settings
 
 settings = get_settings()
 
-# Configure logging
-logging.basicConfig(
-    level=settings.log_level,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+
+# ID of the request the current task is serving
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Attributes every record has; anything else was passed through ``extra``
+_RECORD_ATTRS = frozenset(logging.makeLogRecord({}).__dict__) | {
+    "message",
+    "asctime",
+    "request_id",
+}
+
+_handler: Optional[logging.Handler] = None
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the ID of the request being served."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Add ``request_id`` to a record; never rejects it."""
+        record.request_id = request_id_var.get() or "-"
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a share of the records below WARNING from chosen loggers."""
+
+    def __init__(self, rates: dict[str, float]):
+        """Initialize filter.
+
+        Args:
+            rates: Share of records kept by logger name. A name also covers
+                its child loggers; the longest matching name wins.
+        """
+        super().__init__()
+        self.rates = rates
+        self._resolved: dict[str, float] = {}
+
+    @classmethod
+    def parse(cls, spec: str) -> "SamplingFilter":
+        """Build a filter from ``name=rate`` pairs separated by commas.
+
+        Args:
+            spec: Rates such as ``src.services.llm_service=0.1``.
+
+        Returns:
+            Sampling filter.
+
+        Raises:
+            ValueError: If a pair is malformed.
+        """
+        rates = {}
+        for item in spec.split(","):
+            if not item.strip():
+                continue
+            name, sep, rate = item.partition("=")
+            if not sep:
+                raise ValueError(f"Invalid log sample rate: {item!r}")
+            rates[name.strip()] = min(max(float(rate), 0.0), 1.0)
+        return cls(rates)
+
+    def rate(self, name: str) -> float:
+        """Get the share of records kept for a logger."""
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate = 1.0
+            best = -1
+            for prefix, value in self.rates.items():
+                if len(prefix) > best and (
+                    name == prefix or name.startswith(prefix + ".")
+                ):
+                    rate, best = value, len(prefix)
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Decide whether a record is kept."""
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Render records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Format a record."""
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        if record.stack_info:
+            entry["stack_info"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Queue handler that drops records instead of blocking when full."""
+
+    def __init__(self, log_queue: queue.Queue):
+        """Initialize handler.
+
+        Args:
+            log_queue: Bounded queue read by the listener thread.
+        """
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Pass the record on unformatted; the listener thread renders it."""
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Queue a record, counting it as dropped if the queue is full."""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging() -> None:
+    """Install the root handler configured in settings; runs once."""
+    global _handler
+    if _handler is not None:
+        return
+
+    formatter: logging.Formatter
+    if settings.log_format == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(TEXT_FORMAT)
+    stream = logging.StreamHandler()
+    stream.setFormatter(formatter)
+
+    handler: logging.Handler
+    if settings.log_queue_enabled:
+        handler = DroppingQueueHandler(queue.Queue(maxsize=settings.log_queue_size))
+        listener = QueueListener(handler.queue, stream)
+        listener.start()
+        atexit.register(listener.stop)
+    else:
+        handler = stream
+
+    # Filters run in the logging thread, where the request ID is visible
+    handler.addFilter(RequestIdFilter())
+    if settings.log_sample_rates:
+        handler.addFilter(SamplingFilter.parse(settings.log_sample_rates))
+
+    root = logging.getLogger()
+    root.setLevel(settings.log_level)
+    root.addHandler(handler)
+    _handler = handler
+
+
+def dropped_records() -> int:
+    """Get the number of records dropped because the log queue was full."""
+    return getattr(_handler, "dropped", 0)
+
+
+configure_logging()
 
 logger = logging.getLogger(__name__)
 
@@ -0,0 +1,376 @@
+"""Minimal in-process metrics with Prometheus text exposition.
+
+Counters, gauges and histograms are plain Python objects updated from the
+event loop thread, so recording a value is a few attribute updates with no
+locking. Values that already exist elsewhere are exported with callback
+metrics, which are evaluated only when ``/metrics`` is scraped.
+"""
+
+import math
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Iterable, Optional, TypeVar
+
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Seconds; spans sub-millisecond cache hits to multi-second LLM calls
+DEFAULT_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+LabelValues = tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value."""
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    """Escape a label value."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    """Format a label set, empty if there are no labels."""
+    pairs = ",".join(
+        f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)
+    )
+    return f"{{{pairs}}}" if pairs else ""
+
+
+class Metric:
+    """Metric family with optional labels."""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        """Initialize metric.
+
+        Args:
+            name: Metric name.
+            documentation: Help text.
+            labelnames: Label names; values are bound with ``labels``.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        # Value holders of each label set, of the subclass's child type
+        self._children: dict[LabelValues, Any] = {}
+        self._default: Any = None
+        if not labelnames:
+            self._default = self._children[()] = self._new_child()
+
+    def labels(self, *values: str):
+        """Get the child metric for a set of label values.
+
+        Look children up once and keep them where they are recorded often.
+
+        Args:
+            values: Label values, in the order of ``labelnames``.
+
+        Returns:
+            Child metric.
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self):
+        """Create the value holder of one label set."""
+        raise NotImplementedError
+
+    def samples(self) -> Iterable[tuple[str, str, float]]:
+        """Yield ``(suffix, labels, value)`` samples."""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        """Render the family in Prometheus text format."""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+M = TypeVar("M", bound=Metric)
+
+
+class _CounterChild:
+    """Value of one counter label set."""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increase the counter."""
+        self.value += amount
+
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+
+    type = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        """Create a counter value."""
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increase an unlabelled counter."""
+        self._default.value += amount
+
+    def samples(self) -> Iterable[tuple[str, str, float]]:
+        """Yield counter samples."""
+        for values, child in self._children.items():
+            yield "_total", _format_labels(self.labelnames, values), child.value
+
+
+class _GaugeChild:
+    """Value of one gauge label set."""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        """Set the gauge."""
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increase the gauge."""
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        """Decrease the gauge."""
+        self.value -= amount
+
+
+class Gauge(Metric):
+    """Value that can go up and down."""
+
+    type = "gauge"
+
+    def _new_child(self) -> _GaugeChild:
+        """Create a gauge value."""
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        """Set an unlabelled gauge."""
+        self._default.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increase an unlabelled gauge."""
+        self._default.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        """Decrease an unlabelled gauge."""
+        self._default.value -= amount
+
+    def samples(self) -> Iterable[tuple[str, str, float]]:
+        """Yield gauge samples."""
+        for values, child in self._children.items():
+            yield "", _format_labels(self.labelnames, values), child.value
+
+
+class _Timer:
+    """Context manager observing its duration into a histogram."""
+
+    __slots__ = ("_child", "_start")
+
+    def __init__(self, child: "_HistogramChild"):
+        self._child = child
+
+    def __enter__(self) -> "_Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._child.observe(time.perf_counter() - self._start)
+
+
+class _HistogramChild:
+    """Buckets of one histogram label set."""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Record a value."""
+        # Counts are per bucket here and made cumulative when rendered
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self) -> _Timer:
+        """Time a block and record its duration in seconds."""
+        return _Timer(self)
+
+
+class Histogram(Metric):
+    """Distribution of values in cumulative buckets."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        """Initialize histogram.
+
+        Args:
+            name: Metric name.
+            documentation: Help text.
+            labelnames: Label names.
+            buckets: Sorted upper bounds, without ``+Inf``.
+        """
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramChild:
+        """Create empty buckets."""
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        """Record a value in an unlabelled histogram."""
+        self._default.observe(value)
+
+    def time(self) -> _Timer:
+        """Time a block with an unlabelled histogram."""
+        return _Timer(self._default)
+
+    def samples(self) -> Iterable[tuple[str, str, float]]:
+        """Yield bucket, sum and count samples."""
+        names = self.labelnames + ("le",)
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), child.counts):
+                cumulative += count
+                yield "_bucket", _format_labels(
+                    names, values + (_format_value(bound),)
+                ), cumulative
+            labels = _format_labels(self.labelnames, values)
+            yield "_sum", labels, child.sum
+            yield "_count", labels, child.count
+
+
+class CallbackMetric(Metric):
+    """Metric read from a function when scraped.
+
+    The function returns a number, or a mapping of label value tuples to
+    numbers for labelled metrics. Returning None skips the metric.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], Optional[float | dict[LabelValues, float]]],
+        labelnames: tuple[str, ...] = (),
+        type: str = "gauge",
+    ):
+        """Initialize callback metric.
+
+        Args:
+            name: Metric name.
+            documentation: Help text.
+            callback: Function returning the current value(s).
+            labelnames: Label names.
+            type: ``gauge`` or ``counter``.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.callback = callback
+        self.type = type
+
+    def samples(self) -> Iterable[tuple[str, str, float]]:
+        """Yield the current values."""
+        suffix = "_total" if self.type == "counter" else ""
+        values = self.callback()
+        if values is None:
+            return
+        if not isinstance(values, dict):
+            values = {(): values}
+        for label_values, value in values.items():
+            yield suffix, _format_labels(self.labelnames, label_values), value
+
+
+class Registry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self):
+        """Initialize registry."""
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: M) -> M:
+        """Add a metric.
+
+        Args:
+            metric: Metric to add.
+
+        Returns:
+            The metric, for assignment.
+
+        Raises:
+            ValueError: If a metric with the same name exists.
+        """
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Render all metrics in Prometheus text format 0.0.4."""
+        families = []
+        for metric in self._metrics.values():
+            try:
+                families.append(metric.render())
+            except Exception as e:
+                # A failing callback must not break the whole scrape
+                logger.warning("Failed to render metric %s: %r", metric.name, e)
+        return "\n".join(families) + "\n"
+
+
+registry = Registry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
@@ -0,0 +1,423 @@
+"""Sampling profilers built on ``sys._current_frames``.
+
+A background thread periodically reads the Python stacks of the other
+threads; nothing is traced, so the profiled code runs at full speed and the
+cost is paid by the sampling thread. Stacks are aggregated as folded
+strings (``root;caller;leaf count``), the input format of flame graph
+tools such as speedscope or flamegraph.pl.
+"""
+
+import asyncio
+import functools
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from types import CodeType, FrameType
+from typing import Callable, Iterable, Optional, TypeVar
+
+Stack = tuple[str, ...]
+T = TypeVar("T")
+
+_labels: dict[CodeType, str] = {}
+_prefixes = sorted(
+    {os.getcwd(), *(path for path in sys.path if path)}, key=len, reverse=True
+)
+
+# Profile of the request the current task is serving
+_current_profile: ContextVar[Optional["RequestProfile"]] = ContextVar(
+    "current_profile", default=None
+)
+
+# Innermost frames of threads that are waiting rather than running. Waits
+# in C (such as SimpleQueue.get) leave the caller as the innermost frame.
+_IDLE_FILES = ("selectors.py", "threading.py", "queue.py")
+_IDLE_FUNCTIONS = (
+    ("concurrent/futures/thread.py", "_worker"),
+    ("aiosqlite/core.py", "_connection_worker_thread"),
+)
+
+
+def _short_path(filename: str) -> str:
+    """Make a source path relative to the project or its import root."""
+    for prefix in _prefixes:
+        if filename.startswith(prefix + os.sep):
+            return filename[len(prefix) + 1 :]
+    return filename
+
+
+def _label(code: CodeType) -> str:
+    """Describe a code object, cached since stacks repeat constantly."""
+    label = _labels.get(code)
+    if label is None:
+        label = _labels[code] = (
+            f"{code.co_qualname} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+        )
+    return label
+
+
+def sample_stack(frame: Optional[FrameType], max_depth: int) -> Stack:
+    """Turn a frame and its callers into a stack, outermost first.
+
+    Args:
+        frame: Innermost frame.
+        max_depth: Maximum number of frames; the outermost are dropped.
+
+    Returns:
+        Frame labels.
+    """
+    labels: list[str] = []
+    while frame is not None and len(labels) < max_depth:
+        labels.append(_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return tuple(labels)
+
+
+def is_idle(frame: FrameType) -> bool:
+    """Whether a thread is blocked waiting for work or I/O."""
+    code = frame.f_code
+    if os.path.basename(code.co_filename) in _IDLE_FILES:
+        return True
+    return any(
+        code.co_name == name and code.co_filename.endswith(path)
+        for path, name in _IDLE_FUNCTIONS
+    )
+
+
+class StackCounts:
+    """Bounded aggregate of sampled stacks."""
+
+    OVERFLOW: Stack = ("[other stacks]",)
+
+    def __init__(self, max_stacks: int):
+        """Initialize aggregate.
+
+        Args:
+            max_stacks: Distinct stacks kept; later new stacks are counted
+                under a single overflow entry.
+        """
+        self.max_stacks = max_stacks
+        self.counts: dict[Stack, int] = {}
+        self.samples = 0
+
+    def add(self, stack: Stack) -> None:
+        """Count one sample of a stack."""
+        self.samples += 1
+        counts = self.counts
+        if stack in counts:
+            counts[stack] += 1
+        elif len(counts) < self.max_stacks:
+            counts[stack] = 1
+        else:
+            counts[self.OVERFLOW] = counts.get(self.OVERFLOW, 0) + 1
+
+    def collapsed(self) -> str:
+        """Render folded stacks, most sampled first."""
+        counts = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in counts)
+
+    def top(self, limit: int) -> list[dict]:
+        """Get the functions seen in the most samples.
+
+        Args:
+            limit: Maximum number of functions.
+
+        Returns:
+            Functions with self samples (innermost frame) and total samples
+            (anywhere on the stack), sorted by self samples.
+        """
+        own: dict[str, int] = {}
+        total: dict[str, int] = {}
+        for stack, count in list(self.counts.items()):
+            if not stack:
+                continue
+            own[stack[-1]] = own.get(stack[-1], 0) + count
+            for label in set(stack):
+                total[label] = total.get(label, 0) + count
+
+        samples = self.samples or 1
+        ranked = sorted(
+            total, key=lambda label: (own.get(label, 0), total[label]), reverse=True
+        )
+        return [
+            {
+                "function": label,
+                "self": own.get(label, 0),
+                "total": total[label],
+                "self_percent": round(100 * own.get(label, 0) / samples, 2),
+                "total_percent": round(100 * total[label] / samples, 2),
+            }
+            for label in ranked[:limit]
+        ]
+
+    def reset(self) -> None:
+        """Drop all samples."""
+        self.counts = {}
+        self.samples = 0
+
+
+@dataclass
+class RequestProfile:
+    """Samples taken while one request was running."""
+
+    id: int
+    method: str
+    path: str
+    trigger: str
+    stacks: StackCounts
+    started_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    duration_ms: Optional[float] = None
+    status_code: Optional[int] = None
+    # Worker threads currently running code for this request, by name
+    threads: dict[int, str] = field(default_factory=dict)
+
+    def summary(self) -> dict:
+        """Describe the profile without its samples."""
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "trigger": self.trigger,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": self.duration_ms,
+            "status_code": self.status_code,
+            "samples": self.stacks.samples,
+        }
+
+
+class RequestProfiler:
+    """Sample the stacks of selected requests while they run.
+
+    Requests are asyncio tasks sharing the event loop thread, so a loop
+    sample is credited to a profile only when its task is the one running.
+    Blocking work the request hands to a thread pool is sampled too once
+    the thread is attached with ``attached``.
+    """
+
+    def __init__(
+        self,
+        interval_seconds: float,
+        buffer_size: int,
+        max_depth: int,
+        max_stacks: int,
+        sample_rate: float = 0.0,
+        sampled_paths: Iterable[str] = (),
+    ):
+        """Initialize profiler.
+
+        Args:
+            interval_seconds: Time between samples.
+            buffer_size: Number of finished profiles kept; the oldest go first.
+            max_depth: Maximum frames per sample.
+            max_stacks: Distinct stacks kept per profile.
+            sample_rate: Share of requests to ``sampled_paths`` profiled
+                without being asked to.
+            sampled_paths: Request paths eligible for sampling.
+        """
+        self.sample_rate = sample_rate
+        self.sampled_paths = set(sampled_paths)
+        self.interval_seconds = interval_seconds
+        self.max_depth = max_depth
+        self.max_stacks = max_stacks
+        self.profiles: deque[RequestProfile] = deque(maxlen=buffer_size)
+        self._active: dict[asyncio.Task, RequestProfile] = {}
+        self._ids = itertools.count(1)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    def start(self, method: str, path: str, trigger: str) -> RequestProfile:
+        """Start profiling the current task.
+
+        Args:
+            method: HTTP method.
+            path: Request path.
+            trigger: Why the request is profiled.
+
+        Returns:
+            Profile being recorded.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        profile = RequestProfile(
+            next(self._ids), method, path, trigger, StackCounts(self.max_stacks)
+        )
+        task = asyncio.current_task()
+        if task is not None:
+            # Samples are attributed by task; outside one nothing is sampled
+            self._active[task] = profile
+        _current_profile.set(profile)
+        self._ensure_thread()
+        self._wakeup.set()
+        return profile
+
+    def finish(
+        self, profile: RequestProfile, status_code: Optional[int], seconds: float
+    ) -> None:
+        """Stop profiling the current task and keep its profile.
+
+        Args:
+            profile: Profile returned by ``start``.
+            status_code: Response status, if one was sent.
+            seconds: Request duration.
+        """
+        task = asyncio.current_task()
+        if task is not None:
+            self._active.pop(task, None)
+        _current_profile.set(None)
+        profile.status_code = status_code
+        profile.duration_ms = round(seconds * 1000, 3)
+        self.profiles.append(profile)
+
+    @staticmethod
+    def attached(func: Callable[..., T]) -> Callable[..., T]:
+        """Wrap a function about to be handed to a worker thread.
+
+        If the current request is being profiled, the thread running the
+        function is sampled into its profile for the duration of the call.
+
+        Args:
+            func: Function to run in another thread.
+
+        Returns:
+            The function, wrapped only while profiling.
+        """
+        profile = _current_profile.get()
+        if profile is None:
+            return func
+
+        @functools.wraps(func)
+        def run(*args, **kwargs) -> T:
+            ident = threading.get_ident()
+            profile.threads[ident] = threading.current_thread().name
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile.threads.pop(ident, None)
+
+        return run
+
+    def get(self, profile_id: int) -> Optional[RequestProfile]:
+        """Find a kept profile by ID."""
+        for profile in self.profiles:
+            if profile.id == profile_id:
+                return profile
+        return None
+
+    def stop(self) -> None:
+        """Stop the sampling thread."""
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+        self._stopping = False
+
+    def _ensure_thread(self) -> None:
+        """Start the sampling thread on first use."""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="request-profiler", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        """Sample while any request is being profiled."""
+        while not self._stopping:
+            if not self._active:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            time.sleep(self.interval_seconds)
+            active = dict(self._active)
+            if not active:
+                continue
+            frames = sys._current_frames()
+
+            # Between tasks the loop thread's stack belongs to no request
+            task = asyncio.current_task(self._loop)
+            if task is not None and self._loop_thread is not None:
+                profile = active.get(task)
+                frame = frames.get(self._loop_thread)
+                if profile is not None and frame is not None:
+                    profile.stacks.add(sample_stack(frame, self.max_depth))
+
+            for profile in active.values():
+                for ident, name in list(profile.threads.items()):
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        stack = sample_stack(frame, self.max_depth - 1)
+                        profile.stacks.add((f"[{name}]",) + stack)
+
+
+class ContinuousSampler:
+    """Aggregate the busy stacks of every thread, all the time.
+
+    Threads blocked on I/O or waiting for work are skipped, so the profile
+    shows where CPU time goes across all requests.
+    """
+
+    def __init__(self, interval_seconds: float, max_depth: int, max_stacks: int):
+        """Initialize sampler.
+
+        Args:
+            interval_seconds: Time between samples.
+            max_depth: Maximum frames per sample.
+            max_stacks: Distinct stacks kept.
+        """
+        self.interval_seconds = interval_seconds
+        self.max_depth = max_depth
+        self.stacks = StackCounts(max_stacks)
+        self.started_at: Optional[datetime] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        """Whether the sampler is running."""
+        return self._thread is not None
+
+    def start(self) -> None:
+        """Start sampling in a background thread."""
+        if self._thread is None:
+            self._stop.clear()
+            self.started_at = datetime.now(timezone.utc)
+            self._thread = threading.Thread(
+                target=self._run, name="continuous-profiler", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling; collected samples are kept."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def reset(self) -> None:
+        """Drop collected samples."""
+        self.stacks.reset()
+        self.started_at = datetime.now(timezone.utc) if self.running else None
+
+    def _run(self) -> None:
+        """Sample every interval until stopped."""
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval_seconds):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own or is_idle(frame):
+                    continue
+                name = names.get(ident, str(ident))
+                if name in ("request-profiler", "continuous-profiler"):
+                    continue
+                stack = sample_stack(frame, self.max_depth - 1)
+                self.stacks.add((f"[{name}]",) + stack)
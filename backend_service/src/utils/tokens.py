@@ -0,0 +1,130 @@
+"""Local token counting for cost estimates."""
+
+import threading
+import time
+from typing import TYPE_CHECKING, Optional
+
+from src.utils.logger import get_logger
+
+if TYPE_CHECKING:
+    from tiktoken import Encoding
+
+logger = get_logger(__name__)
+
+# Tokens added by the chat format around a single user message
+_CHAT_OVERHEAD_TOKENS = 7
+
+# Rough ratio used when no tokenizer is available
+_CHARS_PER_TOKEN = 4
+
+# Minimum time between background attempts to load a model's tokenizer
+_RETRY_SECONDS = 60.0
+
+# Loaded tokenizers by model; failed loads are not stored
+_encodings: dict[str, "Encoding"] = {}
+# Models whose tokenizer is being loaded, and when each last failed
+_loading: set[str] = set()
+_failed_at: dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def load_encoding(model: str) -> Optional["Encoding"]:
+    """Load and cache the tokenizer for a model.
+
+    Blocks while the encoding files are read or downloaded, so call it off
+    the event loop. Only successful loads are cached; a failed load is
+    tried again later.
+
+    Args:
+        model: Model name.
+
+    Returns:
+        tiktoken encoding, or None if it cannot be loaded (e.g. the
+        encoding files cannot be downloaded).
+    """
+    encoding = _encodings.get(model)
+    if encoding is not None:
+        return encoding
+    try:
+        import tiktoken
+
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning("Tokenizer unavailable for %s, using estimates: %s", model, e)
+        with _lock:
+            _failed_at[model] = time.monotonic()
+        return None
+    with _lock:
+        _encodings[model] = encoding
+        _failed_at.pop(model, None)
+    return encoding
+
+
+def get_encoding(model: str) -> Optional["Encoding"]:
+    """Get the tokenizer for a model if it is loaded.
+
+    Never loads on the calling thread. A missing tokenizer is loaded in a
+    background thread, at most once per retry interval, and callers use
+    estimates until it is ready.
+
+    Args:
+        model: Model name.
+
+    Returns:
+        tiktoken encoding, or None if it is not loaded yet.
+    """
+    encoding = _encodings.get(model)
+    if encoding is not None:
+        return encoding
+    with _lock:
+        failed_at = _failed_at.get(model)
+        if model in _loading or (
+            failed_at is not None and time.monotonic() - failed_at < _RETRY_SECONDS
+        ):
+            return None
+        _loading.add(model)
+    threading.Thread(
+        target=_load_in_background, args=(model,), name="tokenizer-load", daemon=True
+    ).start()
+    return None
+
+
+def _load_in_background(model: str) -> None:
+    """Load a tokenizer and clear its in-progress mark."""
+    try:
+        load_encoding(model)
+    finally:
+        with _lock:
+            _loading.discard(model)
+
+
+def count_tokens(text: str, model: str) -> int:
+    """Count the tokens of a text.
+
+    Args:
+        text: Text to count.
+        model: Model name.
+
+    Returns:
+        Token count, estimated from the length if no tokenizer is available.
+    """
+    encoding = get_encoding(model)
+    if encoding is None:
+        return -(-len(text) // _CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_prompt_tokens(prompt: str, model: str) -> int:
+    """Count the tokens of a single-message chat prompt.
+
+    Args:
+        prompt: User message.
+        model: Model name.
+
+    Returns:
+        Prompt token count including chat formatting.
+    """
+    return count_tokens(prompt, model) + _CHAT_OVERHEAD_TOKENS
@@ -0,0 +1,52 @@
+"""Shared test fixtures.
+
+Settings are read when ``config.settings`` is first imported, so the test
+environment is set up here, before anything from ``src`` is imported.
+"""
+
+import os
+import tempfile
+
+_workdir = tempfile.mkdtemp(prefix="backend-tests-")
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{os.path.join(_workdir, 'test.db')}",
+    SECRET_KEY="test-secret-key-" + "x" * 32,
+    OPENAI_API_KEY="test",
+    LOG_LEVEL="WARNING",
+    LOG_QUEUE_ENABLED="False",
+    SEMANTIC_CACHE_PATH=os.path.join(_workdir, "semantic_cache.json"),
+    QUERY_LOG_ARCHIVE_DIR=os.path.join(_workdir, "archive"),
+    LLM_PROVIDERS="stub:test",
+    BCRYPT_ROUNDS="4",
+    MIGRATE_ON_STARTUP="True",
+    WARM_UP_IN_BACKGROUND="False",
+)
+
+import fakeredis  # noqa: E402
+import pytest  # noqa: E402
+
+import src.core.redis_client as redis_client  # noqa: E402
+
+
+@pytest.fixture
+async def redis():
+    """Replace the shared Redis client with an in-memory one."""
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    previous = redis_client._client
+    redis_client._client = client
+    yield client
+    redis_client._client = previous
+    await client.aclose()
+
+
+@pytest.fixture
+async def database():
+    """Migrate the test database and yield its engine."""
+    from src.db import async_engine
+    from src.db.migrate import migrate
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(migrate)
+    yield async_engine
+    # Pooled connections belong to this test's event loop
+    await async_engine.dispose()
@@ -0,0 +1,35 @@
+"""Stand-ins for models the tests cannot load."""
+
+import math
+import re
+import zlib
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def hashing_embedding(text: str, dim: int = 256) -> list[float]:
+    """Embed text by feature hashing of words and character trigrams.
+
+    Cheap and deterministic, but lexical: it cannot tell apart prompts that
+    differ in one meaningful word, so it is only fit for tests.
+
+    Args:
+        text: Text to embed.
+        dim: Vector dimension.
+
+    Returns:
+        L2-normalized embedding vector.
+    """
+    vector = [0.0] * dim
+    words = _WORD_RE.findall(text.casefold())
+    features = list(words)
+    for word in words:
+        padded = f" {word} "
+        features.extend(padded[i : i + 3] for i in range(len(padded) - 2))
+
+    for feature in features:
+        h = zlib.crc32(feature.encode())
+        vector[h % dim] += 1.0 if (h >> 16) & 1 else -1.0
+
+    norm = math.sqrt(sum(v * v for v in vector))
+    return [v / norm for v in vector] if norm else vector
@@ -0,0 +1,171 @@
+"""End-to-end tests of the HTTP API against the stub LLM provider.
+
+The app's lifespan shuts down process-wide resources, so it runs once for
+the whole module.
+"""
+
+import asyncio
+
+import fakeredis
+import httpx
+import pytest
+import pytest_asyncio
+
+import src.core.redis_client as redis_client
+
+pytestmark = pytest.mark.asyncio(loop_scope="module")
+
+BASE_URL = "http://test"
+
+
+@pytest_asyncio.fixture(loop_scope="module", scope="module")
+async def app():
+    """Start the app with its lifespan on an in-memory Redis."""
+    redis_client._client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    from src.main import app
+
+    async with app.router.lifespan_context(app):
+        yield app
+
+
+@pytest_asyncio.fixture(loop_scope="module", scope="module")
+async def client(app):
+    """HTTP client calling the app in-process, logged in as a test user."""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url=BASE_URL) as client:
+        user = {
+            "username": "alice",
+            "email": "alice@example.com",
+            "password": "password123",
+        }
+        response = await client.post("/api/v1/auth/register", json=user)
+        assert response.status_code == 200, response.text
+        response = await client.post(
+            "/api/v1/auth/login",
+            json={"username": user["username"], "password": user["password"]},
+        )
+        token = response.json()["access_token"]
+        client.headers["Authorization"] = f"Bearer {token}"
+        yield client
+
+
+async def test_services_are_created_by_the_lifespan(app):
+    assert app.state.llm_service.router is not None
+    assert app.state.rate_limiter is not None
+
+
+async def test_ready_after_warm_up(client):
+    response = await client.get("/ready")
+    assert response.status_code == 200
+
+
+async def test_query_is_answered_and_counted(client):
+    before = (await client.get("/api/v1/queries/stats")).json()
+
+    response = await client.post("/api/v1/queries/", json={"query": "What is a test?"})
+    assert response.status_code == 200, response.text
+    assert response.json()["response"]
+
+    after = (await client.get("/api/v1/queries/stats")).json()
+    assert after["queries_used_today"] == before["queries_used_today"] + 1
+
+
+async def test_metrics_read_the_running_service(client):
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert 'llm_service_stage_duration_seconds_count{stage="rate_limit"}' in (
+        response.text
+    )
+    assert 'llm_service_query_log_rows_total{result="written"}' in response.text
+    assert "llm_service_llm_queue_calls" in response.text
+
+
+async def test_cached_answer_is_logged_but_not_charged(client):
+    query = {"query": "Is this answer cached?"}
+    first = await client.post("/api/v1/queries/", json=query)
+    assert first.status_code == 200, first.text
+    before = (await client.get("/api/v1/queries/stats")).json()
+
+    second = await client.post(
+        "/api/v1/queries/", json={"query": "is THIS answer cached?"}
+    )
+    assert second.status_code == 200, second.text
+    assert second.json()["response"] == first.json()["response"]
+
+    after = (await client.get("/api/v1/queries/stats")).json()
+    assert after["queries_used_today"] == before["queries_used_today"]
+    # Logged through the write-behind writer
+    for _ in range(100):
+        history = (
+            await client.get("/api/v1/queries/history", params={"limit": 1})
+        ).json()
+        queries = [row["query"] for row in history["queries"]]
+        if queries == ["is THIS answer cached?"]:
+            break
+        await asyncio.sleep(0.05)
+    else:
+        pytest.fail("cached answer was not logged")
+
+
+async def test_failed_batch_queries_are_refunded(app, client, monkeypatch):
+    service = app.state.llm_service
+    answer = service._answer
+
+    async def flaky_answer(user_id, query):
+        if "fail" in query:
+            raise RuntimeError("Simulated provider failure")
+        return await answer(user_id, query)
+
+    monkeypatch.setattr(service, "_answer", flaky_answer)
+    before = (await client.get("/api/v1/queries/stats")).json()
+
+    batch = {
+        "queries": [
+            {"query": "First batch question?"},
+            {"query": "Please fail this one"},
+            {"query": "Second batch question?"},
+        ]
+    }
+    response = await client.post("/api/v1/queries/batch", json=batch)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert (body["succeeded"], body["failed"]) == (2, 1)
+    assert body["results"][1]["error"] == "Failed to process query"
+
+    after = (await client.get("/api/v1/queries/stats")).json()
+    # Only the two answered queries stay charged
+    assert after["queries_used_today"] == before["queries_used_today"] + 2
+
+
+async def test_history_cursor_round_trip(client):
+    async def full_history() -> list[int]:
+        response = await client.get("/api/v1/queries/history", params={"limit": 100})
+        return [row["id"] for row in response.json()["queries"]]
+
+    # Wait for the write-behind writer to settle
+    expected = await full_history()
+    for _ in range(100):
+        await asyncio.sleep(0.05)
+        latest = await full_history()
+        if latest == expected:
+            break
+        expected = latest
+    assert len(expected) >= 3
+
+    ids, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = await client.get("/api/v1/queries/history", params=params)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        ids.extend(row["id"] for row in page["queries"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert ids == expected
+
+
+@pytest.mark.parametrize("cursor", ["!!!", "bm90IGpzb24", "WyJub3QgYSBkYXRlIiwgMV0"])
+async def test_malformed_history_cursor_is_rejected(client, cursor):
+    response = await client.get("/api/v1/queries/history", params={"cursor": cursor})
+    assert response.status_code == 400
@@ -0,0 +1,76 @@
+"""Tests for password hashing off the event loop."""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import src.core.auth as auth
+from src.db import AsyncSessionLocal
+from src.services.user_service import UserService
+
+
+def rounds(hashed_password: str) -> int:
+    """Cost factor a bcrypt hash was made with."""
+    return int(hashed_password.split("$")[2])
+
+
+@pytest.fixture(autouse=True)
+def password_executor(monkeypatch):
+    """Give each test its own pool; the app's lifespan shuts the shared one."""
+    executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="password-hash")
+    monkeypatch.setattr(auth, "_password_executor", executor)
+    yield executor
+    executor.shutdown(wait=True)
+
+
+async def test_hashing_runs_in_the_password_pool(monkeypatch):
+    threads = []
+    hash_password = auth.hash_password
+
+    def recording_hash(password: str) -> str:
+        threads.append(threading.current_thread().name)
+        return hash_password(password)
+
+    monkeypatch.setattr(auth, "hash_password", recording_hash)
+    hashed = await auth.hash_password_async("secret")
+
+    assert threads[0].startswith("password-hash")
+    assert await auth.verify_password_async("secret", hashed)
+    assert not await auth.verify_password_async("wrong", hashed)
+
+
+async def test_saturated_pool_rejects_new_jobs(monkeypatch):
+    monkeypatch.setattr(auth.settings, "password_hash_max_pending", 1)
+    release = threading.Event()
+    running = asyncio.create_task(auth._run_password_job(release.wait))
+    await asyncio.sleep(0)
+
+    with pytest.raises(auth.PasswordHasherBusyError) as excinfo:
+        await auth.hash_password_async("secret")
+    assert excinfo.value.retry_after == auth.settings.password_hash_retry_after_seconds
+
+    release.set()
+    await running
+    # Capacity is given back once the job finishes
+    assert await auth.hash_password_async("secret")
+
+
+async def test_login_rehashes_with_changed_rounds(database, monkeypatch):
+    async with AsyncSessionLocal() as db:
+        user = await UserService.create_user(
+            db, "rehash", "rehash@example.com", "password123"
+        )
+        assert rounds(user.hashed_password) == auth.settings.bcrypt_rounds
+
+    monkeypatch.setattr(auth.settings, "bcrypt_rounds", auth.settings.bcrypt_rounds + 1)
+    async with AsyncSessionLocal() as db:
+        user = await UserService.authenticate_user(db, "rehash", "password123")
+        assert user is not None
+
+    async with AsyncSessionLocal() as db:
+        user = await UserService.get_user_by_username(db, "rehash")
+        assert rounds(user.hashed_password) == auth.settings.bcrypt_rounds
+        assert not auth.password_needs_rehash(user.hashed_password)
+        assert await UserService.authenticate_user(db, "rehash", "password123")
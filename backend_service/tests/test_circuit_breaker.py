@@ -0,0 +1,125 @@
+"""Tests for the per-provider circuit breaker."""
+
+import pytest
+
+from src.services import circuit_breaker
+from src.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Control the time seen by the breaker."""
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    return now
+
+
+def make_breaker(**kwargs) -> CircuitBreaker:
+    """Build a breaker with small, explicit thresholds."""
+    options = dict(
+        window=10,
+        min_calls=4,
+        failure_threshold=3,
+        error_rate=0.5,
+        slow_call_seconds=1.0,
+        slow_call_rate=0.5,
+        open_seconds=30,
+        half_open_probes=1,
+    )
+    options.update(kwargs)
+    return CircuitBreaker(**options)
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = make_breaker()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.retry_after == 30
+
+
+def test_opens_on_error_rate_once_enough_calls(clock):
+    breaker = make_breaker(failure_threshold=100)
+    breaker.record_failure()
+    breaker.record_success(0.1)
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+    breaker.record_success(0.1)
+    assert breaker.state == OPEN
+
+
+def test_opens_on_slow_call_rate(clock):
+    breaker = make_breaker()
+    for _ in range(2):
+        breaker.record_success(0.1)
+        breaker.record_success(5.0)
+    assert breaker.state == OPEN
+
+
+def test_timeouts_count_as_slow(clock):
+    breaker = make_breaker(failure_threshold=100, error_rate=1.0)
+    breaker.record_failure(timed_out=True)
+    breaker.record_failure(timed_out=True)
+    breaker.record_success(0.1)
+    breaker.record_success(0.1)
+    assert breaker.state == OPEN
+    assert breaker.stats()["slow_call_rate"] == 0.5
+
+
+def test_half_open_probe_success_closes(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    clock[0] += 30
+    assert breaker.state == HALF_OPEN
+
+    assert breaker.allow()
+    # Only one probe at a time
+    assert not breaker.allow()
+    breaker.record_success(0.1)
+    assert breaker.state == CLOSED
+    assert breaker.consecutive_failures == 0
+    assert not breaker.outcomes
+
+
+def test_half_open_probe_failure_or_slowness_reopens(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.opened == 2
+
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record_success(5.0)
+    assert breaker.state == OPEN
+
+
+def test_released_probe_frees_the_slot(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_lost_probe_does_not_block_forever(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    clock[0] += 30
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    clock[0] += 30
+    assert breaker.allow()
@@ -0,0 +1,91 @@
+"""Tests for fair-share admission of LLM calls."""
+
+import asyncio
+
+import pytest
+
+from src.services.fair_scheduler import FairScheduler, SchedulerBusyError
+
+
+async def run_in_turn(
+    scheduler: FairScheduler, calls: list[tuple[str, int, int]]
+) -> list[str]:
+    """Queue calls behind a held slot and record the order they run in.
+
+    Args:
+        scheduler: Scheduler with a single slot.
+        calls: Label, user ID and cost of each call, in arrival order.
+
+    Returns:
+        Labels in the order the calls got the slot.
+    """
+    order = []
+
+    async def call(label: str, user_id: int, cost: int) -> None:
+        async with scheduler.slot(user_id, cost):
+            order.append(label)
+
+    await scheduler.acquire(0)
+    tasks = []
+    for label, user_id, cost in calls:
+        tasks.append(asyncio.create_task(call(label, user_id, cost)))
+        await asyncio.sleep(0)
+    scheduler.release()
+    await asyncio.gather(*tasks)
+    return order
+
+
+async def test_burst_of_one_user_does_not_delay_others():
+    scheduler = FairScheduler(max_concurrency=1, quantum=1)
+    order = await run_in_turn(
+        scheduler,
+        [("a1", 1, 1), ("a2", 1, 1), ("a3", 1, 1), ("b1", 2, 1), ("c1", 3, 1)],
+    )
+    assert order == ["a1", "b1", "c1", "a2", "a3"]
+    assert scheduler.stats() == {
+        "in_flight": 0,
+        "queued": 0,
+        "waiting_users": 0,
+        "rejected": 0,
+    }
+
+
+async def test_expensive_calls_wait_for_enough_credit():
+    scheduler = FairScheduler(max_concurrency=1, quantum=2)
+    order = await run_in_turn(
+        scheduler,
+        [("big", 1, 6), ("s1", 2, 1), ("s2", 2, 1), ("s3", 2, 1), ("s4", 2, 1)],
+    )
+    # The big call needs three rounds of credit; small calls run meanwhile
+    assert order.index("big") == 4
+    assert order[:4] == ["s1", "s2", "s3", "s4"]
+
+
+async def test_full_user_queue_is_rejected():
+    scheduler = FairScheduler(
+        max_concurrency=1, max_queue_per_user=1, retry_after_seconds=3
+    )
+    await scheduler.acquire(1)
+    waiting = asyncio.create_task(scheduler.acquire(1))
+    await asyncio.sleep(0)
+
+    with pytest.raises(SchedulerBusyError) as exc_info:
+        await scheduler.acquire(1)
+    assert exc_info.value.reason == "user_queue_full"
+    assert exc_info.value.retry_after == 3
+    # Other users can still queue
+    scheduler.admit(2)
+
+    scheduler.release()
+    await waiting
+    scheduler.release()
+
+
+async def test_wait_gives_up_after_the_timeout():
+    scheduler = FairScheduler(max_concurrency=1, max_wait_seconds=0.01)
+    await scheduler.acquire(1)
+    with pytest.raises(SchedulerBusyError) as exc_info:
+        await scheduler.acquire(2)
+    assert exc_info.value.reason == "timeout"
+    assert scheduler.stats()["queued"] == 0
+    scheduler.release()
@@ -0,0 +1,100 @@
+"""Tests for routing LLM calls across the provider pool."""
+
+import time
+
+import pytest
+
+from src.services.circuit_breaker import CircuitBreaker
+from src.services.llm_router import LLMRouter, Provider
+from src.services.stub_llm import LatencyDistribution, StubChatModel
+
+
+def make_provider(name: str, **kwargs) -> Provider:
+    """Build a provider on the stub model with a fresh breaker."""
+    latency = kwargs.pop("first_token_latency", 0.0)
+    llm = StubChatModel(
+        first_token_latency=LatencyDistribution("constant", latency), **kwargs
+    )
+    return Provider(
+        name, name, llm, breaker=CircuitBreaker(min_calls=100, failure_threshold=100)
+    )
+
+
+def make_router(providers: list[Provider], **kwargs) -> LLMRouter:
+    """Build a router without hedging or adaptive timeouts."""
+    kwargs.setdefault("first_token_timeout", 1.0)
+    return LLMRouter(
+        providers, routing="ordered", adaptive_timeout=False, hedging=False, **kwargs
+    )
+
+
+async def test_falls_back_when_first_provider_fails():
+    broken = make_provider("broken", error_rate=1.0)
+    working = make_provider("working")
+    router = make_router([broken, working])
+
+    routed = await router.open("hello")
+    content, usage = await routed.collect()
+
+    assert routed.provider is working
+    assert content
+    assert usage["total_tokens"] > 0
+
+
+async def test_falls_back_when_first_token_times_out():
+    stalled = make_provider("stalled", first_token_latency=5.0)
+    working = make_provider("working")
+    router = make_router([stalled, working], first_token_timeout=0.05)
+
+    routed = await router.open("hello")
+    await routed.collect()
+
+    assert routed.provider is working
+    assert stalled.breaker.consecutive_failures == 1
+
+
+async def test_trickling_answer_stops_at_the_overall_deadline():
+    # One word every 50ms: the first token is quick, the whole answer is not
+    trickling = make_provider("trickling", tokens_per_second=20, chunk_words=1)
+    router = make_router([trickling])
+
+    start = time.monotonic()
+    routed = await router.open("hello", deadline=time.monotonic() + 0.3)
+    with pytest.raises(TimeoutError):
+        await routed.collect()
+
+    assert time.monotonic() - start < 1.0
+    assert trickling.breaker.consecutive_failures == 1
+
+
+async def test_refuses_to_start_after_the_deadline():
+    provider = make_provider("provider")
+    router = make_router([provider])
+
+    with pytest.raises(TimeoutError):
+        await router.open("hello", deadline=time.monotonic() - 1)
+    assert provider.llm.calls == 0
+
+
+async def test_timeouts_do_not_raise_the_adaptive_timeout():
+    stalled = make_provider("stalled", first_token_latency=5.0)
+    working = make_provider("working")
+    router = LLMRouter(
+        [stalled, working],
+        routing="ordered",
+        hedging=False,
+        adaptive_timeout=True,
+        first_token_timeout=10.0,
+        min_timeout=0.05,
+        timeout_multiplier=2.0,
+        timeout_min_samples=1,
+    )
+    stalled.record_latency(0.02)
+    assert router.timeout_for(stalled) == pytest.approx(0.05)
+
+    routed = await router.open("hello")
+    await routed.collect()
+
+    assert list(stalled.latencies) == [0.02]
+    assert router.timeout_for(stalled) == pytest.approx(0.05)
+    assert stalled.breaker.outcomes[-1] == (True, True)
@@ -0,0 +1,90 @@
+"""Tests for upgrading an existing schema."""
+
+import logging
+
+from sqlalchemy import create_engine, inspect, text
+
+from src.db.migrate import migrate
+
+# Schema created by the original models, before response blobs, token
+# split columns and the history index; response is NOT NULL as in
+# deployments that predate it becoming optional
+BASELINE_SCHEMA = [
+    """
+    CREATE TABLE users (
+        id INTEGER NOT NULL PRIMARY KEY,
+        username VARCHAR(255) NOT NULL,
+        email VARCHAR(255) NOT NULL,
+        hashed_password VARCHAR(255) NOT NULL,
+        is_active BOOLEAN,
+        created_at DATETIME,
+        updated_at DATETIME
+    )
+    """,
+    "CREATE INDEX ix_users_id ON users (id)",
+    "CREATE UNIQUE INDEX ix_users_username ON users (username)",
+    "CREATE UNIQUE INDEX ix_users_email ON users (email)",
+    """
+    CREATE TABLE query_logs (
+        id INTEGER NOT NULL PRIMARY KEY,
+        user_id INTEGER NOT NULL REFERENCES users (id),
+        query TEXT NOT NULL,
+        response TEXT NOT NULL,
+        llm_model_used VARCHAR(255) NOT NULL,
+        tokens_used INTEGER,
+        created_at DATETIME
+    )
+    """,
+    "CREATE INDEX ix_query_logs_id ON query_logs (id)",
+    "CREATE INDEX ix_query_logs_user_id ON query_logs (user_id)",
+    "CREATE INDEX ix_query_logs_created_at ON query_logs (created_at)",
+]
+
+
+def test_baseline_schema_is_upgraded_once(tmp_path, caplog):
+    engine = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    with engine.begin() as conn:
+        for statement in BASELINE_SCHEMA:
+            conn.execute(text(statement))
+        conn.execute(
+            text(
+                "INSERT INTO users (id, username, email, hashed_password) "
+                "VALUES (1, 'old', 'old@example.com', 'x')"
+            )
+        )
+        conn.execute(
+            text(
+                "INSERT INTO query_logs (user_id, query, response, llm_model_used) "
+                "VALUES (1, 'q', 'r', 'm')"
+            )
+        )
+
+    with caplog.at_level(logging.WARNING), engine.begin() as conn:
+        changes = migrate(conn)
+
+    assert {
+        "created table response_blobs",
+        "created table response_dictionaries",
+        "added column query_logs.response_hash",
+        "added column query_logs.prompt_tokens",
+        "added column query_logs.completion_tokens",
+        "dropped index ix_query_logs_user_id",
+        "created index ix_query_logs_user_id_created_at_id",
+        "created index ix_query_logs_response_hash",
+    } <= set(changes)
+    # SQLite cannot drop NOT NULL in place; it is reported instead
+    assert "made query_logs.response nullable" not in changes
+    assert "query_logs.response is NOT NULL" in caplog.text
+
+    inspector = inspect(engine)
+    columns = {column["name"] for column in inspector.get_columns("query_logs")}
+    assert {"response_hash", "prompt_tokens", "completion_tokens"} <= columns
+    indexes = {index["name"] for index in inspector.get_indexes("query_logs")}
+    assert "ix_query_logs_user_id" not in indexes
+    assert "ix_query_logs_user_id_created_at_id" in indexes
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM query_logs")).scalar() == 1
+
+    with engine.begin() as conn:
+        assert migrate(conn) == []
+    engine.dispose()
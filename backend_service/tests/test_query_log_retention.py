@@ -0,0 +1,118 @@
+"""Tests for archiving expired query logs."""
+
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+from src.db import AsyncSessionLocal
+from src.models import ResponseBlob
+from src.services.llm_service import LLMService
+from src.services.query_log_archive import QueryLogArchive
+from src.services.query_log_retention import QueryLogRetention
+from src.services.query_log_writer import QueryLogWriter
+from src.services.response_store import response_store
+
+USER_ID = 9001
+
+
+def make_row(created_at: datetime, response: str, user_id: int = USER_ID) -> dict:
+    """Build the column values of a query log."""
+    return {
+        "user_id": user_id,
+        "query": f"question at {created_at.isoformat()}",
+        "response": response,
+        "llm_model_used": "stub",
+        "prompt_tokens": 1,
+        "completion_tokens": 1,
+        "tokens_used": 2,
+        "created_at": created_at,
+    }
+
+
+async def stored_hashes() -> set[str]:
+    """Hashes of the response blobs in the database."""
+    async with AsyncSessionLocal() as db:
+        return set(await db.scalars(select(ResponseBlob.hash)))
+
+
+async def test_archives_expired_months_and_deletes_their_blobs(database, tmp_path):
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    old = now.replace(day=1) - timedelta(days=70)
+    await QueryLogWriter()._flush(
+        [
+            make_row(old, "only in an expired month"),
+            make_row(old + timedelta(minutes=1), "shared with a hot row"),
+            make_row(now, "shared with a hot row"),
+        ]
+    )
+    expired_hash = response_store.make_hash("only in an expired month")
+    shared_hash = response_store.make_hash("shared with a hot row")
+    assert {expired_hash, shared_hash} <= await stored_hashes()
+
+    archive = QueryLogArchive(str(tmp_path))
+    retention = QueryLogRetention(archive=archive, retention_months=1)
+    archived = await retention.run_once()
+
+    assert archived == [old.strftime("%Y-%m")]
+    hashes = await stored_hashes()
+    assert expired_hash not in hashes
+    assert shared_hash in hashes
+    # The archive keeps the response text itself
+    rows = archive.read_user(USER_ID, None, 10)
+    assert {row["response"] for row in rows} == {
+        "only in an expired month",
+        "shared with a hot row",
+    }
+
+
+async def test_history_cursor_continues_from_hot_rows_into_the_archive(
+    database, tmp_path, monkeypatch
+):
+    user_id = USER_ID + 1
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    month = now.replace(day=1)
+    times = [
+        now,
+        now,  # same instant, ordered by ID
+        month - timedelta(days=40),
+        month - timedelta(days=40, minutes=1),
+        month - timedelta(days=75),
+    ]
+    await QueryLogWriter()._flush(
+        [
+            make_row(created_at, f"answer {i}", user_id)
+            for i, created_at in enumerate(times)
+        ]
+    )
+    archive = QueryLogArchive(str(tmp_path))
+    monkeypatch.setattr("src.services.llm_service.query_log_archive", archive)
+    await QueryLogRetention(archive=archive, retention_months=1).run_once()
+    assert len(archive.read_user(user_id, None, 10)) == 3
+
+    pages, cursor = [], None
+    async with AsyncSessionLocal() as db:
+        while True:
+            rows, cursor = await LLMService.get_query_history(db, user_id, 2, cursor)
+            pages.append([row["response"] for row in rows])
+            if cursor is None:
+                break
+
+    assert pages == [["answer 1", "answer 0"], ["answer 2", "answer 3"], ["answer 4"]]
+
+
+async def test_history_skips_the_archive_until_a_month_is_archived(
+    database, tmp_path, monkeypatch
+):
+    user_id = USER_ID + 2
+    await QueryLogWriter()._flush([make_row(datetime.now(), "hot answer", user_id)])
+    archive = QueryLogArchive(str(tmp_path))
+    monkeypatch.setattr("src.services.llm_service.query_log_archive", archive)
+
+    def read_user(*args):
+        raise AssertionError("the archive is empty")
+
+    monkeypatch.setattr(archive, "read_user", read_user)
+    async with AsyncSessionLocal() as db:
+        rows, cursor = await LLMService.get_query_history(db, user_id, 10)
+    assert [row["response"] for row in rows] == ["hot answer"]
+    assert cursor is None
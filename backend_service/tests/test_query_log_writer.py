@@ -0,0 +1,75 @@
+"""Tests for the write-behind query log writer."""
+
+from datetime import datetime, timezone
+
+from sqlalchemy import func, select
+
+from src.db import AsyncSessionLocal
+from src.models import QueryLog
+from src.services.query_log_writer import QueryLogWriter
+from src.services.response_store import response_store
+
+
+def make_row(user_id: int, query: str, response: str = "answer") -> dict:
+    """Build the column values of a query log."""
+    return {
+        "user_id": user_id,
+        "query": query,
+        "response": response,
+        "llm_model_used": "stub",
+        "prompt_tokens": 1,
+        "completion_tokens": 1,
+        "tokens_used": 2,
+        "created_at": datetime.now(timezone.utc).replace(tzinfo=None),
+    }
+
+
+async def count_logs(query_prefix: str) -> int:
+    """Count the stored query logs whose query starts with a prefix."""
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(
+            select(func.count()).where(QueryLog.query.startswith(query_prefix))
+        )
+
+
+async def test_batch_is_written(database):
+    writer = QueryLogWriter(batch_size=10, flush_interval_seconds=0.01)
+    await writer.start()
+    for i in range(3):
+        await writer.write(make_row(1, f"batch-{i}"))
+    await writer.stop()
+
+    assert writer.written == 3
+    assert await count_logs("batch-") == 3
+
+
+async def test_failed_flush_is_retried_with_the_original_rows(database, monkeypatch):
+    writer = QueryLogWriter(flush_retries=2, retry_backoff_seconds=0)
+    store = response_store.store
+    calls = []
+
+    async def flaky_store(db, rows):
+        calls.append(len(rows))
+        await store(db, rows)
+        if len(calls) == 1:
+            raise ConnectionError("database went away")
+
+    monkeypatch.setattr(response_store, "store", flaky_store)
+    rows = [make_row(1, f"retry-{i}", f"response {i}") for i in range(3)]
+    await writer._flush(rows, retries=2)
+
+    assert calls == [3, 3]
+    assert (writer.written, writer.failed) == (3, 0)
+    # The store replaced responses with hashes in a copy only
+    assert rows[0]["response"] == "response 0"
+    assert await count_logs("retry-") == 3
+
+
+async def test_bad_row_does_not_discard_the_batch(database):
+    writer = QueryLogWriter(retry_backoff_seconds=0)
+    rows = [make_row(1, "isolated-0"), make_row(1, None), make_row(1, "isolated-2")]
+
+    await writer._flush(rows, retries=1)
+
+    assert (writer.written, writer.failed) == (2, 1)
+    assert await count_logs("isolated-") == 2
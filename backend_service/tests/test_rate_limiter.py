@@ -0,0 +1,159 @@
+"""Tests for the stacked rate limiter."""
+
+import asyncio
+import time
+
+import pytest
+from redis.exceptions import RedisError
+
+from src.core.limiter_algorithms import (
+    FixedWindowLimiter,
+    SlidingWindowLimiter,
+    TokenBucketLimiter,
+)
+from src.core.rate_limiter import RateLimiter
+
+
+def make_limiter(burst_limit: int = 3, daily_limit: int = 10) -> RateLimiter:
+    """Build a limiter with a per-request burst tier and a daily tier."""
+    burst = TokenBucketLimiter("burst", burst_limit, 60)
+    burst.per_request = True
+    daily = FixedWindowLimiter("daily", daily_limit, 86400)
+    return RateLimiter(tiers=[burst, daily], local_fallback=False)
+
+
+async def test_reserve_until_the_daily_limit(redis):
+    limiter = RateLimiter(tiers=[FixedWindowLimiter("daily", 3, 86400)])
+    for used in (1, 2, 3):
+        status = await limiter.reserve(7)
+        assert status.allowed and status.used == used
+
+    status = await limiter.reserve(7)
+    assert not status.allowed
+    assert status.limited_by == "daily"
+    assert status.retry_after > 0
+    assert (await limiter.get_status(7)).used == 3
+
+
+async def test_refund_gives_quota_back(redis):
+    limiter = RateLimiter(tiers=[SlidingWindowLimiter("daily", 5, 86400)])
+    await limiter.reserve(7, 4)
+    await limiter.refund(7, 3)
+    assert (await limiter.get_status(7)).used == 1
+
+
+async def test_settle_charges_overruns_and_refunds_overestimates(redis):
+    limiter = RateLimiter(tiers=[FixedWindowLimiter("tokens", 100, 86400)])
+    await limiter.reserve(7, 50)
+    await limiter.settle(7, 50, 20)
+    assert (await limiter.get_status(7)).used == 20
+
+    await limiter.reserve(7, 50)
+    # Charged even past the limit
+    await limiter.settle(7, 50, 120)
+    assert (await limiter.get_status(7)).used == 140
+
+
+async def test_rejection_rolls_back_earlier_tiers(redis):
+    limiter = make_limiter(burst_limit=5, daily_limit=2)
+    assert (await limiter.reserve(7, 2)).allowed
+
+    status = await limiter.reserve(7, 1)
+    assert status.limited_by == "daily"
+    # The rejected request's burst unit was refunded
+    burst = limiter.tiers[0]
+    assert (await burst.status(redis, 7)).used == 1
+
+
+async def test_batch_is_charged_once_in_the_burst_tier(redis):
+    limiter = make_limiter(burst_limit=3, daily_limit=100)
+
+    # Larger than the burst capacity, still one request
+    assert (await limiter.reserve(7, 10)).allowed
+    assert (await limiter.get_status(7)).used == 10
+    burst = limiter.tiers[0]
+    assert (await burst.status(redis, 7)).used == 1
+
+
+async def test_partial_refund_keeps_the_request_charged(redis):
+    limiter = make_limiter()
+    burst = limiter.tiers[0]
+    await limiter.reserve(7, 4)
+
+    await limiter.refund(7, 2, requests=0)
+    assert (await burst.status(redis, 7)).used == 1
+    assert (await limiter.get_status(7)).used == 2
+
+    await limiter.refund(7, 2)
+    assert (await burst.status(redis, 7)).used == 0
+    assert (await limiter.get_status(7)).used == 0
+
+
+async def test_refund_goes_back_to_the_reserved_window(redis, monkeypatch):
+    now = [time.time()]
+    monkeypatch.setattr("src.core.limiter_algorithms.time.time", lambda: now[0])
+    limiter = RateLimiter(tiers=[FixedWindowLimiter("daily", 5, 86400)])
+    status = await limiter.reserve(7, 3)
+
+    # The reservation is refunded after the window rolled over
+    now[0] += 86400
+    assert (await limiter.reserve(7, 2)).used == 2
+    await limiter.refund(7, 3, windows=status.windows)
+    assert (await limiter.get_status(7)).used == 2
+
+
+async def test_failing_tier_rolls_back_earlier_tiers(redis, monkeypatch):
+    limiter = make_limiter()
+    burst, daily = limiter.tiers
+
+    async def fail(*args, **kwargs):
+        raise RedisError("down")
+
+    monkeypatch.setattr(daily, "reserve", fail)
+    with pytest.raises(RedisError):
+        await limiter.reserve(7)
+    assert (await burst.status(redis, 7)).used == 0
+
+
+async def test_timed_out_reservation_is_not_charged_locally(monkeypatch):
+    tier = FixedWindowLimiter("daily", 5, 86400)
+    limiter = RateLimiter(tiers=[tier], operation_timeout=0.01)
+
+    async def slow(*args, **kwargs):
+        await asyncio.sleep(1)
+
+    monkeypatch.setattr(tier, "reserve", slow)
+    status = await limiter.reserve(7)
+    assert status.allowed
+    assert limiter.mode == "local"
+    assert tier.status_local(7).used == 0
+
+
+async def test_local_fallback_mirrors_redis():
+    limiter = RateLimiter(tiers=[FixedWindowLimiter("daily", 2, 86400)])
+    limiter._degraded_until = float("inf")
+
+    assert (await limiter.reserve(7)).allowed
+    assert (await limiter.reserve(7)).allowed
+    assert not (await limiter.reserve(7)).allowed
+    await limiter.refund(7)
+    assert (await limiter.get_status(7)).used == 1
+    assert limiter.mode == "local"
+
+
+def test_local_state_of_idle_users_is_swept(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr("src.core.limiter_algorithms.time.time", lambda: now[0])
+    window = SlidingWindowLimiter("burst", 5, 10)
+    bucket = TokenBucketLimiter("burst", 5, 10)
+    for user_id in range(100):
+        window.reserve_local(user_id, 1)
+        bucket.reserve_local(user_id, 1)
+    assert len(window._local) == 100 and len(bucket._local) == 100
+
+    # Long after the windows ended and the buckets refilled
+    now[0] += 3600
+    window.reserve_local(1000, 1)
+    bucket.reserve_local(1000, 1)
+    assert len(window._local) == 1 and len(bucket._local) == 1
+    assert bucket.status_local(1000).used == 1
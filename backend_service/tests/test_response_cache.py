@@ -0,0 +1,48 @@
+"""Tests for the two-tier exact-match response cache."""
+
+from src.services.response_cache import LRUCache, ResponseCache
+
+
+def test_lru_evicts_least_recently_used_by_count_and_size():
+    cache = LRUCache(max_entries=2, max_bytes=10, ttl_seconds=60)
+    cache.set("a", "1234")
+    cache.set("b", "1234")
+    cache.get("a")
+    cache.set("c", "1234")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1234" and cache.get("c") == "1234"
+
+    cache.set("d", "123456789")
+    assert len(cache) == 1 and cache.total_bytes == 9
+    # Values larger than the whole cache are not stored
+    cache.set("e", "x" * 11)
+    assert cache.get("e") is None and cache.get("d") == "123456789"
+
+
+def test_lru_entries_expire(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("src.services.response_cache.time.monotonic", lambda: now[0])
+    cache = LRUCache(max_entries=10, max_bytes=100, ttl_seconds=5)
+    cache.set("a", "value")
+    now[0] += 5
+    assert cache.get("a") is None
+    assert cache.total_bytes == 0
+
+
+def test_key_ignores_case_and_whitespace_but_not_sampling():
+    key = ResponseCache.make_key("What is  Python?", "model", 0.0)
+    assert ResponseCache.make_key(" what is python? ", "model", 0.0) == key
+    assert ResponseCache.make_key("What is Python?", "other", 0.0) != key
+    assert ResponseCache.make_key("What is Python?", "model", 0.7) != key
+
+
+async def test_redis_tier_is_shared_between_workers(redis):
+    first, second = ResponseCache(use_redis=True), ResponseCache(use_redis=True)
+    await first.set("key", "answer")
+
+    assert await second.get("key") == "answer"
+    assert await second.get("missing") is None
+    assert second.stats()["redis_hits"] == 1
+    assert second.stats()["hit_rate"] == 0.5
+    # Promoted to the local tier
+    assert second.local.get("key") == "answer"
@@ -0,0 +1,41 @@
+"""Tests for compressed response storage."""
+
+import pytest
+
+from src.db import AsyncSessionLocal
+from src.models import ResponseDictionary
+from src.services.response_store import ResponseStore
+
+
+def test_zlib_round_trip_and_preview():
+    store = ResponseStore(compression="zlib")
+    text = "A response long enough to be worth compressing. " * 20
+    codec, data = store.compress(text)
+
+    assert store.resolve(None, codec, data) == text
+    assert store.resolve(None, codec, data, max_chars=10) == text[:10]
+
+
+async def test_dictionaries_trained_elsewhere_are_reloaded(database):
+    zstandard = pytest.importorskip("zstandard")
+    samples = [
+        f"Answer {i}: the capital of country {i} is city {i}.".encode()
+        for i in range(200)
+    ]
+    dictionary = zstandard.train_dictionary(1024, samples)
+    async with AsyncSessionLocal() as db:
+        db.add(ResponseDictionary(id=dictionary.dict_id(), data=dictionary.as_bytes()))
+        await db.commit()
+
+    # Another worker loaded the dictionary and compressed with it
+    writer = ResponseStore(compression="zstd")
+    async with AsyncSessionLocal() as db:
+        await writer.load_dictionaries(db)
+    codec, data = writer.compress("Answer 7: the capital of country 7 is city 7.")
+    assert codec == f"zstd:{dictionary.dict_id()}"
+
+    reader = ResponseStore(compression="zstd")
+    assert reader.resolve(None, codec, data) is None
+    async with AsyncSessionLocal() as db:
+        await reader.load_missing_dictionaries(db, [codec])
+    assert reader.resolve(None, codec, data).startswith("Answer 7")
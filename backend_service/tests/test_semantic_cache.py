@@ -0,0 +1,77 @@
+"""Tests for the semantic response cache."""
+
+import threading
+
+import pytest
+
+from src.services.semantic_cache import LSHIndex, SemanticCache
+
+STUB_EMBEDDER = "stubs:hashing_embedding"
+
+
+def make_cache(tmp_path, **kwargs) -> SemanticCache:
+    """Build a cache on the lexical test embedder."""
+    kwargs.setdefault("threshold", 0.9)
+    return SemanticCache(
+        embedder=STUB_EMBEDDER, path=str(tmp_path / "index.json"), **kwargs
+    )
+
+
+def test_requires_an_embedder(tmp_path):
+    with pytest.raises(ValueError, match="SEMANTIC_CACHE_EMBEDDER"):
+        SemanticCache(embedder="", path=str(tmp_path / "index.json"))
+
+
+async def test_lookup_hits_similar_query_and_misses_unrelated(tmp_path):
+    cache = make_cache(tmp_path)
+    await cache.add("What is the capital of France?", "Paris")
+
+    assert await cache.lookup("what is the capital of france") == "Paris"
+    assert await cache.lookup("How do I sort a list in Python?") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+async def test_evicts_oldest_entry_when_full(tmp_path):
+    cache = make_cache(tmp_path, max_entries=2)
+    await cache.add("first question about apples", "a")
+    await cache.add("second question about bananas", "b")
+    await cache.add("third question about cherries", "c")
+
+    assert len(cache.entries) == 2
+    assert await cache.lookup("first question about apples") is None
+    assert await cache.lookup("third question about cherries") == "c"
+
+
+async def test_snapshot_round_trip(tmp_path):
+    cache = make_cache(tmp_path)
+    await cache.add("What is the capital of France?", "Paris")
+    cache.last_log_id = 42
+    cache.save()
+
+    restored = make_cache(tmp_path)
+    assert restored.load()
+    assert restored.last_log_id == 42
+    assert await restored.lookup("What is the capital of France?") == "Paris"
+
+
+async def test_lookup_runs_off_the_event_loop(tmp_path):
+    cache = make_cache(tmp_path)
+    await cache.add("What is the capital of France?", "Paris")
+    loop_thread = threading.get_ident()
+    threads = []
+    embed = cache.embed
+    cache.embed = lambda text: threads.append(threading.get_ident()) or embed(text)
+
+    await cache.lookup("What is the capital of France?")
+    await cache.add("How far away is the moon?", "384,400 km")
+
+    assert threads and loop_thread not in threads
+
+
+def test_lsh_index_remove():
+    index = LSHIndex(dim=2, num_tables=2, num_bits=2)
+    index.add(1, [1.0, 0.0])
+    index.remove(1)
+
+    assert index.nearest([1.0, 0.0]) == (None, -1.0)
+    assert all(not table for table in index.tables)
@@ -0,0 +1,42 @@
+"""Tests for single-flight coalescing of identical calls."""
+
+import asyncio
+
+from src.services.single_flight import SingleFlight
+
+
+async def test_concurrent_callers_share_one_call():
+    group = SingleFlight(use_redis=False)
+    calls = 0
+
+    async def call():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "answer", {"total_tokens": 3}
+
+    results = await asyncio.gather(*(group.do("key", call) for _ in range(3)))
+    assert calls == 1
+    assert [shared for _, shared in results] == [False, True, True]
+    assert all(result == ("answer", {"total_tokens": 3}) for result, _ in results)
+
+
+async def test_result_from_another_worker_keeps_its_shape(redis):
+    leader, follower = SingleFlight(use_redis=True), SingleFlight(use_redis=True)
+    started = asyncio.Event()
+
+    async def lead():
+        started.set()
+        await asyncio.sleep(0.05)
+        return "answer", {"total_tokens": 3}
+
+    async def follow():
+        raise AssertionError("the follower must not call upstream")
+
+    leading = asyncio.create_task(leader.do("key", lead))
+    await started.wait()
+    result, shared = await follower.do("key", follow, decode=tuple)
+
+    assert shared
+    assert result == ("answer", {"total_tokens": 3})
+    assert await leading == (("answer", {"total_tokens": 3}), False)
@@ -0,0 +1,50 @@
+"""Tests of tokenizer loading and token estimates."""
+
+import sys
+
+import pytest
+
+import src.utils.tokens as tokens
+
+MODEL = "gpt-4o-mini"
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    """Start every test with no tokenizer loaded or failed."""
+    monkeypatch.setattr(tokens, "_encodings", {})
+    monkeypatch.setattr(tokens, "_failed_at", {})
+    monkeypatch.setattr(tokens, "_loading", set())
+
+
+def test_failed_load_is_not_cached(monkeypatch):
+    monkeypatch.setitem(sys.modules, "tiktoken", None)
+    assert tokens.load_encoding(MODEL) is None
+    assert MODEL not in tokens._encodings
+
+    encoding = object()
+    tokens._encodings[MODEL] = encoding
+    assert tokens.get_encoding(MODEL) is encoding
+
+
+def test_lookup_never_loads_on_the_calling_thread(monkeypatch):
+    started = []
+
+    class Thread:
+        def __init__(self, target, args, **kwargs):
+            self.args = args
+
+        def start(self):
+            started.append(self.args[0])
+
+    monkeypatch.setattr(tokens.threading, "Thread", Thread)
+
+    assert tokens.get_encoding(MODEL) is None
+    # A load already in progress is not started again
+    assert tokens.get_encoding(MODEL) is None
+    assert started == [MODEL]
+
+
+def test_count_uses_estimate_until_loaded(monkeypatch):
+    monkeypatch.setitem(sys.modules, "tiktoken", None)
+    assert tokens.count_tokens("x" * 10, MODEL) == 3
@@ -0,0 +1,83 @@
+"""Tests for the cache of token claims and user snapshots."""
+
+import asyncio
+
+from fastapi.security.http import HTTPAuthorizationCredentials
+
+from src.api.dependencies import get_current_user
+from src.core import create_access_token
+from src.db import AsyncSessionLocal
+from src.models import User
+from src.services.user_cache import UserCache, UserSnapshot, user_cache
+
+
+async def add_user(username: str) -> int:
+    """Insert a user row and return its ID."""
+    async with AsyncSessionLocal() as db:
+        user = User(
+            username=username, email=f"{username}@example.com", hashed_password="x"
+        )
+        db.add(user)
+        await db.commit()
+        return user.id
+
+
+async def current_user(user_id: int) -> UserSnapshot:
+    """Authenticate a request of a user through the dependency."""
+    token = create_access_token({"sub": str(user_id)})
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    async with AsyncSessionLocal() as db:
+        return await get_current_user(credentials, db)
+
+
+async def test_snapshots_expire_after_the_ttl(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr("src.services.user_cache.time.time", lambda: now[0])
+    cache = UserCache(ttl_seconds=60, use_redis=False)
+    await cache.set_user(UserSnapshot(id=1, username="alice", is_active=True))
+
+    now[0] += 59
+    assert await cache.get_user(1) is not None
+    now[0] += 2
+    assert await cache.get_user(1) is None
+
+
+def test_claims_expire_with_the_token(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr("src.services.user_cache.time.time", lambda: now[0])
+    cache = UserCache(ttl_seconds=60, use_redis=False)
+    cache.set_claims("token", {"sub": "1", "exp": now[0] + 10})
+
+    assert cache.get_claims("token") == {"sub": "1", "exp": now[0] + 10}
+    now[0] += 10
+    assert cache.get_claims("token") is None
+
+
+async def test_updated_user_is_not_served_stale(database, redis):
+    user_id = await add_user("cached-update")
+    assert (await current_user(user_id)).is_active
+    assert await user_cache.get_user(user_id) is not None
+
+    async with AsyncSessionLocal() as db:
+        user = await db.get(User, user_id)
+        user.is_active = False
+        await db.commit()
+    # Redis is cleared by a task started from the mapper event
+    await asyncio.gather(*user_cache._pending)
+
+    assert await user_cache.get_user(user_id) is None
+    assert await redis.get(f"{UserCache.KEY_PREFIX}{user_id}") is None
+    assert not (await current_user(user_id)).is_active
+
+
+async def test_deleted_user_is_dropped_from_the_cache(database, redis):
+    user_id = await add_user("cached-delete")
+    await current_user(user_id)
+    assert await user_cache.get_user(user_id) is not None
+
+    async with AsyncSessionLocal() as db:
+        await db.delete(await db.get(User, user_id))
+        await db.commit()
+    await asyncio.gather(*user_cache._pending)
+
+    assert await user_cache.get_user(user_id) is None